@@ -0,0 +1,26 @@
+# FindBoost of the Boost packages, found through CMAKE_MODULE_PATH in the package folder.
+#
+# find_package(Boost [COMPONENTS ...]) includes the BoostConfig.cmake that package() generates
+# (see hykerbuild/cmake_config.py): imported targets Boost::boost and Boost::<library> plus the
+# FindBoost variables, without any search.  Components packaged separately (Boost.system, ...)
+# come from their own boost_<component>Config.cmake.
+#
+# Configure with -DHYKER_USE_FIND_MODULES=ON to run CMake's own FindBoost on the package folders
+# instead, e.g. to compare with "python -m hykerbuild.cmake_bench".
+
+if(NOT HYKER_USE_FIND_MODULES AND EXISTS "${CMAKE_CURRENT_LIST_DIR}/lib/cmake/Boost/BoostConfig.cmake")
+  include("${CMAKE_CURRENT_LIST_DIR}/lib/cmake/Boost/BoostConfig.cmake")
+  return()
+endif()
+
+if(NOT BOOST_ROOT)
+  set(BOOST_ROOT "${CMAKE_CURRENT_LIST_DIR}")
+endif()
+if(NOT BOOST_LIBRARYDIR AND CONAN_LIB_DIRS)
+  # The libraries of the component packages
+  set(BOOST_LIBRARYDIR ${CONAN_LIB_DIRS})
+endif()
+set(Boost_NO_SYSTEM_PATHS ON)
+# Otherwise FindBoost would find the generated BoostConfig.cmake itself
+set(Boost_NO_BOOST_CMAKE ON)
+include("${CMAKE_ROOT}/Modules/FindBoost.cmake")
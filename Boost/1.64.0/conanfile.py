@@ -1,14 +1,24 @@
 from conans import ConanFile
 from conans import tools
-import platform, os, sys
-
-class BoostConan(ConanFile):
+from hykerbuild.source_cache import SourceCache
+from hykerbuild.boost import (BoostRecipe, CMAKE_COMPONENTS, COMPONENT_DEPENDENCIES, HEADER_ONLY_COMPONENTS,
+                              SOURCE_BASE_LIBRARIES, closure, cmake_variables, evict_matrices, link_order,
+                              source_filter)
+from hykerbuild.compiler_cache import session
+from hykerbuild import binary_cache
+from hykerbuild import cmake_config, cpu_level, report, debug_symbols
+from hykerbuild.linktree import link_file, link_tree, shared_tree
+from hykerbuild.util import FileLock, cache_root, sha256_text, touch
+import platform, os, re, shutil, sys
+
+class BoostConan(BoostRecipe, ConanFile):
     name                = "Boost"
     version             = "1.64.0"
     settings            = "os", "arch", "compiler", "build_type"
     source_folder_name  = "boost_%s" % version.replace(".", "_")
     source_zip_filename = "%s.zip" % source_folder_name if sys.platform == "win32" else "%s.tar.gz" % source_folder_name
-    source_zip_url      = "http://sourceforge.net/projects/boost/files/boost/%s/%s/download" % (version, source_zip_filename)
+    source_zip_url      = "https://sourceforge.net/projects/boost/files/boost/%s/%s/download" % (version, source_zip_filename)
+    source_zip_sha256   = None if sys.platform == "win32" else "0445c22a5ef3bd69f5dfb48354978421a85ab395254a26b1ffb0aa1bfd63a108"
     options             = {
         "shared":          [True, False],
         "header_only":     [True, False],
@@ -40,13 +50,32 @@ class BoostConan(ConanFile):
         "thread":          [True, False],
         "timer":           [True, False],
         "type_erasure":    [True, False],
-        "wave":            [True, False]
+        "wave":            [True, False],
+        "build_matrix":    [True, False],
+        "profile_build":   [True, False],
+        "compiler_cache":  [True, False],
+        "binary_cache":    [True, False],
+        "link_package":    [True, False],
+        "split_debug":     [True, False],
+        "cpu_level":       cpu_level.LEVELS
     }
-    default_options     = "=False\n".join(options.keys()) + "=False"
+    default_options     = "=False\n".join(name for name in options.keys() if name != "cpu_level") + "=False\ncpu_level=baseline"
+    component_dependencies = COMPONENT_DEPENDENCIES
+    header_only_components = HEADER_ONLY_COMPONENTS
+    # Options that only change how the binaries are produced, not part of the package ID
+    build_only_options  = ["profile_build", "compiler_cache", "binary_cache"]
+    # Only changes how package() lays the files out, also available for the headers package
+    packaging_options   = ["link_package"]
+    # Cached binaries accepted by the binary cache when the exact configuration is missing
+    compatible_build_types = {"RelWithDebInfo": ["Release"]}
+    superset_options    = sorted(set(component_dependencies) - set(header_only_components))
+    source_base_libraries = SOURCE_BASE_LIBRARIES
+    compile_profile_folder = "compile_profile"
     url                 = "https://github.com/hykersec/conan-packages"
-    exports             = ["FindBoost.cmake", "OriginalFindBoost*"]
+    exports             = ["FindBoost.cmake", "OriginalFindBoost*", "hykerbuild/*.py"]
     license             = "Boost Software License - Version 1.0. http://www.boost.org/LICENSE_1_0.txt"
     short_paths         = True
+    recipe_folder       = os.path.dirname(os.path.abspath(__file__))
 
     def configure(self):
         if self.settings.compiler == "Visual Studio" and self.options.shared and "MT" in str(self.settings.compiler.runtime):
@@ -56,138 +85,260 @@ class BoostConan(ConanFile):
             self.options.remove("shared")
             self.options.remove("fPIC")
             self.options.remove("python")
+            self.options.remove("split_debug")
+            self.options.remove("cpu_level")
+            self.options.remove("build_matrix")
+            for option_name in self.build_only_options:
+                self.options.remove(option_name)
 
     def conan_info(self):
+        for option_name in self.packaging_options:
+            self.info.options.remove(option_name)
         if self.options.header_only:
             self.info.requires.clear()
             self.info.settings.clear()
+            # The headers package, the same whatever components are enabled
+            for name in self.component_dependencies:
+                self.info.options.remove(name)
+        else:
+            for option_name in self.build_only_options:
+                self.info.options.remove(option_name)
+            # The matrix build gives the libraries the tagged names and SONAMEs outside of Windows, where the
+            # versioned layout is the same as without it
+            if not self._uses_build_matrix() or self.settings.os == "Windows":
+                self.info.options.remove("build_matrix")
+
+            # Components are identified by the libraries b2 builds, e.g. "thread" and "thread, system" build the same
+            built = self._built_components()
+            for name in self.component_dependencies:
+                if name in self.header_only_components:
+                    self.info.options.remove(name)
+                else:
+                    setattr(self.info.options, name, str(name in built))
+            if self.options.shared or self.settings.compiler == "Visual Studio":
+                self.info.options.remove("fPIC")
+            self.info.options.cpu_level = cpu_level.package_id_value(self)
 
     def source(self):
-        self.output.info("Downloading %s..." % self.source_zip_url)
-        tools.download(self.source_zip_url, self.source_zip_filename)
-        tools.unzip(self.source_zip_filename, ".")
-        os.unlink(self.source_zip_filename)
+        libraries = self._source_libraries()
+        self.output.info("Extracting Boost sources for %s" % ", ".join(sorted(libraries)))
+        with report.phase("download_extract"):
+            SourceCache(output=self.output).extract(self.source_zip_url, ".", self.source_zip_sha256, self.source_zip_filename,
+                                                    source_filter(self.source_folder_name, libraries))
+        self._save_extracted_libraries(libraries)
+
+    def _source_libraries(self):
+        if self.options.header_only:
+            return set(self.source_base_libraries)
+
+        libraries = set(self.source_base_libraries) | self._component_closure()
+        if self.options.python:
+            libraries.add("python")
+        return libraries
+
+    def _component_closure(self):
+        return closure(name for name in self.component_dependencies if getattr(self.options, name))
+
+    def _built_components(self):
+        return set(name for name in self._component_closure() if name not in self.header_only_components)
+
+    @property
+    def _extracted_libraries_file(self):
+        return os.path.join(self.source_folder_name, ".extracted_libraries")
+
+    def _save_extracted_libraries(self, libraries):
+        with open(self._extracted_libraries_file, "w") as f:
+            f.write("\n".join(sorted(libraries)))
+
+    def _extract_missing_sources(self):
+        # The source folder is shared by every configuration, complete it when more components are enabled
+        if not os.path.exists(self._extracted_libraries_file):
+            return
+        with open(self._extracted_libraries_file) as f:
+            extracted = set(f.read().split())
+        missing = self._source_libraries() - extracted
+        if not missing:
+            return
+
+        self.output.info("Extracting Boost sources for %s" % ", ".join(sorted(missing)))
+        with report.phase("extract_missing"):
+            SourceCache(output=self.output).extract(self.source_zip_url, ".", self.source_zip_sha256, self.source_zip_filename,
+                                                    source_filter(self.source_folder_name, missing, libs_only=True))
+        self._save_extracted_libraries(extracted | missing)
 
     def build(self):
         if self.options.header_only:
             self.output.warn("Header only package, skipping build")
             return
 
-        try:
-            command = "bootstrap" if self.settings.os == "Windows" else "./bootstrap.sh --with-toolset=%s"% ("clang" if self.settings.compiler == "apple-clang" else self.settings.compiler)
-            self.run("cd %s && %s" % (self.source_folder_name, command))
-        except:
-            self.run("cd %s && type bootstrap.log" % self.source_folder_name
-                    if self.settings.os == "Windows"
-                    else "cd %s && cat bootstrap.log" % self.source_folder_name)
-            raise
+        if self.options.binary_cache:
+            with report.phase("binary_cache_lookup"):
+                if binary_cache.check(self, self.recipe_folder):
+                    return
 
-        flags = []
-        if self.settings.compiler == "Visual Studio":
-            flags.append("toolset=msvc-%s" % self._msvc_version())
-        elif self.settings.compiler == "gcc":
-            # For GCC we only need the major version otherwhise Boost doesn't find the compiler
-            flags.append("toolset=%s-%s"% (self.settings.compiler, self._gcc_short_version(self.settings.compiler.version)))
-        elif str(self.settings.compiler) in ["clang"]:
-            flags.append("toolset=%s-%s"% (self.settings.compiler, self.settings.compiler.version))
-
-        flags.append("link=%s" % ("static" if not self.options.shared else "shared"))
-        if self.settings.compiler == "Visual Studio" and self.settings.compiler.runtime:
-            flags.append("runtime-link=%s" % ("static" if "MT" in str(self.settings.compiler.runtime) else "shared"))
-        flags.append("variant=%s" % str(self.settings.build_type).lower())
-        flags.append("address-model=%s" % ("32" if self.settings.arch == "x86" else "64"))
-
-        option_names = {
-            "--with-atomic":          self.options.atomic,
-            "--with-chrono":          self.options.chrono,
-            "--with-container":       self.options.container,
-            "--with-context":         self.options.context,
-            "--with-coroutine":       self.options.coroutine,
-            "--with-coroutine2":      self.options.coroutine2,
-            "--with-date_time":       self.options.date_time,
-            "--with-exception":       self.options.exception,
-            "--with-filesystem":      self.options.filesystem,
-            "--with-graph":           self.options.graph,
-            "--with-graph_parallel":  self.options.graph_parallel,
-            "--with-iostreams":       self.options.iostreams,
-            "--with-locale":          self.options.locale,
-            "--with-log":             self.options.log,
-            "--with-math":            self.options.math,
-            "--with-mpi":             self.options.mpi,
-            "--with-program_options": self.options.program_options,
-            "--with-random":          self.options.random,
-            "--with-regex":           self.options.regex,
-            "--with-serialization":   self.options.serialization,
-            "--with-signals":         self.options.signals,
-            "--with-system":          self.options.system,
-            "--with-test":            self.options.test,
-            "--with-thread":          self.options.thread,
-            "--with-timer":           self.options.timer,
-            "--with-type_erasure":    self.options.type_erasure,
-            "--with-wave":            self.options.wave
-        }
-
-        for option_name, activated in option_names.items():
-            if activated:
-                flags.append(option_name)
-
-        cxx_flags = []
-        # fPIC DEFINITION
-        if self.settings.compiler != "Visual Studio":
-            if self.options.fPIC:
-                cxx_flags.append("-fPIC")
-
-        # LIBCXX DEFINITION FOR BOOST B2
-        try:
-            if str(self.settings.compiler.libcxx) == "libstdc++":
-                flags.append("define=_GLIBCXX_USE_CXX11_ABI=0")
-            elif str(self.settings.compiler.libcxx) == "libstdc++11":
-                flags.append("define=_GLIBCXX_USE_CXX11_ABI=1")
-            if "clang" in str(self.settings.compiler):
-                if str(self.settings.compiler.libcxx) == "libc++":
-                    cxx_flags.append("-stdlib=libc++")
-                    cxx_flags.append("-std=c++11")
-                    flags.append('linkflags="-stdlib=libc++"')
-                else:
-                    cxx_flags.append("-stdlib=libstdc++")
-                    cxx_flags.append("-std=c++11")
-        except:
-            pass
+        self._extract_missing_sources()
 
-        if self.settings.os == "iOS":
-            flags.append("architecture=arm target-os=iphone")
-            for arch in ["armv7", "armv7s", "arm64"]:
-                cxx_flags.append("-arch %s" % arch)
-            cxx_flags.append("-fembed-bitcode")
-            cxx_flags.append("-isysroot %s" % "/Applications/Xcode.app/Contents/Developer/Platforms/iPhoneOS.platform/Developer/SDKs/iPhoneOS.sdk")
+        self._bootstrap()
+        cpu_level.warn_unsupported_host(self)
 
-        cxx_flags = 'cxxflags="%s"' % " ".join(cxx_flags) if cxx_flags else ""
-        flags.append(cxx_flags)
+        flags = self._b2_flags()
+        # Dependencies are built explicitly so the libraries only depend on the package ID, see conan_info
+        for name in sorted(self._built_components()):
+            flags.append("--with-%s" % name)
 
-        command = "b2" if self.settings.os == "Windows" else "./b2"
+        command = self._b2_command()
 
         b2_flags = " ".join(flags)
 
         python = "--with-python" if self.options.python else ""
-        full_command = "cd %s && %s %s -j%s --abbreviate-paths %s" % (
-            self.source_folder_name,
-            command,
-            b2_flags,
-            tools.cpu_count(),
-            python)
-        self.output.warn(full_command)
-
-        envs = self.prepare_deps_options_env()
-        with tools.environment_append(envs):
-            self.run(full_command)
+
+        compiler_cache = self._compiler_launcher()
+
+        with session(compiler_cache):
+            if self._uses_build_matrix():
+                self._build_matrix(command, flags, python)
+            else:
+                if self.options.build_matrix:
+                    self.output.warn("build_matrix only covers Debug and Release, building %s on its own" % self.settings.build_type)
+
+                full_command = "cd %s && %s %s -j%s --abbreviate-paths %s" % (
+                    self.source_folder_name,
+                    command,
+                    b2_flags,
+                    self._jobs(self._source_libraries()),
+                    python)
+                self.output.warn(full_command)
+
+                envs = self.prepare_deps_options_env()
+                with tools.environment_append(envs), report.phase("compile"):
+                    self.run(full_command)
+
+        self._summarize_compile_profile()
+        cpu_level.build_check(self)
+
+    def _uses_build_matrix(self):
+        return bool(self.options.build_matrix) and str(self.settings.build_type) in ("Debug", "Release")
+
+    def _build_matrix(self, command, flags, python):
+        # Every configuration sharing all the other flags builds Debug/Release x static/shared in a single b2
+        # run, the first configuration to get here builds them and the others only pick their libraries.
+        common_flags = [flag for flag in flags if not flag.startswith("link=") and not flag.startswith("variant=")]
+        links = "static" if self.settings.compiler == "Visual Studio" and "MT" in str(self.settings.compiler.runtime) else "static,shared"
+        # The toolset flag has no version for apple-clang, the compiler settings tell the toolchains apart
+        key = sha256_text("%s %s %s %s %s %s %s %s" % (self.version, self.settings.os, self.settings.arch,
+                                                      self.settings.compiler, self.settings.compiler.version,
+                                                      " ".join(common_flags), python, links))
+        matrix_root = os.path.join(cache_root(), "boost_matrix")
+        matrix_folder = os.path.join(matrix_root, key[:16])
+
+        with FileLock(matrix_folder + ".lock", timeout=6 * 3600):
+            if not os.path.exists(os.path.join(matrix_folder, "complete")):
+                shutil.rmtree(matrix_folder, ignore_errors=True)
+                full_command = "cd %s && %s %s variant=debug,release link=%s%s --stagedir=\"%s\" --build-dir=\"%s\" -j%s --abbreviate-paths %s" % (
+                    self.source_folder_name,
+                    command,
+                    " ".join(common_flags),
+                    links,
+                    "" if self.settings.os == "Windows" else " --layout=tagged",
+                    os.path.join(matrix_folder, "stage"),
+                    os.path.join(matrix_folder, "build"),
+                    self._jobs(self._source_libraries()),
+                    python)
+                self.output.warn(full_command)
+
+                envs = self.prepare_deps_options_env()
+                with tools.environment_append(envs), report.phase("compile"):
+                    self.run(full_command)
+                open(os.path.join(matrix_folder, "complete"), "w").close()
+            else:
+                self.output.info("Using Boost libraries built by the matrix build in %s" % matrix_folder)
+                touch(os.path.join(matrix_folder, "complete"))
+
+            with report.phase("split_matrix"):
+                self._split_matrix(os.path.join(matrix_folder, "stage", "lib"))
+            evict_matrices(matrix_root, keep=matrix_folder, output=self.output)
+
+    def _split_matrix(self, matrix_lib_folder):
+        # Copies the libraries of this configuration to stage/lib, where package() expects them
+        stage_lib_folder = os.path.join(self.source_folder_name, "stage", "lib")
+        shutil.rmtree(stage_lib_folder, ignore_errors=True)
+        os.makedirs(stage_lib_folder)
+
+        debug = self.settings.build_type == "Debug"
+        shared = bool(self.options.shared)
+        if self.settings.os == "Windows":
+            # The versioned layout already gives every configuration distinct names, e.g. libboost_log-vc140-mt-sgd-1_64.lib
+            pattern = re.compile(r"^(?P<prefix>lib)?boost_\w+?-vc\d+-mt(-(?P<abi>[a-z]+))?-\d+_\d+\.(?P<ext>lib|dll)$")
+        else:
+            # The tagged layout marks the variant, e.g. libboost_log-mt-d.a, the tags are removed for the plain names
+            pattern = re.compile(r"^lib(?P<name>boost_\w+?)(-mt)?(-(?P<abi>[a-z]+))?(?P<ext>\.a|\.so(\.[\d.]+)?|\.dylib)$")
+
+        for filename in sorted(os.listdir(matrix_lib_folder)):
+            match = pattern.match(filename)
+            if not match or ("d" in (match.group("abi") or "")) != debug:
+                continue
+            source = os.path.join(matrix_lib_folder, filename)
+            extension = match.group("ext")
+            if self.settings.os == "Windows":
+                if shared == bool(match.group("prefix")):
+                    continue
+                link_file(source, os.path.join(stage_lib_folder, filename))
+            elif extension == ".a":
+                if not shared:
+                    link_file(source, os.path.join(stage_lib_folder, "lib%s.a" % match.group("name")))
+            elif shared and not os.path.islink(source):
+                # Keep the real file under its tagged name, it is the SONAME / install name consumers record
+                link_file(source, os.path.join(stage_lib_folder, filename))
+                plain_extension = ".dylib" if extension == ".dylib" else ".so"
+                os.symlink(filename, os.path.join(stage_lib_folder, "lib%s%s" % (match.group("name"), plain_extension)))
 
     def prepare_deps_options_env(self):
         return {}
 
     def package(self):
-        self.copy("FindBoost.cmake", ".", ".")
-        self.copy("OriginalFindBoost*", ".", ".")
-
+        use_binary_cache = not self.options.header_only and self.options.binary_cache
+        if use_binary_cache:
+            with report.phase("binary_cache_restore"):
+                restored = binary_cache.restore(self)
+            if restored:
+                report.publish(self)
+                return
+
+        with report.phase("package"):
+            self.copy("FindBoost.cmake", ".", ".")
+            self.copy("OriginalFindBoost*", ".", ".")
+
+            if self.options.link_package:
+                self._link_package()
+            else:
+                self._copy_package()
+            if not self.options.header_only:
+                cpu_level.package(self)
+            self._write_cmake_config()
+        if not self.options.header_only and self.options.split_debug:
+            with report.phase("split_debug"):
+                debug_symbols.split(self)
+        if use_binary_cache:
+            with report.phase("binary_cache_store"):
+                binary_cache.store(self, self.recipe_folder)
+        report.publish(self)
+
+    def _link_package(self):
+        # The headers of every package ID come from one shared tree per archive, the libraries from the build folder
+        headers = shared_tree("%s %s" % (self.source_zip_sha256 or self.source_zip_url, "boost"),
+                              os.path.join(self.source_folder_name, "boost"), self.output)
+        counts = link_tree(headers, os.path.join(self.package_folder, "include", "boost"))
+        stage_lib_folder = os.path.join(self.source_folder_name, "stage", "lib")
+        if os.path.isdir(stage_lib_folder):
+            for method, count in link_tree(stage_lib_folder, os.path.join(self.package_folder, "lib"),
+                                           ["*.a", "*.so", "*.so.*", "*.dylib*", "*.lib"]).items():
+                counts[method] = counts.get(method, 0) + count
+            for method, count in link_tree(stage_lib_folder, os.path.join(self.package_folder, "bin"), ["*.dll"]).items():
+                counts[method] = counts.get(method, 0) + count
+        self.output.info("Packaged %s" % ", ".join("%d files by %s" % (count, method) for method, count in sorted(counts.items())))
+        report.record("link_package", counts)
+
+    def _copy_package(self):
         self.copy(pattern="*",        dst="include/boost", src="%s/boost" % self.source_folder_name)
         self.copy(pattern="*.a",      dst="lib",           src="%s/stage/lib" % self.source_folder_name)
         self.copy(pattern="*.so",     dst="lib",           src="%s/stage/lib" % self.source_folder_name)
@@ -196,88 +347,45 @@ class BoostConan(ConanFile):
         self.copy(pattern="*.lib",    dst="lib",           src="%s/stage/lib" % self.source_folder_name)
         self.copy(pattern="*.dll",    dst="bin",           src="%s/stage/lib" % self.source_folder_name)
 
-    def package_info(self):
+    def _write_cmake_config(self):
+        # Same targets and names as package_info(), components not built here come from their own packages
+        targets = [cmake_config.interface_target("Boost::boost", defines=self._defines())]
+        if not self.options.header_only:
+            targets.extend(self._cmake_targets(self._built_components()))
+            if self.options.python:
+                targets.append(cmake_config.library_target(self, "Boost::python", self._library_names(["python"])[0],
+                                                           ["Boost::boost"]))
+        cmake_config.write(self, "Boost", targets, cmake_variables(self.version), components=CMAKE_COMPONENTS,
+                           check_target="Boost::boost")
+
+    def _defines(self):
         if not self.options.header_only and self.options.shared:
-            self.cpp_info.defines.append("BOOST_ALL_DYN_LINK")
+            defines = ["BOOST_ALL_DYN_LINK"]
         else:
-            self.cpp_info.defines.append("BOOST_USE_STATIC_LIBS")
-
+            defines = ["BOOST_USE_STATIC_LIBS"]
         if self.options.header_only:
-            return
-
-        lib_names = {
-            "atomic":          self.options.atomic,
-            "chrono":          self.options.chrono,
-            "container":       self.options.container,
-            "context":         self.options.context,
-            "coroutine":       self.options.coroutine,
-            "coroutine2":      self.options.coroutine2,
-            "date_time":       self.options.date_time,
-            "exception":       self.options.exception,
-            "filesystem":      self.options.filesystem,
-            "graph":           self.options.graph,
-            "graph_parallel":  self.options.graph_parallel,
-            "iostreams":       self.options.iostreams,
-            "locale":          self.options.locale,
-            "log":             self.options.log,
-            "math":            self.options.math,
-            "mpi":             self.options.mpi,
-            "program_options": self.options.program_options,
-            "random":          self.options.random,
-            "regex":           self.options.regex,
-            "serialization":   self.options.serialization,
-            "signals":         self.options.signals,
-            "system":          self.options.system,
-            "test":            self.options.test,
-            "thread":          self.options.thread,
-            "timer":           self.options.timer,
-            "type_erasure":    self.options.type_erasure,
-            "wave":            self.options.wave
-        }
-
-        libs = []
-        for lib_name, activated in lib_names.items():
-            if activated:
-                libs.append(lib_name)
+            return defines
+        if self.options.python and not self.options.shared:
+            defines.append("BOOST_PYTHON_STATIC_LIB")
+        if self.settings.compiler == "Visual Studio":
+            defines.append("BOOST_ALL_NO_LIB")
+        return defines
 
+    def _libraries(self):
+        libs = link_order(self._built_components())
         if self.options.python:
             libs.append("python")
-            if not self.options.shared:
-                self.cpp_info.defines.append("BOOST_PYTHON_STATIC_LIB")
-
-        if self.settings.compiler == "Visual Studio":
-            # http://www.boost.org/doc/libs/1_55_0/more/getting_started/windows.html
-            runtime = "mt" # str(self.settings.compiler.runtime).lower()
-
-            abi_tags = []
-            if self.settings.compiler.runtime in ("MTd", "MT"):
-                abi_tags.append("s")
-
-            if self.settings.build_type == "Debug":
-                abi_tags.append("gd")
+        return self._library_names(libs)
 
-            abi_tags = ("-%s" % "".join(abi_tags)) if abi_tags else ""
-
-            version = "_".join(self.version.split(".")[0:2])
-            suffix = "vc%s-%s%s-%s" %  (self._msvc_version().replace(".", ""), runtime, abi_tags, version)
-            prefix = "lib" if not self.options.shared else ""
-
-            win_libs = []
-            win_libs.extend(["%sboost_%s-%s" % (prefix, lib, suffix) for lib in libs])
-
-            self.cpp_info.libs.extend(win_libs)
-            self.cpp_info.defines.extend(["BOOST_ALL_NO_LIB"])
-        else:
-            self.cpp_info.libs.extend(["boost_%s" % lib for lib in libs])
-
-    def _msvc_version(self):
-        if self.settings.compiler.version == "15":
-            return "14.1"
-        else:
-            return "%s.0" % self.settings.compiler.version
+    def package_info(self):
+        self.cpp_info.defines.extend(self._defines())
+        if self.options.header_only:
+            return
 
-    def _gcc_short_version(self, version):
-        return str(version)[0]
+        self.cpp_info.libs.extend(self._libraries())
+        cpu_level.package_info(self)
+        if self.options.split_debug:
+            debug_symbols.package_info(self)
 
     def boost_libraries():
         return 
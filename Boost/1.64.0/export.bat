@@ -1,2 +1,12 @@
 @echo off
-conan export hykersec
\ No newline at end of file
+if exist hykerbuild rmdir /s /q hykerbuild
+xcopy /e /i /q ..\..\hykerbuild hykerbuild > nul
+conan export hykersec
+pushd ..\.. && python -m hykerbuild.boost > nul && popd
+for /d %%c in (components\*) do (
+    pushd %%c
+    if exist hykerbuild rmdir /s /q hykerbuild
+    xcopy /e /i /q ..\..\..\..\hykerbuild hykerbuild > nul
+    conan export hykersec
+    popd
+)
@@ -1,2 +1,6 @@
 #!/bin/sh
-conan export hykersec
\ No newline at end of file
+rm -rf hykerbuild && cp -r ../../hykerbuild . && conan export hykersec
+(cd ../.. && python -m hykerbuild.boost) > /dev/null
+for component in components/*/; do
+    (cd $component && rm -rf hykerbuild && cp -r ../../../../hykerbuild . && conan export hykersec)
+done
@@ -1,6 +1,13 @@
 from conans import ConanFile, CMake, tools
 from conans.tools import replace_in_file
-import os
+from hykerbuild.source_cache import SourceCache, extract
+from hykerbuild.jobs import job_count
+from hykerbuild.compiler_cache import CompilerCache, session
+from hykerbuild.slices import build_slices
+from hykerbuild import binary_cache
+from hykerbuild import cmake_config, cpu_level, report, tu_profile, debug_symbols, bench
+from conans.errors import ConanException
+import json, os, subprocess
 
 class CryptoppConan(ConanFile):
     name              = "CryptoPP"
@@ -9,47 +16,178 @@ class CryptoppConan(ConanFile):
     url               = "https://github.com/hykersec/conan-packages"
     settings          = "os", "compiler", "build_type", "arch"
     options           = {
-        "shared": [True, False]
+        "shared":         [True, False],
+        "profile_build":  [True, False],
+        "compiler_cache": [True, False],
+        "binary_cache":   [True, False],
+        "split_debug":    [True, False],
+        "benchmark":      [True, False],
+        "cpu_level":      cpu_level.LEVELS
     }
-    default_options   = "=False\n".join(options.keys()) + "=False"
+    default_options   = "=False\n".join(name for name in options.keys() if name != "cpu_level") + "=False\ncpu_level=baseline"
     generators        = "cmake"
+    exports           = "hykerbuild/*.py"
     source_git_url    = "https://github.com/weidai11/cryptopp.git"
     source_git_commit = "aaf62695fc03bf941ec51e40a139f5e0eb8652f3"
+    memory_per_job    = 500
+    # Options that only change how the binaries are produced, not part of the package ID
+    build_only_options = ["profile_build", "compiler_cache", "binary_cache", "benchmark"]
+    benchmark_filename = "cryptest_benchmark.json"
+    compile_profile_folder = "compile_profile"
+    recipe_folder     = os.path.dirname(os.path.abspath(__file__))
+    # Cached binaries accepted by the binary cache when the exact configuration is missing
+    compatible_build_types = {"RelWithDebInfo": ["Release"]}
+
+    def conan_info(self):
+        for option_name in self.build_only_options:
+            self.info.options.remove(option_name)
+        if self.settings.os == "iOS":
+            # The iOS make build always produces an optimized static library
+            self.info.options.remove("shared")
+            self.info.settings.build_type = "Release"
+        self.info.options.cpu_level = cpu_level.package_id_value(self)
 
     def source(self):
-        self.run("git clone %s" % self.source_git_url)
-        self.run("cd cryptopp && git reset --hard %s" % self.source_git_commit)
+        with report.phase("download_extract"):
+            archive = SourceCache(output=self.output).git_archive(self.source_git_url, self.source_git_commit, "cryptopp")
+            extract(archive, ".")
 
         # Guarantee proper /MT /MD linkage in MSVC
-        tools.replace_in_file("cryptopp/CMakeLists.txt", "project(cryptopp)", '''project(cryptopp)
+        with report.phase("patch"):
+            tools.replace_in_file("cryptopp/CMakeLists.txt", "project(cryptopp)", '''project(cryptopp)
 include(${CMAKE_BINARY_DIR}/conanbuildinfo.cmake)
 conan_basic_setup()''')
 
     def build(self):
+        if self.options.binary_cache:
+            with report.phase("binary_cache_lookup"):
+                if binary_cache.check(self, self.recipe_folder):
+                    return
+
         if self.settings.os == "iOS":
+            if self.options.profile_build or self.options.compiler_cache:
+                self.output.warn("profile_build and compiler_cache are not supported by the iOS make build")
+            if self.options.benchmark:
+                self.output.warn("The iOS slices cannot be benchmarked on the build machine")
             arches = ["armv7", "armv7s", "arm64"]
 
-            replace_in_file("./cryptopp/setenv-ios.sh", " == ", " = ")
-            for arch in arches:
-                self.run("cd cryptopp && . ./setenv-ios.sh %s && export CXXFLAGS='-DNDEBUG -g2 -O3 -fPIC -pipe -fembed-bitcode' && make clean && make -f GNUmakefile-cross" % arch)
-                self.run("cd cryptopp && cp libcryptopp.a libcryptopp-%s.a" % arch)
+            with report.phase("patch"):
+                replace_in_file("./cryptopp/setenv-ios.sh", " == ", " = ")
+            # The slices build side by side in their own folders and share the jobs
+            cxx_flags = "-DNDEBUG -g2 -O3 -fPIC -pipe -fembed-bitcode"
+            jobs = max(1, job_count(self.memory_per_job, self.output) // len(arches))
+            key = "%s %s %s %s" % (self.name, self.source_git_commit, cxx_flags, self._xcode_version())
+            with report.phase("compile_slices"):
+                folders, seconds = build_slices(
+                    "cryptopp", arches,
+                    lambda arch: ". ./setenv-ios.sh %s && export CXXFLAGS='%s' && make -f GNUmakefile-cross -j%s" % (arch, cxx_flags, jobs),
+                    key, self.output)
+            report.record("slices", seconds)
 
-            self.run("cd cryptopp && lipo -create %s -output ./libcryptopp.a" % (" ".join(["./libcryptopp-%s.a" % arch for arch in arches])))
+            with report.phase("lipo"):
+                self.run("lipo -create %s -output cryptopp/libcryptopp.a" %
+                         " ".join('"%s"' % os.path.join(folders[arch], "libcryptopp.a") for arch in arches))
         else:
             cmake = CMake(self)
-            self.run('cmake cryptopp %s %s' % (cmake.command_line, "-DBUILD_SHARED_LIBS=ON" if self.options.shared else ""))
-            self.run("cmake --build . %s" % cmake.build_config)
+            launcher = []
+            if self.options.profile_build:
+                launcher.extend(tu_profile.launcher(self.compile_profile_folder))
+            compiler_cache = None
+            if self.options.compiler_cache:
+                compiler_cache = CompilerCache(os.getcwd(), self.output)
+                launcher.extend(compiler_cache.launcher)
+            cmake_flags = ["-DBUILD_SHARED_LIBS=ON"] if self.options.shared else []
+            if launcher:
+                if self.settings.compiler == "Visual Studio":
+                    self.output.warn("Visual Studio generators ignore compiler launchers, ignoring %s" % " ".join(launcher))
+                    compiler_cache = None
+                else:
+                    cmake_flags.append('"-DCMAKE_CXX_COMPILER_LAUNCHER=%s"' % ";".join(launcher))
+            # CMakeLists.txt adds -march=native unless told not to, the cpu_level flags go through CXXFLAGS so CMake
+            # keeps its default flags
+            if cpu_level.level(self) != "native":
+                cmake_flags.append("-DDISABLE_NATIVE_ARCH=ON")
+            cpu_level.warn_unsupported_host(self)
+            with tools.environment_append({"CXXFLAGS": " ".join([os.environ.get("CXXFLAGS", "")] + cpu_level.compiler_flags(self)).strip()}), \
+                    report.phase("configure"):
+                self.run('cmake cryptopp %s %s' % (cmake.command_line, " ".join(cmake_flags)))
+            jobs = job_count(self.memory_per_job, self.output)
+            parallel = "/m:%s" % jobs if self.settings.compiler == "Visual Studio" else "-j%s" % jobs
+            with session(compiler_cache), report.phase("compile"):
+                self.run("cmake --build . %s -- %s" % (cmake.build_config, parallel))
+            cpu_level.build_check(self)
+
+            if self.options.profile_build and os.path.isdir(self.compile_profile_folder):
+                slowest = tu_profile.summarize(self.compile_profile_folder, ".")
+                report.record("compile_profile", slowest)
+                self.output.info("Compile profile written to compile_profile.txt and compile_trace.json")
+
+            if self.options.benchmark:
+                with report.phase("benchmark"):
+                    self._benchmark()
+
+    def _xcode_version(self):
+        # Part of the key of the slice folders, make does not rebuild the objects when the compiler changes
+        try:
+            return subprocess.check_output(["xcrun", "clang", "--version"]).decode("utf-8", "replace").strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    def _benchmark(self):
+        # cryptest is built with the library by default, CMake names it cryptest.exe on every platform
+        candidates = [os.path.join(folder, name) for folder in (".", "bin", str(self.settings.build_type))
+                      for name in ("cryptest.exe", "cryptest")]
+        cryptest = next((os.path.abspath(path) for path in candidates if os.path.isfile(path)), None)
+        if cryptest is None:
+            raise ConanException("cryptest was not built, cannot run the benchmark")
+
+        # The public key benchmarks load their keys from TestData/ in the sources
+        tables, results = bench.cryptest_benchmark(cryptest, "cryptopp")
+        report.record("benchmark", results)
+        regressed = bench.check_baseline(self.name, self.version, report.package_id(self), results, self.output)
+        with open(self.benchmark_filename, "w") as f:
+            json.dump({"package_id": report.package_id(self), "tables": tables, "results": results,
+                       "regressed": regressed}, f, indent=2, sort_keys=True)
+        if regressed:
+            raise ConanException(bench.describe(regressed))
 
     def package(self):
-        self.copy("*.h", dst="include/cryptopp", src="cryptopp")
-        self.copy("*.lib", dst="lib", keep_path=False)
-        self.copy("*.dll", dst="bin", keep_path=False)
-        self.copy("*.dylib", dst="bin", keep_path=False)
-        self.copy("*.so", dst="lib", keep_path=False)
-        self.copy("*.a", dst="lib", keep_path=False)
+        if self.options.binary_cache:
+            with report.phase("binary_cache_restore"):
+                restored = binary_cache.restore(self)
+            if restored:
+                report.publish(self)
+                return
 
-    def package_info(self):
+        with report.phase("package"):
+            self.copy("*.h", dst="include/cryptopp", src="cryptopp")
+            self.copy("*.lib", dst="lib", keep_path=False)
+            self.copy("*.dll", dst="bin", keep_path=False)
+            self.copy("*.dylib", dst="bin", keep_path=False)
+            self.copy("*.so", dst="lib", keep_path=False)
+            self.copy("*.a", dst="lib", keep_path=False)
+            self.copy(self.benchmark_filename)
+            cpu_level.package(self)
+            cmake_config.write(self, "CryptoPP", [cmake_config.library_target(self, "CryptoPP::CryptoPP", self._library_name())],
+                               [("CRYPTOPP_INCLUDE_DIRS", "@PREFIX@/include"),
+                                ("CRYPTOPP_LIBRARIES",    "CryptoPP::CryptoPP")],
+                               check_target="CryptoPP::CryptoPP")
+        if self.options.split_debug:
+            with report.phase("split_debug"):
+                debug_symbols.split(self)
+        if self.options.binary_cache:
+            with report.phase("binary_cache_store"):
+                binary_cache.store(self, self.recipe_folder)
+        report.publish(self)
+
+    def _library_name(self):
         if self.settings.compiler == "Visual Studio":
-            self.cpp_info.libs = ["cryptopp"] if self.options.shared else ["cryptopp-static"]
+            return "cryptopp" if self.options.shared else "cryptopp-static"
         else:
-            self.cpp_info.libs = ["cryptopp"] if self.options.shared else ["libcryptopp.a"]
+            return "cryptopp" if self.options.shared else "libcryptopp.a"
+
+    def package_info(self):
+        self.cpp_info.libs = [self._library_name()]
+        cpu_level.package_info(self)
+        if self.options.split_debug:
+            debug_symbols.package_info(self)
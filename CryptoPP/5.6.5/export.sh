@@ -1,2 +1,2 @@
 #!/bin/sh
-conan export hykersec
+rm -rf hykerbuild && cp -r ../../hykerbuild . && conan export hykersec
@@ -1,7 +1,15 @@
 from conans import ConanFile
-from conans import tools
 from conans.tools import replace_in_file
-import os
+from conans.errors import ConanException
+from hykerbuild.source_cache import SourceCache
+from hykerbuild.jobs import job_count
+from hykerbuild.compiler_cache import CompilerCache, session
+from hykerbuild import binary_cache
+from hykerbuild.artifacts import library_digest
+from hykerbuild.logs import run_logged
+from hykerbuild import cmake_config, report, debug_symbols, bench
+from hykerbuild.util import which
+import multiprocessing, os, re, shutil
 
 
 class OpenSSLConan(ConanFile):
@@ -31,10 +39,16 @@ class OpenSSLConan(ConanFile):
         "no_rc4":            [True, False],
         "no_rc5":            [True, False],
         "no_rsa":            [True, False],
-        "no_sha":            [True, False]
+        "no_sha":            [True, False],
+        "verify_parallel_make": [True, False],
+        "compiler_cache":    [True, False],
+        "binary_cache":      [True, False],
+        "split_debug":       [True, False],
+        "pgo":               [True, False],
+        "benchmark":         [True, False]
     }
     default_options     = "=False\n".join(options.keys()) + "=False"
-    exports             = ("win_bin/*", "readme.txt", "FindOpenSSL.cmake")
+    exports             = ("win_bin/*", "readme.txt", "FindOpenSSL.cmake", "hykerbuild/*.py")
 
     # When a new version is avaiable they move the tar.gz to old/ location
     source_tgz_url      = "https://www.openssl.org/source/openssl-%s.tar.gz" % version
@@ -42,6 +56,19 @@ class OpenSSLConan(ConanFile):
     source_tgz_filename = "openssl.tar.gz"
     source_tgz_sha256   = "1d4007e53aad94a5b2002fe045ee7bb0b3d98f1a47f8b2bc851dcd1c74332919"
     counter_config      = 0
+    memory_per_job      = 150
+    # Options that only change how the package is built, not passed to Configure nor part of the package ID
+    build_only_options  = ["verify_parallel_make", "compiler_cache", "binary_cache", "benchmark"]
+    # Options that only change the packaged files, not passed to Configure but part of the package ID
+    package_layout_options = ["split_debug"]
+    # Build variants made by the recipe rather than Configure, part of the package ID
+    recipe_build_options = ["pgo"]
+    # Makefiles whose sibling targets archive into the same library, see _serialize_makefile
+    racy_makefiles      = ["Makefile", "crypto/Makefile", "engines/Makefile"]
+    build_log_filename  = "openssl_build.log"
+    built_libraries     = ["libcrypto.a", "libssl.a", "libcrypto.so.1.0.0", "libssl.so.1.0.0",
+                           "libcrypto.1.0.0.dylib", "libssl.1.0.0.dylib"]
+    recipe_folder       = os.path.dirname(os.path.abspath(__file__))
 
     # iOS
     builder_ios_url     = "https://github.com/x2on/OpenSSL-for-iPhone.git"
@@ -50,18 +77,41 @@ class OpenSSLConan(ConanFile):
     def source(self):
         if self.settings.os == "iOS":
             self.output.info("Cloning %s" % self.builder_ios_url)
-            self.run("git clone %s" % self.builder_ios_url)
+            with report.phase("clone"):
+                self.run("git clone %s" % self.builder_ios_url)
         else:
-            self.output.info("Downloading %s" % self.source_tgz_filename)
-            try:
-                tools.download(self.source_tgz_old_url, self.source_tgz_filename)
-                tools.unzip(self.source_tgz_filename, ".")
-            except:
-                tools.download(self.source_tgz_url, self.source_tgz_filename)
-                tools.unzip(self.source_tgz_filename, ".")
+            # Hashed while it is extracted, nothing lands in the source folder before source_tgz_sha256 matches
+            with report.phase("download_extract"):
+                SourceCache(output=self.output).extract([self.source_tgz_old_url, self.source_tgz_url], ".",
+                                                        self.source_tgz_sha256, self.source_tgz_filename)
 
-            tools.check_sha256(self.source_tgz_filename, self.source_tgz_sha256)
-            os.unlink(self.source_tgz_filename)
+    def conan_info(self):
+        for option_name in self.build_only_options + self._ineffective_options():
+            self.info.options.remove(option_name)
+        # Only Debug changes the flags OpenSSL is built with
+        if self.settings.build_type != "Debug" or self.settings.os == "iOS":
+            self.info.settings.build_type = "Release"
+
+    def _ineffective_options(self):
+        # Options that cannot change the binaries of this configuration, neither passed to Configure nor in the package ID
+        if self.settings.os == "iOS":
+            # build-libssl.sh has its own fixed configuration
+            return [name for name in self.options.values.fields
+                    if name not in self.build_only_options + self.package_layout_options]
+        ineffective = []
+        if self.options.no_zlib:
+            ineffective.append("zlib_dynamic")
+        if self.settings.os != "Linux":
+            ineffective.append("no_electric_fence")
+        if self.settings.arch != "x86":
+            ineffective.append("386")
+        if self.settings.arch not in ("x86", "x86_64"):
+            ineffective.append("no_sse2")
+        if self.settings.os == "Windows":
+            # Configure always gets no-asm there
+            ineffective.append("no_asm")
+            ineffective.append("pgo")
+        return ineffective
 
     def config(self):
         if not self.settings.os == "iOS":
@@ -93,8 +143,18 @@ class OpenSSLConan(ConanFile):
             return "openssl-%s" % self.version
 
     def build(self):
+        if self.options.binary_cache:
+            with report.phase("binary_cache_lookup"):
+                if binary_cache.check(self, self.recipe_folder):
+                    return
+
         if self.settings.os == "iOS":
-            self.run("cd %s && ./build-libssl.sh --version=%s" % (self.builder_ios_folder, self.version))
+            if self.options.compiler_cache:
+                self.output.warn("compiler_cache is not supported by build-libssl.sh")
+            if self.options.benchmark:
+                self.output.warn("The iOS libraries cannot be benchmarked on the build machine")
+            with report.phase("compile"):
+                self.run("cd %s && ./build-libssl.sh --version=%s" % (self.builder_ios_folder, self.version))
         else:
             config_options_string = ""
     
@@ -114,25 +174,76 @@ class OpenSSLConan(ConanFile):
                                                                     self.deps_cpp_info["electric-fence"].include_paths[0],
                                                                     libs)
                 else:
-                    replace_in_file("./openssl-%s/Configure" % self.version, "::-lefence::", "::")
-                    replace_in_file("./openssl-%s/Configure" % self.version, "::-lefence ", "::")
+                    with report.phase("patch"):
+                        replace_in_file("./openssl-%s/Configure" % self.version, "::-lefence::", "::")
+                        replace_in_file("./openssl-%s/Configure" % self.version, "::-lefence ", "::")
                 
                 self.output.warn("=====> Options: %s" % config_options_string)
     
+            skipped_options = (self.build_only_options + self.package_layout_options + self.recipe_build_options +
+                               self._ineffective_options())
             for option_name in self.options.values.fields:
+                if option_name in skipped_options:
+                    continue
                 activated = getattr(self.options, option_name)
                 if activated:
                     self.output.info("Activated option! %s" % option_name)
                     config_options_string += " %s" % option_name.replace("_", "-")
     
+            # Full compiler output goes to the log, the console gets progress and the tail of the log on failure
+            log_path = os.path.abspath(self.build_log_filename)
+
             def run_in_src(command, show_output=False):
-                command = 'cd openssl-%s && %s' % (self.version, command)
-                if not show_output and self.settings.os != "Windows":
-                    command += ' | while read line; do echo -n "."; done'
-                self.run(command)
-                self.output.writeln(" ")
+                if show_output:
+                    self.run('cd openssl-%s && %s' % (self.version, command))
+                else:
+                    run_logged(command, log_path, self.output, cwd="openssl-%s" % self.version)
+
+            def library_digests():
+                digests = {}
+                for name in self.built_libraries:
+                    path = os.path.join(self.subfolder, name)
+                    if os.path.exists(path):
+                        # cversion.o embeds the build date
+                        digests[name] = library_digest(path, ignore_members=["cversion.o"])
+                return digests
+
+            compiler_cache = None
+            if self.options.compiler_cache and self.settings.os != "Windows":
+                compiler_cache = CompilerCache(os.getcwd(), self.output)
+
+            def make(extra_variables=""):
+                jobs = job_count(self.memory_per_job, self.output)
+                variables = ("%s %s" % (self._make_variables(compiler_cache), extra_variables)).strip()
+                if jobs == 1:
+                    run_in_src("make %s" % variables)
+                    return
+
+                for makefile in self.racy_makefiles:
+                    self._serialize_makefile(os.path.join(self.subfolder, makefile))
+                try:
+                    # Objects in parallel; the shared libraries are linked through Makefile.shared in a serial pass
+                    run_in_src("make -j%s build_libs SHARED_LIBS= %s" % (jobs, variables))
+                    run_in_src("make build_libs %s" % variables)
+                    run_in_src("make -j%s %s" % (jobs, variables))
+                except Exception:
+                    self.output.warn("Parallel make of OpenSSL failed, rebuilding serially")
+                    run_in_src("make clean")
+                    run_in_src("make %s" % variables)
+                    return
+
+                if self.options.verify_parallel_make:
+                    parallel = library_digests()
+                    self.output.info("Rebuilding serially to verify the parallel build")
+                    run_in_src("make clean")
+                    run_in_src("make %s" % variables)
+                    serial = library_digests()
+                    different = sorted(name for name in set(parallel) | set(serial) if parallel.get(name) != serial.get(name))
+                    if different:
+                        raise ConanException("Parallel and serial builds differ: %s" % ", ".join(different))
+                    self.output.info("Parallel and serial builds produced the same %s" % ", ".join(sorted(serial)))
     
-            def unix_make(config_options_string):
+            def unix_make(config_options_string, stage="", make_variables=""):
                 self.output.warn("----------CONFIGURING OPENSSL %s-------------" % self.version)
                 m32_suff = " -m32" if self.settings.arch == "x86" else ""
                 if self.settings.os == "Linux":
@@ -142,26 +253,36 @@ class OpenSSLConan(ConanFile):
                     m32_pref = "setarch i386" if self.settings.arch == "x86" else ""
                     config_line = "%s ./config -fPIC %s %s" % (m32_pref, config_options_string, m32_suff)
                     self.output.warn(config_line)
-                    run_in_src(config_line)
-                    run_in_src("make depend")
+                    with report.phase("configure" + stage):
+                        run_in_src(config_line)
+                    with report.phase("depend" + stage):
+                        run_in_src("make depend")
                     self.output.warn("----------MAKE OPENSSL %s-------------" % self.version)
-                    run_in_src("make")
+                    with session(compiler_cache), report.phase("compile" + stage):
+                        make(make_variables)
                 elif self.settings.os == "Macos":
                     if self.settings.arch == "x86_64":
                         command = "./Configure darwin64-x86_64-cc %s" % config_options_string
                     else:
                         command = "./config %s %s" % (config_options_string, m32_suff)
-                    run_in_src(command)
+                    with report.phase("configure" + stage):
+                        run_in_src(command)
                     # REPLACE -install_name FOR FOLLOW THE CONAN RULES,
                     # DYNLIBS IDS AND OTHER DYNLIB DEPS WITHOUT PATH, JUST THE LIBRARY NAME
                     old_str = 'SHAREDFLAGS="$$SHAREDFLAGS -install_name $(INSTALLTOP)/$(LIBDIR)/$$SHLIB$'
                     new_str = 'SHAREDFLAGS="$$SHAREDFLAGS -install_name $$SHLIB$'
-                    replace_in_file("./openssl-%s/Makefile.shared" % self.version, old_str, new_str)
+                    with report.phase("patch"):
+                        replace_in_file("./openssl-%s/Makefile.shared" % self.version, old_str, new_str)
                     self.output.warn("----------MAKE OPENSSL %s-------------" % self.version)
-                    run_in_src("make")
+                    with session(compiler_cache), report.phase("compile" + stage):
+                        make(make_variables)
     
             def windows_make(config_options_string):
                 self.output.warn("----------CONFIGURING OPENSSL FOR WINDOWS. %s-------------" % self.version)
+                if self.options.compiler_cache:
+                    self.output.warn("compiler_cache is not supported by the nmake build")
+                if self.options.pgo:
+                    self.output.warn("pgo is not supported by the nmake build")
                 debug = "debug-" if self.settings.build_type == "Debug" else ""
                 arch = "32" if self.settings.arch == "x86" else "64A"
                 configure_type = debug + "VC-WIN" + arch
@@ -169,30 +290,31 @@ class OpenSSLConan(ConanFile):
                 config_command = "perl Configure %s no-asm --prefix=../binaries" % configure_type
                 whole_command = "%s %s -UOPENSSL_USE_APPLINK" % (config_command, config_options_string)
                 self.output.warn(whole_command)
-                run_in_src(whole_command)
-    
-                if self.options.no_asm:
-                    run_in_src("ms\do_nasm")
+                with report.phase("configure"):
+                    run_in_src(whole_command)
     
-                if arch == "64A":
-                    run_in_src("ms\do_win64a")
-                else:
-                    run_in_src("ms\do_ms")
+                    if arch == "64A":
+                        run_in_src("ms\do_win64a")
+                    else:
+                        run_in_src("ms\do_ms")
                 runtime = self.settings.compiler.runtime
-                # Replace runtime in ntdll.mak and nt.mak
-                replace_in_file("./openssl-%s/ms/ntdll.mak" % self.version, "/MD ", "/%s " % runtime)
-                replace_in_file("./openssl-%s/ms/nt.mak" % self.version, "/MT ", "/%s " % runtime)
-                replace_in_file("./openssl-%s/ms/ntdll.mak" % self.version, "/MDd ", "/%s " % runtime)
-                replace_in_file("./openssl-%s/ms/nt.mak" % self.version, "/MTd ", "/%s " % runtime)
+                with report.phase("patch"):
+                    # Replace runtime in ntdll.mak and nt.mak
+                    replace_in_file("./openssl-%s/ms/ntdll.mak" % self.version, "/MD ", "/%s " % runtime)
+                    replace_in_file("./openssl-%s/ms/nt.mak" % self.version, "/MT ", "/%s " % runtime)
+                    replace_in_file("./openssl-%s/ms/ntdll.mak" % self.version, "/MDd ", "/%s " % runtime)
+                    replace_in_file("./openssl-%s/ms/nt.mak" % self.version, "/MTd ", "/%s " % runtime)
 
-                replace_in_file("./openssl-%s/ms/ntdll.mak" % self.version, "-DOPENSSL_USE_APPLINK", "")
-                replace_in_file("./openssl-%s/ms/nt.mak"    % self.version, "-DOPENSSL_USE_APPLINK", "")
+                    replace_in_file("./openssl-%s/ms/ntdll.mak" % self.version, "-DOPENSSL_USE_APPLINK", "")
+                    replace_in_file("./openssl-%s/ms/nt.mak"    % self.version, "-DOPENSSL_USE_APPLINK", "")
 
                 self.output.warn(os.curdir)
                 make_command = "nmake -f ms\\ntdll.mak" if self.options.shared else "nmake -f ms\\nt.mak "
                 self.output.warn("----------MAKE OPENSSL %s-------------" % self.version)
-                run_in_src(make_command)
-                run_in_src("%s install" % make_command)
+                with report.phase("compile"):
+                    run_in_src(make_command)
+                with report.phase("install"):
+                    run_in_src("%s install" % make_command)
                 # Rename libs with the arch
                 renames = {"./binaries/lib/libeay32.lib": "./binaries/lib/libeay32%s.lib" % runtime,
                            "./binaries/lib/ssleay32.lib": "./binaries/lib/ssleay32%s.lib" % runtime}
@@ -201,41 +323,198 @@ class OpenSSLConan(ConanFile):
                         os.rename(old, new)
     
             if self.settings.os == "Linux" or self.settings.os == "Macos" or self.settings.os == "iOS":
-                unix_make(config_options_string)
+                if self.options.pgo:
+                    self._pgo_build(unix_make, config_options_string, run_in_src)
+                else:
+                    unix_make(config_options_string)
             elif self.settings.os == "Windows":
                 windows_make(config_options_string)
+
+            if self.options.benchmark:
+                with report.phase("benchmark"):
+                    self._benchmark_stage()
     
             self.output.info("----------BUILD END-------------")
             return
 
-    def package(self):
-        self.copy("FindOpenSSL.cmake", ".", ".")
-        self.copy(pattern="*applink.c", dst="include/openssl/", keep_path=False)
+    def _pgo_build(self, unix_make, config_options_string, run_in_src):
+        # The default build is benchmarked first, then an instrumented build runs the training workload and the
+        # last build uses its profile together with LTO. Extra ./config arguments starting with - go to CFLAG,
+        # which OpenSSL also passes when linking the shared libraries and the apps
+        clang = "clang" in str(self.settings.compiler)
+        profile_folder = os.path.abspath("pgo_profile")
+        shutil.rmtree(profile_folder, ignore_errors=True)
+        os.makedirs(profile_folder)
+
+        unix_make(config_options_string, "_baseline")
+        with report.phase("benchmark_baseline"):
+            baseline = self._benchmark("baseline")
+        run_in_src("make clean")
+
+        if clang:
+            generate = "-fprofile-instr-generate=%s" % os.path.join(profile_folder, "openssl-%p.profraw")
+        else:
+            generate = "-fprofile-generate=%s" % profile_folder
+        unix_make("%s %s" % (config_options_string, generate), "_instrumented")
+        with report.phase("pgo_training"):
+            self._benchmark("training")
+        run_in_src("make clean")
+
+        make_variables = ""
+        if clang:
+            profile = os.path.join(profile_folder, "openssl.profdata")
+            profraw = [os.path.join(profile_folder, name) for name in os.listdir(profile_folder) if name.endswith(".profraw")]
+            with report.phase("pgo_merge"):
+                self.run("%s merge -output=%s %s" % (self._llvm_tool("llvm-profdata"), profile, " ".join(profraw)))
+            use = "-fprofile-instr-use=%s -flto" % profile
+            if self.settings.os != "Macos":
+                # The archives hold LLVM bitcode, the Xcode ar and ranlib read it through libLTO
+                make_variables = 'AR="%s r" RANLIB="%s"' % (self._llvm_tool("llvm-ar"), self._llvm_tool("llvm-ranlib"))
+        else:
+            # Fat LTO objects keep the static libraries usable by the plain ar and by consumers linking without LTO
+            use = "-fprofile-use=%s -fprofile-correction -flto=%d -ffat-lto-objects" % (
+                profile_folder, job_count(self.memory_per_job, self.output))
+        unix_make("%s %s" % (config_options_string, use), "_optimized", make_variables)
+        with report.phase("benchmark_optimized"):
+            optimized = self._benchmark("optimized")
+
+        geomean, ratios = bench.speedup(baseline, optimized)
+        if geomean is not None:
+            self.output.info("PGO+LTO build: %+.1f%% over the default build (geometric mean of %d benchmarks)" %
+                             ((geomean - 1) * 100, len(ratios)))
+        report.record("pgo", {"baseline": baseline, "optimized": optimized, "speedup": geomean, "ratios": ratios})
+
+    def _llvm_tool(self, name):
+        tool = os.environ.get(name.upper().replace("-", "_")) or which(name)
+        if tool is None and self.settings.os == "Macos":
+            tool = "xcrun %s" % name
+        if tool is None:
+            raise ConanException("pgo with clang needs %s, install it or set %s" % (name, name.upper().replace("-", "_")))
+        return tool
+
+    def _openssl_binary(self):
+        # (openssl, folder of its shared libraries) of the build tree, nmake installs to ./binaries
         if self.settings.os == "Windows":
-            self._copy_visual_binaries()
-            if self.settings.compiler == "gcc" :
+            return os.path.abspath("binaries/bin/openssl.exe"), os.path.abspath("binaries/bin")
+        return os.path.abspath(os.path.join(self.subfolder, "apps", "openssl")), os.path.abspath(self.subfolder)
+
+    def _benchmark(self, name):
+        openssl, library_folder = self._openssl_binary()
+        return bench.openssl_benchmark(openssl, bench.enabled_algorithms(self.options), bench.EVP_CIPHERS,
+                                       os.path.abspath(os.path.join(self.subfolder, "apps", "openssl.cnf")),
+                                       os.path.abspath(os.path.join("benchmark", name)),
+                                       bench.openssl_environment(library_folder), rsa=not self.options.no_rsa)
+
+    def _benchmark_stage(self):
+        # Single process and -multi throughput of every algorithm the options left enabled, plus loopback handshakes,
+        # compared with the stored results of the same package ID
+        results = self._benchmark("package")
+        cores = multiprocessing.cpu_count()
+        if cores > 1 and self.settings.os != "Windows":
+            openssl, library_folder = self._openssl_binary()
+            multi = bench.speed_suite(openssl, bench.enabled_algorithms(self.options), bench.EVP_CIPHERS,
+                                      bench.openssl_environment(library_folder), multi=cores)
+            results.update(("%s/multi%d" % (name, cores), value) for name, value in multi.items())
+        report.record("benchmark", results)
+
+        regressed = bench.check_baseline(self.name, self.version, report.package_id(self), results, self.output)
+        if regressed:
+            raise ConanException(bench.describe(regressed))
+
+    def _make_variables(self, compiler_cache):
+        # Puts the launcher in front of the compiler Configure wrote to the Makefile, the top Makefile
+        # hands CC down to every sub-make
+        if compiler_cache is None:
+            return ""
+        with open(os.path.join(self.subfolder, "Makefile")) as f:
+            match = re.search(r"^CC=\s*(.+?)\s*$", f.read(), re.MULTILINE)
+        if not match:
+            self.output.warn("No CC in the OpenSSL Makefile, building without the compiler cache")
+            return ""
+        return 'CC="%s %s"' % (" ".join(compiler_cache.launcher), match.group(1))
+
+    def _serialize_makefile(self, path):
+        # Sibling targets such as "lib" and "subdirs" of crypto/Makefile both run ar on libcrypto.a, with
+        # .NOTPARALLEL they run one after the other while every sub-make still compiles its objects in parallel
+        with open(path) as f:
+            content = f.read()
+        if not content.startswith(".NOTPARALLEL:"):
+            with open(path, "w") as f:
+                f.write(".NOTPARALLEL:\n" + content)
+
+    def package(self):
+        if self.options.binary_cache:
+            with report.phase("binary_cache_restore"):
+                restored = binary_cache.restore(self)
+            if restored:
+                report.publish(self)
+                return
+
+        with report.phase("package"):
+            self.copy("FindOpenSSL.cmake", ".", ".")
+            self.copy(pattern="*applink.c", dst="include/openssl/", keep_path=False)
+            if self.settings.os == "Windows":
+                self._copy_visual_binaries()
+                if self.settings.compiler == "gcc" :
+                    self.copy("*.a", "lib", keep_path=False)
+                self.copy(pattern="*.h", dst="include/openssl/", src="binaries/include/", keep_path=False)
+            elif self.settings.os == "iOS":
+                # build-libssl.sh only builds static libraries, shared is not part of the package ID there
                 self.copy("*.a", "lib", keep_path=False)
-            self.copy(pattern="*.h", dst="include/openssl/", src="binaries/include/", keep_path=False)
-        else:
-            if self.options.shared:
-                self.copy(pattern="*libcrypto*.dylib", dst="lib", keep_path=False)
-                self.copy(pattern="*libssl*.dylib", dst="lib", keep_path=False)
-                self.copy(pattern="*libcrypto.so*", dst="lib", keep_path=False)
-                self.copy(pattern="*libssl.so*", dst="lib", keep_path=False)
+                self.copy(pattern="%s/include/*" % self.subfolder, dst="include/openssl/", keep_path=False)
             else:
-                self.copy("*.a", "lib", keep_path=False)
-            self.copy(pattern="%s/include/*" % self.subfolder, dst="include/openssl/", keep_path=False)
+                if self.options.shared:
+                    self.copy(pattern="*libcrypto*.dylib", dst="lib", keep_path=False)
+                    self.copy(pattern="*libssl*.dylib", dst="lib", keep_path=False)
+                    self.copy(pattern="*libcrypto.so*", dst="lib", keep_path=False)
+                    self.copy(pattern="*libssl.so*", dst="lib", keep_path=False)
+                else:
+                    self.copy("*.a", "lib", keep_path=False)
+                self.copy(pattern="%s/include/*" % self.subfolder, dst="include/openssl/", keep_path=False)
+            self._write_cmake_config()
+        if self.options.split_debug:
+            with report.phase("split_debug"):
+                debug_symbols.split(self)
+        if self.options.binary_cache:
+            with report.phase("binary_cache_store"):
+                binary_cache.store(self, self.recipe_folder)
+        report.publish(self)
 
     def _copy_visual_binaries(self):
         self.copy(pattern="*.lib", dst="lib", src="binaries/lib", keep_path=False)
         self.copy(pattern="*.dll", dst="bin", src="binaries/bin", keep_path=False)
         self.copy(pattern="*.dll", dst="bin", src="binaries/bin", keep_path=False)
 
-    def package_info(self):
+    def _libraries(self):
+        """The ssl and crypto library names and the system libraries they need."""
         if self.settings.os == "Windows":
             suffix = str(self.settings.compiler.runtime)
-            self.cpp_info.libs = ["ssleay32" + suffix, "libeay32" + suffix, "crypt32", "msi"]
+            return "ssleay32" + suffix, "libeay32" + suffix, ["crypt32", "msi"]
         elif self.settings.os == "Linux":
-            self.cpp_info.libs = ["ssl", "crypto", "dl"]
+            return "ssl", "crypto", ["dl"]
         else:
-            self.cpp_info.libs = ["ssl", "crypto"]
+            return "ssl", "crypto", []
+
+    def _write_cmake_config(self):
+        # The targets and variables of CMake's FindOpenSSL, with the names of package_info()
+        ssl, crypto, system_libs = self._libraries()
+        if not self.options.no_zlib and not self.options.zlib_dynamic:
+            # libcrypto links to the zlib package, conan_basic_setup() puts its library folder in the link path
+            system_libs = system_libs + ["${CONAN_LIBS_ZLIB}"]
+        targets = [cmake_config.library_target(self, "OpenSSL::Crypto", crypto, system_libs),
+                   cmake_config.library_target(self, "OpenSSL::SSL", ssl, ["OpenSSL::Crypto"])]
+        variables = [("OPENSSL_FOUND",          "TRUE"),
+                     ("OPENSSL_VERSION",        self.version),
+                     ("OPENSSL_ROOT_DIR",       "@PREFIX@"),
+                     ("OPENSSL_INCLUDE_DIR",    "@PREFIX@/include"),
+                     ("OPENSSL_SSL_LIBRARY",    "OpenSSL::SSL"),
+                     ("OPENSSL_CRYPTO_LIBRARY", "OpenSSL::Crypto"),
+                     ("OPENSSL_LIBRARIES",      "OpenSSL::SSL;OpenSSL::Crypto")]
+        cmake_config.write(self, "OpenSSL", targets, variables)
+        cmake_config.fast_path(self, "FindOpenSSL.cmake", "OpenSSL")
+
+    def package_info(self):
+        ssl, crypto, system_libs = self._libraries()
+        self.cpp_info.libs = [ssl, crypto] + system_libs
+        if self.options.split_debug:
+            debug_symbols.package_info(self)
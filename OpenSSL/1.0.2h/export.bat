@@ -1,2 +1,4 @@
 @echo off
+if exist hykerbuild rmdir /s /q hykerbuild
+xcopy /e /i /q ..\..\hykerbuild hykerbuild > nul
 conan export hykersec
\ No newline at end of file
@@ -0,0 +1,3 @@
+@echo off
+cd /d %~dp0
+python -m hykerbuild.orchestrator %*
\ No newline at end of file
@@ -1,7 +1,3 @@
 @echo off
-for /r %%X in (*export.bat) do (
-	setlocal
-	cd %%~dpX
-	call %%X
-	endlocal
-)
\ No newline at end of file
+cd /d %~dp0
+python -m hykerbuild.orchestrator --export-only %*
\ No newline at end of file
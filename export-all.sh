@@ -1,6 +1,2 @@
 #!/bin/sh
-for f in `find . -name 'export.sh'`; do
-    (cd `dirname $f` && ./`basename $f`)
-done
-
-
+cd `dirname $0` && python -m hykerbuild.orchestrator --export-only "$@"
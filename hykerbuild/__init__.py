@@ -0,0 +1,5 @@
+"""Build helpers shared by the recipes in this repository.
+
+The package only depends on the Python standard library so it can be used both
+from inside a conanfile and from the command line tools at the repository root.
+"""
@@ -0,0 +1,66 @@
+"""Comparison of built libraries that ignores what legitimately differs between two builds."""
+import hashlib
+import platform
+import subprocess
+
+
+def ar_members(path):
+    """Return the sorted (name, sha256) pairs of the members of a static library.
+
+    The ar headers (timestamps, uid, ...) and the symbol index are ignored, the
+    index only depends on the member order.
+    """
+    members = []
+    with open(path, "rb") as f:
+        if f.read(8) != b"!<arch>\n":
+            raise ValueError("%s is not an ar archive" % path)
+        long_names = b""
+        while True:
+            header = f.read(60)
+            if len(header) < 60:
+                break
+            name = header[0:16].rstrip()
+            size = int(header[48:58])
+            data = f.read(size)
+            if size % 2:
+                f.read(1)
+
+            if name.startswith(b"#1/"):
+                # BSD: the name is stored at the start of the data
+                length = int(name[3:])
+                name, data = data[:length].rstrip(b"\0"), data[length:]
+            if name in (b"/", b"/SYM64/", b"__.SYMDEF", b"__.SYMDEF SORTED"):
+                continue
+            if name == b"//":
+                long_names = data
+                continue
+            if name.startswith(b"/") and name[1:].isdigit():
+                offset = int(name[1:])
+                name = long_names[offset:long_names.index(b"/\n", offset)]
+            members.append((name.rstrip(b"/").decode("utf-8", "replace"), hashlib.sha256(data).hexdigest()))
+    return sorted(members)
+
+
+def exported_symbols(path):
+    """Return the sorted defined dynamic symbols of a shared library."""
+    if platform.system() == "Darwin":
+        command = ["nm", "-gU", path]
+    else:
+        command = ["nm", "-D", "--defined-only", path]
+    output = subprocess.check_output(command).decode()
+    symbols = set()
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            symbols.add(" ".join(fields[-2:]))
+    return sorted(symbols)
+
+
+def library_digest(path, ignore_members=()):
+    """Digest of a library that is stable across rebuilds producing the same code."""
+    if path.endswith(".a") or path.endswith(".lib"):
+        members = [member for member in ar_members(path) if member[0] not in ignore_members]
+        content = "\n".join("%s %s" % member for member in members)
+    else:
+        content = "\n".join(exported_symbols(path))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
@@ -0,0 +1,55 @@
+"""Cache of the bootstrapped Boost.Build engine.
+
+b2 only depends on the Boost version and the host toolchain, so the binaries
+(and the project-config.jam) produced by ``bootstrap`` are kept under
+``<cache root>/b2`` and copied into every other Boost source tree with the same
+key instead of compiling the engine again.
+"""
+import os
+import platform
+import shutil
+import tempfile
+
+from hykerbuild.util import HykerBuildError, FileLock, cache_root, mkdirs, sha256_text
+
+BOOTSTRAP_OUTPUTS = ["b2", "bjam", "b2.exe", "bjam.exe", "project-config.jam"]
+
+
+def b2_key(version, toolset):
+    return "%s-%s-%s-%s" % (version, platform.system(), platform.machine(), toolset or "default")
+
+
+class B2Cache(object):
+    def __init__(self, root=None, output=None):
+        self.root   = root or os.path.join(cache_root(), "b2")
+        self.output = output
+
+    def _info(self, message):
+        if self.output:
+            self.output.info(message)
+
+    def bootstrap(self, folder, key, bootstrap):
+        """Copy a cached engine into ``folder`` or call ``bootstrap()`` and cache its outputs."""
+        entry = os.path.join(self.root, "%s-%s" % (key, sha256_text(key)[:8]))
+        with FileLock(entry + ".lock"):
+            if os.path.isdir(entry):
+                for name in os.listdir(entry):
+                    shutil.copy2(os.path.join(entry, name), os.path.join(folder, name))
+                self._info("Using cached b2 engine %s" % entry)
+                return
+
+            bootstrap()
+
+            temp = tempfile.mkdtemp(dir=mkdirs(self.root))
+            try:
+                for name in BOOTSTRAP_OUTPUTS:
+                    path = os.path.join(folder, name)
+                    if os.path.isfile(path):
+                        shutil.copy2(path, os.path.join(temp, name))
+                if not set(os.listdir(temp)) & set(["b2", "b2.exe"]):
+                    raise HykerBuildError("bootstrap did not produce b2 in %s" % folder)
+                os.rename(temp, entry)
+            except Exception:
+                shutil.rmtree(temp, ignore_errors=True)
+                raise
+            self._info("Cached b2 engine in %s" % entry)
@@ -0,0 +1,314 @@
+"""Benchmarks run with the tools of a build tree: openssl and cryptest.
+
+``openssl_benchmark()`` runs ``openssl speed -mr`` on a list of algorithms and
+a TLS handshake loop (``s_time`` against an ``s_server`` on localhost) and
+returns flat metrics where higher is better:
+
+    "aes-128 cbc@8192"    bytes per second for 8192 byte blocks
+    "rsa2048_sign"        operations per second
+    "handshakes_new"      full handshakes per second
+    "handshakes_reuse"    resumed handshakes per second
+
+``cryptest_benchmark()`` runs the benchmarks of Crypto++ (``cryptest b``) and
+parses the HTML tables it prints into the same kind of metrics: MiB/second of
+the symmetric algorithms and hashes, operations per second of the public key
+ones.
+
+``speedup()`` compares two such results.
+
+Benchmark results are kept in JSON files keyed by package ID,
+``<HYKER_BENCHMARK_DIR>/<name>-<version>.json`` (default
+``<cache root>/benchmarks``).  ``regressions()`` compares new results with the
+stored ones of the same package ID, or with HYKER_BENCHMARK_BASELINE when it
+points to another such file.  Gating is enabled by HYKER_BENCHMARK_THRESHOLD,
+the largest accepted drop of any metric in percent; results that fail it are
+not stored, so they never become the baseline of the next run.
+"""
+import json
+import math
+import os
+import platform
+import re
+import socket
+import subprocess
+import time
+
+from hykerbuild.util import HykerBuildError, FileLock, cache_root, mkdirs
+
+# speed algorithm, option of the recipe that disables it
+SPEED_ALGORITHMS = [
+    ("aes-128-cbc", None),
+    ("aes-256-cbc", None),
+    ("sha1",        "no_sha"),
+    ("sha256",      "no_sha"),
+    ("md5",         "no_md5"),
+    ("des-ede3",    "no_des"),
+    ("rc4",         "no_rc4"),
+    ("rsa2048",     "no_rsa"),
+    ("dsa2048",     "no_dsa"),
+    ("ecdhp256",    None),
+    ("ecdsap256",   None)
+]
+# Run through EVP, the interface TLS uses, e.g. AES-NI and the stitched GCM code
+EVP_CIPHERS = ["aes-128-gcm"]
+
+
+def enabled_algorithms(options):
+    return [name for name, option in SPEED_ALGORITHMS if option is None or not getattr(options, option)]
+
+
+def openssl_environment(library_folder):
+    """Environment running a build tree's openssl binary against the shared libraries of that tree."""
+    env = dict(os.environ)
+    for name in ("LD_LIBRARY_PATH", "DYLD_LIBRARY_PATH"):
+        env[name] = os.pathsep.join(filter(None, [os.path.abspath(library_folder), env.get(name)]))
+    return env
+
+
+def parse_speed(output):
+    """Metrics of ``openssl speed -mr`` output."""
+    sizes = []
+    results = {}
+    for line in output.splitlines():
+        fields = line.strip().split(":")
+        if fields[0] == "+H":
+            sizes = fields[1:]
+        elif fields[0] == "+F":
+            for size, value in zip(sizes, fields[3:]):
+                results["%s@%s" % (fields[2], size)] = float(value)
+        elif fields[0] in ("+F2", "+F3", "+F4"):
+            # Seconds per sign and per verify, the format of OpenSSL 1.0.2
+            kind = {"+F2": "rsa", "+F3": "dsa", "+F4": "ecdsa"}[fields[0]]
+            for name, seconds in zip(("sign", "verify"), fields[3:5]):
+                if float(seconds):
+                    results["%s%s_%s" % (kind, fields[2], name)] = 1.0 / float(seconds)
+        elif fields[0] == "+F5" and float(fields[3]):
+            results["ecdh%s" % fields[2]] = 1.0 / float(fields[3])
+    return results
+
+
+def speed(openssl, algorithms, env=None, evp=None, multi=None):
+    command = [openssl, "speed", "-mr", "-elapsed"]
+    if multi:
+        command += ["-multi", str(multi)]
+    command += ["-evp", evp] if evp else list(algorithms)
+    output = subprocess.check_output(command, env=env, stderr=subprocess.STDOUT).decode("utf-8", "replace")
+    results = parse_speed(output)
+    if not results:
+        raise HykerBuildError("No result in the output of %s:\n%s" % (" ".join(command), output[-2000:]))
+    return results
+
+
+def free_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
+
+
+def _wait_listening(port, process, timeout=30):
+    start = time.time()
+    while time.time() - start < timeout:
+        if process.poll() is not None:
+            raise HykerBuildError("openssl s_server exited with %s" % process.returncode)
+        try:
+            socket.create_connection(("127.0.0.1", port), 1).close()
+            return
+        except socket.error:
+            time.sleep(0.2)
+    raise HykerBuildError("openssl s_server is not listening on port %d" % port)
+
+
+def server_certificate(openssl, folder, config, env=None, rsa=True):
+    """Self-signed key and certificate for localhost, an ECDSA one when RSA is disabled."""
+    mkdirs(folder)
+    key, certificate = os.path.join(folder, "key.pem"), os.path.join(folder, "cert.pem")
+    if rsa:
+        new_key = "rsa:2048"
+    else:
+        new_key = "ec:%s" % os.path.join(folder, "prime256v1.pem")
+        subprocess.check_call([openssl, "ecparam", "-name", "prime256v1", "-out", new_key[3:]], env=env)
+    with open(os.devnull, "w") as devnull:
+        subprocess.check_call([openssl, "req", "-x509", "-nodes", "-newkey", new_key, "-days", "1", "-subj", "/CN=localhost",
+                               "-config", config, "-keyout", key, "-out", certificate],
+                              env=env, stdout=devnull, stderr=devnull)
+    return key, certificate
+
+
+def handshakes(openssl, key, certificate, env=None, seconds=10):
+    """Full and resumed handshakes per second of s_time against a local s_server."""
+    port = free_port()
+    with open(os.devnull, "r+") as devnull:
+        server = subprocess.Popen([openssl, "s_server", "-accept", str(port), "-cert", certificate, "-key", key, "-www", "-quiet"],
+                                  env=env, stdin=devnull, stdout=devnull, stderr=devnull)
+        try:
+            _wait_listening(port, server)
+            results = {}
+            for mode in ("new", "reuse"):
+                output = subprocess.check_output([openssl, "s_time", "-connect", "127.0.0.1:%d" % port, "-" + mode,
+                                                  "-time", str(seconds)], env=env, stderr=subprocess.STDOUT)
+                match = re.search(r"(\d+) connections in (\d+) real seconds", output.decode("utf-8", "replace"))
+                if match and int(match.group(2)):
+                    results["handshakes_%s" % mode] = float(match.group(1)) / int(match.group(2))
+            return results
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def speed_suite(openssl, algorithms, evp_ciphers, env=None, multi=None):
+    results = speed(openssl, algorithms, env, multi=multi)
+    for cipher in evp_ciphers:
+        results.update(speed(openssl, None, env, evp=cipher, multi=multi))
+    return results
+
+
+def openssl_benchmark(openssl, algorithms, evp_ciphers, config, work_folder, env=None, rsa=True, handshake_seconds=10):
+    results = speed_suite(openssl, algorithms, evp_ciphers, env)
+    key, certificate = server_certificate(openssl, work_folder, config, env, rsa)
+    results.update(handshakes(openssl, key, certificate, env, handshake_seconds))
+    return results
+
+
+def speedup(baseline, results):
+    """(geometric mean of the ratios, ratio per metric) of the metrics both results have."""
+    ratios = dict((name, results[name] / baseline[name]) for name in baseline if results.get(name, 0) > 0 and baseline[name] > 0)
+    if not ratios:
+        return None, ratios
+    return math.exp(sum(math.log(ratio) for ratio in ratios.values()) / len(ratios)), ratios
+
+
+def cpu_ghz():
+    """Nominal CPU frequency in GHz from HYKER_CPU_GHZ or the system, None when unknown."""
+    if os.environ.get("HYKER_CPU_GHZ"):
+        return float(os.environ["HYKER_CPU_GHZ"])
+    try:
+        if platform.system() == "Darwin":
+            return int(subprocess.check_output(["sysctl", "-n", "hw.cpufrequency"]).decode().strip()) / 1e9
+        with open("/proc/cpuinfo") as f:
+            match = re.search(r"^cpu MHz\s*:\s*([\d.]+)", f.read(), re.MULTILINE)
+        return float(match.group(1)) / 1000 if match else None
+    except (IOError, OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+
+def _cell(text):
+    return re.sub(r"<[^>]*>", " ", text).strip()
+
+
+def parse_cryptest(output):
+    """{algorithm: {column: value}} of the HTML tables printed by ``cryptest b``."""
+    tables = {}
+    columns = []
+    for row in re.split(r"<TR>", output, flags=re.IGNORECASE)[1:]:
+        row = re.split(r"</?TABLE", row, flags=re.IGNORECASE)[0]
+        cells = re.split(r"<(TH|TD)[^>]*>", row, flags=re.IGNORECASE)[1:]
+        cells = [(cells[i].upper(), _cell(cells[i + 1])) for i in range(0, len(cells) - 1, 2)]
+        if cells and all(kind == "TH" for kind, _ in cells):
+            columns = [text for _, text in cells]
+            continue
+        if len(cells) < 2 or not columns:
+            continue
+        values = {}
+        for column, (_, text) in zip(columns[1:], cells[1:]):
+            try:
+                values[column] = float(text)
+            except ValueError:
+                pass
+        tables[cells[0][1]] = values
+    return tables
+
+
+def cryptest_metrics(tables):
+    results = {}
+    for name, values in tables.items():
+        for column, value in values.items():
+            if column.startswith("MiB/Second") or column.startswith("MB/Second"):
+                results[name] = value
+            elif column.startswith("Milliseconds/Operation") and value > 0:
+                results[name] = 1000.0 / value
+    return results
+
+
+def cryptest_benchmark(cryptest, cwd, seconds=1, env=None):
+    """(tables, metrics) of ``cryptest b``, run in the source folder holding its TestData."""
+    command = [cryptest, "b", str(seconds)]
+    ghz = cpu_ghz()
+    if ghz:
+        # Adds the cycles per byte and per operation columns
+        command.append("%.3f" % ghz)
+    output = subprocess.check_output(command, cwd=cwd, env=env, stderr=subprocess.STDOUT).decode("utf-8", "replace")
+    tables = parse_cryptest(output)
+    if not tables:
+        raise HykerBuildError("No result in the output of %s:\n%s" % (" ".join(command), output[-2000:]))
+    return tables, cryptest_metrics(tables)
+
+
+def results_path(name, version):
+    folder = os.environ.get("HYKER_BENCHMARK_DIR") or os.path.join(cache_root(), "benchmarks")
+    return os.path.join(folder, "%s-%s.json" % (name, version))
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def baseline(path, package_id):
+    """Stored results of ``package_id``, from HYKER_BENCHMARK_BASELINE when set, None when there are none."""
+    return _load(os.environ.get("HYKER_BENCHMARK_BASELINE") or path).get(package_id)
+
+
+def store(path, package_id, results):
+    with FileLock(path + ".lock"):
+        stored = _load(path)
+        stored[package_id] = {"host": platform.node(), "time": int(time.time()), "results": results}
+        mkdirs(os.path.dirname(path))
+        with open(path + ".tmp", "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        os.rename(path + ".tmp", path)
+
+
+def threshold():
+    """Largest accepted drop in percent from HYKER_BENCHMARK_THRESHOLD, None when gating is disabled."""
+    value = os.environ.get("HYKER_BENCHMARK_THRESHOLD")
+    return float(value) if value else None
+
+
+def regressions(baseline_results, results, max_drop):
+    """{metric: ratio} of the metrics that dropped more than ``max_drop`` percent."""
+    _, ratios = speedup(baseline_results, results)
+    return dict((name, ratio) for name, ratio in ratios.items() if ratio < 1 - max_drop / 100.0)
+
+
+def check_baseline(name, version, package_id, results, output):
+    """Compare ``results`` with the baseline of ``package_id`` and store them unless they fail the threshold.
+
+    Returns the regressed metrics, see ``regressions()``, empty when the results were stored.
+    """
+    path = results_path(name, version)
+    previous = baseline(path, package_id)
+    max_drop = threshold()
+    if previous:
+        geomean, ratios = speedup(previous["results"], results)
+        if geomean is not None:
+            output.info("Benchmark: %+.1f%% over the baseline from %s (geometric mean of %d metrics)" %
+                        ((geomean - 1) * 100, previous["host"], len(ratios)))
+        if max_drop is not None:
+            regressed = regressions(previous["results"], results, max_drop)
+            if regressed:
+                return regressed
+    elif max_drop is not None:
+        output.warn("No benchmark baseline for package %s, storing this one" % package_id)
+    store(path, package_id, results)
+    output.info("Benchmark results of %s written to %s" % (package_id, path))
+    return {}
+
+
+def describe(regressed):
+    return "Throughput dropped more than %g%% from the baseline: %s" % (
+        threshold(), ", ".join("%s %+.1f%%" % (name, (ratio - 1) * 100) for name, ratio in sorted(regressed.items())))
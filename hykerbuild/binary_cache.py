@@ -0,0 +1,498 @@
+"""Content-addressed cache of built packages.
+
+A package is stored under a key made of the hash of the recipe folder (the
+conanfile and every file exported next to it) and the conan package ID, which
+covers the settings, the options and the requirements.  build() calls
+``check()`` first: on a hit the build is skipped, and ``restore()`` in
+package() hardlinks the cached files into the package folder.  After a real
+build ``store()`` adds the package to the cache.
+
+Entries live in ``<root>/entries/<key>/`` as a ``files/`` tree and a ``manifest.json``
+holding the sha256 of every file, checked before each restore so an entry
+modified through one of its hardlinks is dropped instead of being used, as is
+one whose paths or symlinks lead outside the package folder.  The least
+recently used entries are evicted once the cache grows over its size limit.
+
+Several machines share packages through HYKER_BINARY_CACHE_URL, any HTTP
+server answering GET and PUT of ``<url>/<key>.tar.gz``; a minimal one is
+started with ``python -m hykerbuild.binary_cache serve <folder> [--port 8765]
+[--bind 127.0.0.1]``.  It only listens on the loopback interface unless told
+otherwise, and is read-only unless HYKER_BINARY_CACHE_TOKEN is set: uploads
+must then carry the same token (``Authorization: Bearer <token>``), which the
+recipes send when HYKER_BINARY_CACHE_TOKEN is set on their side too.  Restored
+packages are not rebuilt, so only the build machines may know the token.
+Remote entries are downloaded into the local cache before being restored.
+
+When there is no entry for the exact key, a recipe may accept a compatible
+one from the local cache, declared with two class attributes:
+
+    compatible_build_types  {"RelWithDebInfo": ["Release"]}: build types whose
+                            binaries may stand in for another one
+    superset_options        options for which a binary built with True covers
+                            a configuration asking for False, e.g. components
+
+Every other setting, option and requirement of the package ID must match.
+
+Environment:
+    HYKER_BINARY_CACHE       local cache folder, defaults to <cache root>/binaries
+    HYKER_BINARY_CACHE_SIZE  size limit, e.g. "50G" (default 20G)
+    HYKER_BINARY_CACHE_URL   shared HTTP cache
+    HYKER_BINARY_CACHE_TOKEN token sent with the uploads, and required by ``serve``
+"""
+import argparse
+import hmac
+import json
+import os
+import posixpath
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError
+
+from hykerbuild.linktree import link_file
+from hykerbuild.report import REPORT_FILENAME
+from hykerbuild.util import (HykerBuildError, FileLock, cache_root, extract_tar, mkdirs, parse_size, sha256_file,
+                             sha256_text, touch)
+
+HIT_MARKER = ".binary_cache_hit"
+MANIFEST   = "manifest.json"
+# Written by conan or by report.publish() after the package is assembled, never cached
+IGNORED    = ("conanmanifest.txt", "conaninfo.txt", REPORT_FILENAME, HIT_MARKER)
+
+
+def recipe_hash(folder):
+    """Hash of the recipe files in ``folder``, ignoring compiled python and conan's manifest."""
+    lines = []
+    for root, folders, files in os.walk(folder):
+        folders[:] = sorted(name for name in folders if name not in ("__pycache__", ".git"))
+        for name in sorted(files):
+            if name.endswith((".pyc", ".pyo")) or name in IGNORED:
+                continue
+            path = os.path.join(root, name)
+            lines.append("%s %s" % (os.path.relpath(path, folder).replace(os.sep, "/"), sha256_file(path)))
+    return sha256_text("\n".join(lines))
+
+
+def _configuration(conanfile):
+    try:
+        return conanfile.info.package_id()
+    except Exception:
+        return "%s\n%s" % (conanfile.settings.values.dumps(), conanfile.options.values.dumps())
+
+
+def package_key(conanfile, recipe_folder, recipe=None):
+    return sha256_text("%s/%s\n%s\n%s" % (conanfile.name, conanfile.version, recipe or recipe_hash(recipe_folder),
+                                          _configuration(conanfile)))
+
+
+def _values(text):
+    values = {}
+    for line in text.splitlines():
+        if "=" in line:
+            name, value = line.split("=", 1)
+            values[name.strip()] = value.strip()
+    return values
+
+
+def configuration_values(conanfile):
+    """Settings, options (without those of the requirements) and requirements of the package ID."""
+    try:
+        settings = _values(conanfile.info.settings.dumps())
+        options  = _values(conanfile.info.options.dumps())
+        requires = conanfile.info.requires.dumps()
+    except Exception:
+        return None
+    return {"settings": settings,
+            "options":  dict((name, value) for name, value in options.items() if ":" not in name),
+            "requires": requires}
+
+
+def compatibility(wanted, candidate, build_types=None, superset_options=()):
+    """Number of values ``candidate`` differs by when it may stand in for ``wanted``, None otherwise."""
+    if wanted["requires"] != candidate["requires"]:
+        return None
+    if set(wanted["settings"]) != set(candidate["settings"]) or set(wanted["options"]) != set(candidate["options"]):
+        return None
+    distance = 0
+    for name, value in wanted["settings"].items():
+        if candidate["settings"][name] != value:
+            if name != "build_type" or candidate["settings"][name] not in (build_types or {}).get(value, []):
+                return None
+            distance += 1
+    for name, value in wanted["options"].items():
+        if candidate["options"][name] != value:
+            if name not in superset_options or candidate["options"][name] != "True":
+                return None
+            distance += 1
+    return distance
+
+
+def _outside(name):
+    """Whether the manifest path ``name`` is absolute or leaves the folder it is relative to."""
+    name = name.replace("\\", "/")
+    normalized = posixpath.normpath(name)
+    return (name.startswith("/") or os.path.isabs(name) or bool(os.path.splitdrive(name)[0]) or
+            normalized == ".." or normalized.startswith("../"))
+
+
+def _manifest_errors(manifest):
+    """Paths of a manifest written or pointing outside the package, entries may come from the shared cache."""
+    errors = []
+    links = manifest.get("links", {})
+    for name in list(manifest["files"]) + list(links):
+        parts = name.replace("\\", "/").split("/")
+        below = ["/".join(parts[:index]) for index in range(1, len(parts)) if "/".join(parts[:index]) in links]
+        if _outside(name) or posixpath.normpath(name.replace("\\", "/")) == ".":
+            errors.append("%s is not a path inside the package" % name)
+        elif below:
+            errors.append("%s is below the symlink %s" % (name, below[0]))
+    for name, target in links.items():
+        if not _outside(name) and _outside(posixpath.join(posixpath.dirname(name.replace("\\", "/")), target)):
+            errors.append("%s links outside the package to %s" % (name, target))
+    return errors
+
+
+def http_put(url, path):
+    with open(path, "rb") as f:
+        request = Request(url, data=f)
+        request.get_method = lambda: "PUT"
+        request.add_header("Content-Type", "application/octet-stream")
+        request.add_header("Content-Length", str(os.path.getsize(path)))
+        if os.environ.get("HYKER_BINARY_CACHE_TOKEN"):
+            request.add_header("Authorization", "Bearer %s" % os.environ["HYKER_BINARY_CACHE_TOKEN"])
+        urlopen(request).close()
+
+
+class BinaryCache(object):
+    def __init__(self, root=None, remote=None, max_size=None, output=None):
+        self.root     = root or os.environ.get("HYKER_BINARY_CACHE") or os.path.join(cache_root(), "binaries")
+        self.remote   = (remote or os.environ.get("HYKER_BINARY_CACHE_URL") or "").rstrip("/") or None
+        self.max_size = parse_size(max_size or os.environ.get("HYKER_BINARY_CACHE_SIZE") or "20G")
+        self.output   = output
+
+    def _info(self, message):
+        if self.output:
+            self.output.info(message)
+
+    def _warn(self, message):
+        if self.output:
+            self.output.warn(message)
+
+    def _entry(self, key):
+        return os.path.join(self.root, "entries", key)
+
+    def _lock(self, key):
+        return FileLock(os.path.join(self.root, "locks", key))
+
+    def _verify(self, entry):
+        """Return the manifest of a complete and unmodified entry, None otherwise."""
+        try:
+            with open(os.path.join(entry, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        errors = _manifest_errors(manifest)
+        if errors:
+            self._warn("Binary cache entry %s is unsafe (%s), removing it" % (entry, "; ".join(errors)))
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        for name, sha256 in manifest["files"].items():
+            path = os.path.join(entry, "files", name)
+            if not os.path.isfile(path) or sha256_file(path) != sha256:
+                self._warn("Binary cache entry %s is corrupted (%s), removing it" % (entry, name))
+                shutil.rmtree(entry, ignore_errors=True)
+                return None
+        return manifest
+
+    def _download(self, key):
+        url = "%s/%s.tar.gz" % (self.remote, key)
+        temp = tempfile.mkdtemp(dir=mkdirs(os.path.join(self.root, "tmp")))
+        try:
+            archive = os.path.join(temp, "entry.tar.gz")
+            try:
+                response = urlopen(url)
+            except HTTPError as e:
+                if e.code == 404:
+                    return None
+                raise
+            self._info("Downloading %s..." % url)
+            with open(archive, "wb") as f:
+                shutil.copyfileobj(response, f, 1 << 20)
+            extract_tar(archive, os.path.join(temp, "entry"))
+            if self._verify(os.path.join(temp, "entry")) is None:
+                self._warn("%s does not match its manifest, ignoring it" % url)
+                return None
+            os.rename(os.path.join(temp, "entry"), self._entry(key))
+            return self._entry(key)
+        except (IOError, OSError, tarfile.TarError, HykerBuildError) as e:
+            self._warn("Could not download %s: %s" % (url, e))
+            return None
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    def _upload(self, key, entry):
+        url = "%s/%s.tar.gz" % (self.remote, key)
+        fd, archive = tempfile.mkstemp(suffix=".tar.gz", dir=mkdirs(os.path.join(self.root, "tmp")))
+        os.close(fd)
+        try:
+            with tarfile.open(archive, "w:gz") as t:
+                for name in sorted(os.listdir(entry)):
+                    t.add(os.path.join(entry, name), name)
+            http_put(url, archive)
+            self._info("Uploaded the package to %s" % url)
+        except (IOError, OSError) as e:
+            self._warn("Could not upload %s: %s" % (url, e))
+        finally:
+            os.unlink(archive)
+
+    def fetch(self, key):
+        """Return the manifest of the entry ``key``, downloading it from the shared cache if needed."""
+        mkdirs(os.path.join(self.root, "entries"))
+        with self._lock(key):
+            entry = self._entry(key)
+            if not os.path.isdir(entry) and self.remote:
+                self._download(key)
+            if not os.path.isdir(entry):
+                return None
+            manifest = self._verify(entry)
+            if manifest is not None:
+                touch(os.path.join(entry, MANIFEST))
+            return manifest
+
+    def find_compatible(self, package, recipe, wanted, build_types=None, superset_options=()):
+        """Return the key of the closest local entry that may stand in for the ``wanted`` configuration."""
+        folder = os.path.join(self.root, "entries")
+        if wanted is None or not os.path.isdir(folder):
+            return None
+        candidates = []
+        for key in os.listdir(folder):
+            try:
+                with open(os.path.join(folder, key, MANIFEST)) as f:
+                    manifest = json.load(f)
+            except (IOError, OSError, ValueError):
+                continue
+            if manifest.get("package") != package or manifest.get("recipe") != recipe or not manifest.get("configuration"):
+                continue
+            distance = compatibility(wanted, manifest["configuration"], build_types, superset_options)
+            if distance is not None:
+                candidates.append((distance, key))
+        for _, key in sorted(candidates):
+            if self.fetch(key) is not None:
+                return key
+        return None
+
+    def restore(self, key, destination):
+        with self._lock(key):
+            entry = self._entry(key)
+            manifest = self._verify(entry)
+            if manifest is None:
+                raise HykerBuildError("Binary cache entry %s disappeared or is corrupted, rebuild without binary_cache" % key)
+            for name in manifest["files"]:
+                link_file(os.path.join(entry, "files", name), os.path.join(destination, name))
+            links = manifest.get("links", {})
+            for name, target in links.items():
+                path = os.path.join(destination, name)
+                mkdirs(os.path.dirname(path))
+                if os.path.lexists(path):
+                    os.unlink(path)
+                os.symlink(target, path)
+            # Links through other links, e.g. "a" -> "b/.." with "b" -> ".", only resolve once all exist
+            real_destination = os.path.realpath(destination)
+            for name in links:
+                path = os.path.join(destination, name)
+                real = os.path.realpath(path)
+                if real != real_destination and not real.startswith(real_destination.rstrip(os.sep) + os.sep):
+                    os.unlink(path)
+                    shutil.rmtree(entry, ignore_errors=True)
+                    raise HykerBuildError("%s of the binary cache entry %s resolves outside the package" % (name, key))
+            touch(os.path.join(entry, MANIFEST))
+        self._info("Restored %s from the binary cache" % manifest["package"])
+
+    def store(self, key, folder, package, recipe=None, configuration=None):
+        with self._lock(key):
+            entry = self._entry(key)
+            if self._verify(entry) is not None:
+                return
+            temp = tempfile.mkdtemp(dir=mkdirs(os.path.join(self.root, "tmp")))
+            manifest = {"package": package, "recipe": recipe, "configuration": configuration,
+                        "created": time.time(), "files": {}, "links": {}}
+            try:
+                for root, _, files in os.walk(folder):
+                    for name in files:
+                        path = os.path.join(root, name)
+                        relative = os.path.relpath(path, folder).replace(os.sep, "/")
+                        if relative in IGNORED:
+                            continue
+                        if os.path.islink(path):
+                            manifest["links"][relative] = os.readlink(path)
+                            continue
+                        manifest["files"][relative] = sha256_file(path)
+                        link_file(path, os.path.join(temp, "files", relative))
+                with open(os.path.join(temp, MANIFEST), "w") as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+                shutil.rmtree(entry, ignore_errors=True)
+                os.rename(temp, entry)
+            except Exception:
+                shutil.rmtree(temp, ignore_errors=True)
+                raise
+            self._info("Stored %s in the binary cache" % package)
+            if self.remote:
+                self._upload(key, entry)
+        self.evict(keep=entry)
+
+    def evict(self, keep=None):
+        folder = os.path.join(self.root, "entries")
+        if not os.path.isdir(folder):
+            return
+        entries = []
+        for name in os.listdir(folder):
+            entry = os.path.join(folder, name)
+            manifest = os.path.join(entry, MANIFEST)
+            if not os.path.exists(manifest):
+                continue
+            size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(entry) for f in files)
+            entries.append((os.path.getmtime(manifest), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            if entry == keep:
+                continue
+            self._info("Evicting %s from the binary cache" % entry)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def check(conanfile, recipe_folder):
+    """Called first in build(): True when the package is cached and the build can be skipped."""
+    if os.path.exists(HIT_MARKER):
+        os.unlink(HIT_MARKER)
+    package = "%s/%s" % (conanfile.name, conanfile.version)
+    recipe = recipe_hash(recipe_folder)
+    key = package_key(conanfile, recipe_folder, recipe)
+    cache = BinaryCache(output=conanfile.output)
+    if cache.fetch(key) is None:
+        build_types = getattr(conanfile, "compatible_build_types", None)
+        superset_options = getattr(conanfile, "superset_options", ())
+        key = None
+        if build_types or superset_options:
+            key = cache.find_compatible(package, recipe, configuration_values(conanfile), build_types, superset_options)
+        if key is None:
+            conanfile.output.info("%s is not in the binary cache" % package)
+            return False
+        conanfile.output.info("Using the compatible cached package %s" % key[:16])
+    with open(HIT_MARKER, "w") as f:
+        f.write(key)
+    return True
+
+
+def restore(conanfile):
+    """Called first in package(): links the cached package into the package folder after a hit."""
+    if not os.path.exists(HIT_MARKER):
+        return False
+    with open(HIT_MARKER) as f:
+        key = f.read().strip()
+    BinaryCache(output=conanfile.output).restore(key, conanfile.package_folder)
+    return True
+
+
+def store(conanfile, recipe_folder):
+    """Called last in package() after a real build."""
+    recipe = recipe_hash(recipe_folder)
+    BinaryCache(output=conanfile.output).store(package_key(conanfile, recipe_folder, recipe), conanfile.package_folder,
+                                               "%s/%s" % (conanfile.name, conanfile.version), recipe,
+                                               configuration_values(conanfile))
+
+
+def serve(folder, port=8765, bind="127.0.0.1", token=None):
+    """Serve ``folder`` as a shared cache: GET and PUT of flat file names only.
+
+    PUT requires ``token``, without one the cache is read-only.
+    """
+    try:
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+    except ImportError:
+        from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    mkdirs(folder)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _path(self):
+            name = self.path.strip("/")
+            if not name or "/" in name or name.startswith("."):
+                self.send_error(400)
+                return None
+            return os.path.join(folder, name)
+
+        def do_GET(self):
+            path = self._path()
+            if path is None:
+                return
+            if not os.path.isfile(path):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, 1 << 20)
+
+        def do_PUT(self):
+            if not token:
+                self.send_error(405, "Read-only cache, start it with HYKER_BINARY_CACHE_TOKEN to accept uploads")
+                return
+            authorization = self.headers.get("Authorization") or ""
+            if not hmac.compare_digest(authorization.encode("utf-8"), ("Bearer %s" % token).encode("utf-8")):
+                self.send_error(401)
+                return
+            path = self._path()
+            if path is None:
+                return
+            remaining = int(self.headers["Content-Length"])
+            fd, temp = tempfile.mkstemp(dir=folder, prefix=".upload-")
+            with os.fdopen(fd, "wb") as f:
+                while remaining:
+                    data = self.rfile.read(min(remaining, 1 << 20))
+                    if not data:
+                        break
+                    f.write(data)
+                    remaining -= len(data)
+            if remaining:
+                os.unlink(temp)
+                self.send_error(400)
+                return
+            os.rename(temp, path)
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    HTTPServer((bind, port), Handler).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a folder as the shared binary cache")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("folder")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--bind", default="127.0.0.1",
+                              help="Address to listen on, e.g. 0.0.0.0 for every interface (default 127.0.0.1)")
+    args = parser.parse_args(argv)
+    if args.command != "serve":
+        parser.error("usage: python -m hykerbuild.binary_cache serve <folder> [--port PORT] [--bind ADDRESS]")
+    token = os.environ.get("HYKER_BINARY_CACHE_TOKEN")
+    if not token:
+        sys.stderr.write("HYKER_BINARY_CACHE_TOKEN is not set, serving %s read-only\n" % args.folder)
+    serve(args.folder, args.port, args.bind, token)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
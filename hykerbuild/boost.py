@@ -0,0 +1,417 @@
+"""Boost components and the b2 build shared by the Boost recipes.
+
+``Boost/<version>`` builds any set of components into one package and, with
+header_only, is the headers package.  Next to it ``component.py.in`` is the
+template of the per-component recipes (``Boost.system``, ``Boost.log``, ...),
+each building and packaging the libraries of a single component on top of the
+headers package and requiring the packages of the components it links to.
+``generate_recipes()`` writes them to ``Boost/<version>/components/<name>/``,
+the orchestrator does it before looking for recipes and the Boost export
+scripts before exporting them:
+
+    python -m hykerbuild.boost [--user hykersec] [--channel testing]
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from hykerbuild.b2_cache import B2Cache, b2_key
+from hykerbuild.compiler_cache import CompilerCache
+from hykerbuild.jobs import job_count
+from hykerbuild.util import HykerBuildError, FileLock, parse_size
+from hykerbuild import cmake_config, cpu_level, report, tu_profile
+
+# Boost libraries whose sources b2 needs to build each component, also the libraries each one links to
+COMPONENT_DEPENDENCIES = {
+    "atomic":          [],
+    "chrono":          ["system"],
+    "container":       [],
+    "context":         [],
+    "coroutine":       ["context", "system", "thread"],
+    "coroutine2":      ["context"],
+    "date_time":       [],
+    "exception":       [],
+    "filesystem":      ["system"],
+    "graph":           ["regex"],
+    "graph_parallel":  ["mpi", "serialization"],
+    "iostreams":       [],
+    "locale":          ["system", "thread"],
+    "log":             ["atomic", "chrono", "date_time", "filesystem", "regex", "system", "thread"],
+    "math":            [],
+    "mpi":             ["serialization"],
+    "program_options": [],
+    "random":          ["system"],
+    "regex":           [],
+    "serialization":   [],
+    "signals":         [],
+    "system":          [],
+    "test":            ["timer"],
+    "thread":          ["atomic", "chrono", "system"],
+    "timer":           ["chrono", "system"],
+    "type_erasure":    ["thread"],
+    "wave":            ["chrono", "date_time", "filesystem", "system", "thread"]
+}
+# Libraries built for each component, boost_<component> when not listed
+COMPONENT_LIBRARIES = {
+    "coroutine2":      [],
+    "log":             ["log_setup", "log"],
+    "math":            ["math_c99", "math_c99f", "math_c99l", "math_tr1", "math_tr1f", "math_tr1l"],
+    "serialization":   ["serialization", "wserialization"],
+    "test":            ["unit_test_framework", "prg_exec_monitor", "test_exec_monitor"]
+}
+# How the Boost CMake configs look up the config of a component, see cmake_config.render()
+CMAKE_COMPONENTS = ("Boost", "boost_%s", "CONAN_BOOST.%s_ROOT")
+# Components without a library of their own, b2 builds the libraries they depend on instead
+HEADER_ONLY_COMPONENTS = ["coroutine2"]
+# Components that get no package of their own: MPI has to be configured for b2 by hand
+UNPACKAGED_COMPONENTS = ["coroutine2", "graph_parallel", "mpi"]
+# Always extracted, the build checks of every other library live there
+SOURCE_BASE_LIBRARIES = ["config", "predef"]
+# Rough peak memory (MB) of one compiler process, the heaviest library built sets the job count
+MEMORY_PER_JOB = {
+    "default":         700,
+    "graph":           1500,
+    "graph_parallel":  1500,
+    "log":             2500,
+    "python":          1200,
+    "serialization":   1000,
+    "wave":            2000
+}
+
+
+def closure(components):
+    """The components and every component they depend on."""
+    result = set()
+    pending = list(components)
+    while pending:
+        name = pending.pop()
+        if name not in result:
+            result.add(name)
+            pending.extend(COMPONENT_DEPENDENCIES[name])
+    return result
+
+
+def link_order(components):
+    """Libraries of the components, every library before the ones it links to."""
+    ordered = []
+
+    def visit(name):
+        if name in ordered:
+            return
+        for dependency in COMPONENT_DEPENDENCIES[name]:
+            visit(dependency)
+        ordered.append(name)
+
+    for name in sorted(components):
+        visit(name)
+    libraries = []
+    for name in reversed(ordered):
+        libraries.extend(COMPONENT_LIBRARIES.get(name, [name]))
+    return libraries
+
+
+def source_filter(source_folder_name, libraries, libs_only=False):
+    """Predicate on the archive member names keeping the sources b2 needs for ``libraries``."""
+    root = source_folder_name + "/"
+
+    def wanted(name):
+        name = name.replace("\\", "/")
+        if not name.startswith(root):
+            return False
+        parts = name[len(root):].rstrip("/").split("/")
+        if parts[0] == "libs":
+            # Top level entries of libs/ are cheap and keep the layout b2 expects
+            return len(parts) == 1 or parts[1] in libraries or (len(parts) == 2 and not libs_only)
+        if libs_only:
+            return False
+        if len(parts) == 1 or parts[0] in ("boost", "status"):
+            return True
+        return parts[0] == "tools" and (len(parts) == 1 or parts[1] == "build")
+    return wanted
+
+
+class BoostRecipe(object):
+    """b2 build of the Boost recipes, mixed into their ConanFile class.
+
+    Expects ``source_folder_name`` and ``compile_profile_folder`` on the recipe
+    and the shared, fPIC, profile_build and compiler_cache options.
+    """
+
+    def _msvc_version(self):
+        if self.settings.compiler.version == "15":
+            return "14.1"
+        else:
+            return "%s.0" % self.settings.compiler.version
+
+    def _gcc_short_version(self, version):
+        return str(version)[0]
+
+    def _bootstrap(self):
+        try:
+            # b2 only depends on the host toolchain, bootstrap once and reuse it for every configuration
+            toolset = None if self.settings.os == "Windows" else ("clang" if self.settings.compiler == "apple-clang" else str(self.settings.compiler))
+            command = "bootstrap" if self.settings.os == "Windows" else "./bootstrap.sh --with-toolset=%s" % toolset
+            with report.phase("bootstrap"):
+                B2Cache(output=self.output).bootstrap(self.source_folder_name, b2_key(self.version, toolset),
+                                                      lambda: self.run("cd %s && %s" % (self.source_folder_name, command)))
+        except:
+            self.run("cd %s && type bootstrap.log" % self.source_folder_name
+                    if self.settings.os == "Windows"
+                    else "cd %s && cat bootstrap.log" % self.source_folder_name)
+            raise
+
+    def _b2_flags(self):
+        """Toolset, variant and compiler flags of this configuration, without the --with-<component> flags."""
+        flags = []
+        if self.settings.compiler == "Visual Studio":
+            flags.append("toolset=msvc-%s" % self._msvc_version())
+        elif self.settings.compiler == "gcc":
+            # For GCC we only need the major version otherwhise Boost doesn't find the compiler
+            flags.append("toolset=%s-%s"% (self.settings.compiler, self._gcc_short_version(self.settings.compiler.version)))
+        elif str(self.settings.compiler) in ["clang"]:
+            flags.append("toolset=%s-%s"% (self.settings.compiler, self.settings.compiler.version))
+
+        flags.append("link=%s" % ("static" if not self.options.shared else "shared"))
+        if self.settings.compiler == "Visual Studio" and self.settings.compiler.runtime:
+            flags.append("runtime-link=%s" % ("static" if "MT" in str(self.settings.compiler.runtime) else "shared"))
+        flags.append("variant=%s" % str(self.settings.build_type).lower())
+        flags.append("address-model=%s" % ("32" if self.settings.arch == "x86" else "64"))
+
+        cxx_flags = []
+        # fPIC DEFINITION
+        if self.settings.compiler != "Visual Studio":
+            if self.options.fPIC:
+                cxx_flags.append("-fPIC")
+
+        # LIBCXX DEFINITION FOR BOOST B2
+        try:
+            if str(self.settings.compiler.libcxx) == "libstdc++":
+                flags.append("define=_GLIBCXX_USE_CXX11_ABI=0")
+            elif str(self.settings.compiler.libcxx) == "libstdc++11":
+                flags.append("define=_GLIBCXX_USE_CXX11_ABI=1")
+            if "clang" in str(self.settings.compiler):
+                if str(self.settings.compiler.libcxx) == "libc++":
+                    cxx_flags.append("-stdlib=libc++")
+                    cxx_flags.append("-std=c++11")
+                    flags.append('linkflags="-stdlib=libc++"')
+                else:
+                    cxx_flags.append("-stdlib=libstdc++")
+                    cxx_flags.append("-std=c++11")
+        except:
+            pass
+
+        if self.settings.os == "iOS":
+            flags.append("architecture=arm target-os=iphone")
+            for arch in ["armv7", "armv7s", "arm64"]:
+                cxx_flags.append("-arch %s" % arch)
+            cxx_flags.append("-fembed-bitcode")
+            cxx_flags.append("-isysroot %s" % "/Applications/Xcode.app/Contents/Developer/Platforms/iPhoneOS.platform/Developer/SDKs/iPhoneOS.sdk")
+
+        cxx_flags.extend(cpu_level.compiler_flags(self))
+
+        cxx_flags = 'cxxflags="%s"' % " ".join(cxx_flags) if cxx_flags else ""
+        flags.append(cxx_flags)
+        return flags
+
+    def _b2_command(self):
+        return "b2" if self.settings.os == "Windows" else "./b2"
+
+    def _compiler_launcher(self):
+        """Put the profiler and the compiler cache in front of the compiler, return the cache or None."""
+        launcher = []
+        if self.options.profile_build:
+            launcher.extend(tu_profile.launcher(self.compile_profile_folder))
+        compiler_cache = None
+        if self.options.compiler_cache:
+            compiler_cache = CompilerCache(os.getcwd(), self.output)
+            launcher.extend(compiler_cache.launcher)
+        if launcher:
+            self._use_compiler_launcher(launcher)
+        return compiler_cache
+
+    def _use_compiler_launcher(self, launcher):
+        # Configures the toolset b2 is going to use with the launcher in front of the compiler, the
+        # project-config.jam written by bootstrap only configures its own toolset when none is configured yet
+        if self.settings.compiler == "Visual Studio":
+            self.output.warn("b2's msvc toolset cannot run the compiler through a launcher, ignoring %s" % " ".join(launcher))
+            return
+
+        if self.settings.compiler == "gcc":
+            toolset, version, compiler = "gcc", self._gcc_short_version(self.settings.compiler.version), "g++"
+        elif self.settings.compiler == "clang":
+            toolset, version, compiler = "clang", str(self.settings.compiler.version), "clang++"
+        else:
+            toolset, version, compiler = "clang", "", "clang++"
+        command = " ".join('"%s"' % part for part in launcher + [os.environ.get("CXX", compiler)])
+
+        path = os.path.join(self.source_folder_name, "project-config.jam")
+        with open(path) as f:
+            content = f.read()
+        with open(path, "w") as f:
+            f.write("using %s : %s : %s ;\n\n%s" % (toolset, version, command, content))
+
+    def _summarize_compile_profile(self):
+        if self.options.profile_build and os.path.isdir(self.compile_profile_folder):
+            slowest = tu_profile.summarize(self.compile_profile_folder, ".")
+            report.record("compile_profile", slowest)
+            self.output.info("Compile profile written to compile_profile.txt and compile_trace.json")
+
+    def _jobs(self, libraries):
+        memory = max(MEMORY_PER_JOB.get(name, MEMORY_PER_JOB["default"]) for name in libraries)
+        return job_count(memory, self.output)
+
+    def _library_names(self, libs):
+        """Names for cpp_info.libs of the Boost libraries ``libs`` (e.g. "system"), see link_order()."""
+        if self.settings.compiler != "Visual Studio":
+            return ["boost_%s" % lib for lib in libs]
+
+        # http://www.boost.org/doc/libs/1_55_0/more/getting_started/windows.html
+        runtime = "mt" # str(self.settings.compiler.runtime).lower()
+
+        abi_tags = []
+        if self.settings.compiler.runtime in ("MTd", "MT"):
+            abi_tags.append("s")
+
+        if self.settings.build_type == "Debug":
+            abi_tags.append("gd")
+
+        abi_tags = ("-%s" % "".join(abi_tags)) if abi_tags else ""
+
+        version = "_".join(self.version.split(".")[0:2])
+        suffix = "vc%s-%s%s-%s" %  (self._msvc_version().replace(".", ""), runtime, abi_tags, version)
+        prefix = "lib" if not self.options.shared else ""
+        return ["%sboost_%s-%s" % (prefix, lib, suffix) for lib in libs]
+
+    def _cmake_targets(self, components, defines=()):
+        """CMake imported targets Boost::<library> of the libraries of ``components``, see cmake_config.
+
+        The headers come from Boost::boost, which the component packages do not contain.  A component whose
+        libraries are named differently (math, test) also gets an interface target Boost::<component> linking
+        all of them.
+        """
+        targets = []
+        for component in sorted(components):
+            libraries = COMPONENT_LIBRARIES.get(component, [component])
+            links = ["Boost::boost"] + ["Boost::%s" % name for name in COMPONENT_DEPENDENCIES[component]
+                                        if name not in HEADER_ONLY_COMPONENTS]
+            for library, name in zip(libraries, self._library_names(libraries)):
+                # log_setup links to log, wserialization to serialization
+                own = ["Boost::%s" % component] if component in libraries and library != component else []
+                targets.append(cmake_config.library_target(self, "Boost::%s" % library, name, links + own, defines,
+                                                           includes=False))
+            if libraries and component not in libraries:
+                targets.append(cmake_config.interface_target("Boost::%s" % component,
+                                                             ["Boost::%s" % library for library in libraries],
+                                                             includes=False))
+        return targets
+
+
+def cmake_variables(version):
+    """The variables FindBoost sets besides the libraries, for the Boost CMake configs."""
+    major, minor, subminor = version.split(".")
+    return [("Boost_VERSION",           "%d" % (int(major) * 100000 + int(minor) * 100 + int(subminor))),
+            ("Boost_LIB_VERSION",       "%s_%s" % (major, minor)),
+            ("Boost_MAJOR_VERSION",     major),
+            ("Boost_MINOR_VERSION",     minor),
+            ("Boost_SUBMINOR_VERSION",  subminor),
+            ("Boost_INCLUDE_DIR",       "@PREFIX@/include"),
+            ("Boost_INCLUDE_DIRS",      "@PREFIX@/include"),
+            ("Boost_LIBRARY_DIRS",      "@PREFIX@/lib")]
+
+
+def _folder_size(folder):
+    size = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                # Being evicted by another build
+                pass
+    return size
+
+
+def evict_matrices(root, keep=None, max_size=None, output=None):
+    """Remove the least recently used build_matrix folders of ``root`` once they grow over the size limit.
+
+    The limit is HYKER_BOOST_MATRIX_SIZE (default 20G), folders being built or split by another build are skipped.
+    """
+    max_size = parse_size(max_size or os.environ.get("HYKER_BOOST_MATRIX_SIZE") or "20G")
+    entries = []
+    for name in os.listdir(root):
+        folder = os.path.join(root, name)
+        if folder == keep or not os.path.isdir(folder):
+            continue
+        try:
+            used = os.path.getmtime(os.path.join(folder, "complete"))
+        except OSError:
+            used = 0
+        entries.append((used, _folder_size(folder), folder))
+
+    total = sum(size for _, size, _ in entries) + (_folder_size(keep) if keep else 0)
+    for _, size, folder in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            with FileLock(folder + ".lock", timeout=0):
+                if output:
+                    output.info("Evicting the Boost build matrix %s" % folder)
+                shutil.rmtree(folder, ignore_errors=True)
+        except HykerBuildError:
+            continue
+        total -= size
+
+
+def generate_recipes(root, user="hykersec", channel="testing"):
+    """Write the component recipes of every Boost version having a component.py.in template."""
+    boost_folder = os.path.join(root, "Boost")
+    if not os.path.isdir(boost_folder):
+        return []
+    written = []
+    for version in sorted(os.listdir(boost_folder)):
+        template_path = os.path.join(boost_folder, version, "component.py.in")
+        if not os.path.isfile(template_path):
+            continue
+        with open(template_path) as f:
+            template = f.read()
+
+        for component in sorted(COMPONENT_DEPENDENCIES):
+            if component in UNPACKAGED_COMPONENTS:
+                continue
+            dependencies = [name for name in sorted(COMPONENT_DEPENDENCIES[component]) if name not in HEADER_ONLY_COMPONENTS]
+            requires = ["Boost/%s@%s/%s" % (version, user, channel)]
+            requires.extend("Boost.%s/%s@%s/%s" % (name, version, user, channel) for name in dependencies)
+            content = (template.replace("@COMPONENT@", component)
+                               .replace("@VERSION@", version)
+                               .replace("@REQUIRES@", repr(tuple(requires)))
+                               .replace("@DEPENDENCIES@", repr(dependencies)))
+
+            folder = os.path.join(boost_folder, version, "components", component)
+            path = os.path.join(folder, "conanfile.py")
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            existing = None
+            if os.path.exists(path):
+                with open(path) as f:
+                    existing = f.read()
+            if existing != content:
+                with open(path, "w") as f:
+                    f.write(content)
+            written.append(path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the Boost component recipes")
+    parser.add_argument("--user", default="hykersec")
+    parser.add_argument("--channel", default="testing")
+    parser.add_argument("--root", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = parser.parse_args(argv)
+    for path in generate_recipes(args.root, args.user, args.channel):
+        sys.stdout.write("%s\n" % path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
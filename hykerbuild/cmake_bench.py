@@ -0,0 +1,126 @@
+"""Configure time of the packaged find modules against the generated CMake configs.
+
+Generates a project of ``--targets`` subdirectories, each calling the given
+``find_package()`` like the targets of a large consumer do, and times a fresh
+``cmake`` configure of it three ways:
+
+    empty    the same targets without find_package(), the cost of everything else
+    modules  the find modules searching (-DHYKER_USE_FIND_MODULES=ON)
+    configs  the find modules including the configs of cmake_config
+
+The package folders come from the conanbuildinfo.cmake of a ``conan install``,
+or from ``--package`` for packages outside a conan cache::
+
+    python -m hykerbuild.cmake_bench --conanbuildinfo build/conanbuildinfo.cmake \\
+        --find "OpenSSL" --find "Boost COMPONENTS system filesystem" --targets 200
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from hykerbuild.util import HykerBuildError
+
+MODES = ["empty", "modules", "configs"]
+
+
+def write_project(folder, finds, targets, conanbuildinfo=None, packages=()):
+    """Write the benchmark project to ``folder``, every target calling ``find_package(<find> REQUIRED)``."""
+    lines = ["cmake_minimum_required(VERSION 3.5)",
+             "project(hyker_cmake_bench CXX)"]
+    if conanbuildinfo:
+        lines.append('include("%s")' % os.path.abspath(conanbuildinfo).replace("\\", "/"))
+        lines.append("conan_basic_setup()")
+    for package in packages:
+        package = os.path.abspath(package).replace("\\", "/")
+        lines.append('list(APPEND CMAKE_MODULE_PATH "%s")' % package)
+        lines.append('list(APPEND CMAKE_PREFIX_PATH "%s")' % package)
+    lines.extend("add_subdirectory(t%d)" % index for index in range(targets))
+    with open(os.path.join(folder, "CMakeLists.txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+    for index in range(targets):
+        target_folder = os.path.join(folder, "t%d" % index)
+        os.mkdir(target_folder)
+        with open(os.path.join(target_folder, "t.cpp"), "w") as f:
+            f.write("int t%d() { return %d; }\n" % (index, index))
+        with open(os.path.join(target_folder, "CMakeLists.txt"), "w") as f:
+            f.write("if(NOT HYKER_BENCH_EMPTY)\n")
+            f.write("".join("  find_package(%s REQUIRED)\n" % find for find in finds))
+            f.write("endif()\n")
+            f.write("add_library(t%d STATIC t.cpp)\n" % index)
+
+
+def configure(project, mode, cmake="cmake", generator=None):
+    """Seconds of a configure of ``project`` in a new build folder, raises when it fails."""
+    build = tempfile.mkdtemp(prefix="hyker_cmake_bench_")
+    command = [cmake, project, "-DHYKER_BENCH_EMPTY=%s" % ("ON" if mode == "empty" else "OFF"),
+               "-DHYKER_USE_FIND_MODULES=%s" % ("ON" if mode == "modules" else "OFF")]
+    if generator:
+        command.extend(["-G", generator])
+    try:
+        start = time.time()
+        process = subprocess.Popen(command, cwd=build, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        log = process.communicate()[0]
+        seconds = time.time() - start
+        if process.returncode != 0:
+            tail = log.decode("utf-8", "replace").splitlines()[-40:]
+            raise HykerBuildError("The %s configure failed:\n%s" % (mode, "\n".join(tail)))
+        return seconds
+    finally:
+        shutil.rmtree(build, ignore_errors=True)
+
+
+def run(finds, targets=100, runs=3, conanbuildinfo=None, packages=(), cmake="cmake", generator=None):
+    """Best configure time of each mode over ``runs`` runs, with the time spent in find_package() per target."""
+    project = tempfile.mkdtemp(prefix="hyker_cmake_project_")
+    try:
+        write_project(project, finds, targets, conanbuildinfo, packages)
+        best = {}
+        for _ in range(runs):
+            # Interleaved so a slower moment of the machine does not favour one mode
+            for mode in MODES:
+                seconds = configure(project, mode, cmake, generator)
+                best[mode] = min(seconds, best.get(mode, seconds))
+    finally:
+        shutil.rmtree(project, ignore_errors=True)
+
+    results = {"targets": targets, "finds": list(finds), "seconds": best}
+    for mode in ("modules", "configs"):
+        results["%s_ms_per_target" % mode] = round(1000.0 * max(best[mode] - best["empty"], 0) / max(targets, 1), 3)
+    if results["configs_ms_per_target"] > 0:
+        results["speedup"] = round(results["modules_ms_per_target"] / results["configs_ms_per_target"], 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the configure time of the find modules and the CMake configs")
+    parser.add_argument("--find", action="append", required=True,
+                        help='Arguments of find_package(), e.g. "Boost COMPONENTS system", repeatable')
+    parser.add_argument("--conanbuildinfo", help="conanbuildinfo.cmake of a conan install of the packages")
+    parser.add_argument("--package", action="append", default=[], help="Package folder, repeatable")
+    parser.add_argument("--targets", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--cmake", default="cmake")
+    parser.add_argument("--generator", help="CMake generator, the default one of cmake when not set")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.find, args.targets, args.runs, args.conanbuildinfo, args.package, args.cmake, args.generator)
+    for mode in MODES:
+        sys.stdout.write("%-8s %8.2f s\n" % (mode, results["seconds"][mode]))
+    sys.stdout.write("find_package() per target: modules %.2f ms, configs %.2f ms%s\n" %
+                     (results["modules_ms_per_target"], results["configs_ms_per_target"],
+                      ", %.1fx faster" % results["speedup"] if "speedup" in results else ""))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Precomputed CMake package configs.
+
+The find modules the recipes export (FindBoost.cmake, FindOpenSSL.cmake) probe
+the library folders for every name variant and parse the version headers, on
+every ``find_package()`` of every configure.  package() knows the exact files
+instead: ``write()`` turns the library names of package_info() into
+
+    lib/cmake/<Pkg>/<Pkg>Config.cmake         imported targets (Boost::system,
+                                              OpenSSL::SSL, CryptoPP::CryptoPP)
+                                              and the variables of the find module
+    lib/cmake/<Pkg>/<Pkg>ConfigVersion.cmake  the package version
+
+Paths are relative to the config file, so the package folder can move.
+``find_package(<Pkg> CONFIG)`` finds them with the package folder in
+CMAKE_PREFIX_PATH or ``<Pkg>_DIR``.  The packaged find modules include the
+config and return before searching, so consumers keep calling
+``find_package(<Pkg>)`` unchanged: ``fast_path()`` prepends that to
+FindOpenSSL.cmake, the FindBoost.cmake of the Boost recipe does it itself and
+otherwise runs CMake's FindBoost on the package.  Configure with
+``-DHYKER_USE_FIND_MODULES=ON`` to search instead.
+
+``python -m hykerbuild.cmake_bench`` compares the configure time of both.
+"""
+import os
+import re
+
+from hykerbuild import cpu_level
+from hykerbuild.util import has_option, mkdirs
+
+FAST_PATH_MARKER = "# Fast path written by hykerbuild.cmake_config"
+
+CONFIG_VERSION = """# Written by hykerbuild.cmake_config
+set(PACKAGE_VERSION "%(version)s")
+if(PACKAGE_FIND_VERSION VERSION_GREATER "%(numeric)s")
+  set(PACKAGE_VERSION_COMPATIBLE FALSE)
+else()
+  set(PACKAGE_VERSION_COMPATIBLE TRUE)
+  if(PACKAGE_FIND_VERSION VERSION_EQUAL "%(numeric)s")
+    set(PACKAGE_VERSION_EXACT TRUE)
+  endif()
+endif()
+"""
+
+COMPONENTS = """
+set(%(package)s_LIBRARIES)
+set(_hyker_missing)
+foreach(_hyker_component IN LISTS %(package)s_FIND_COMPONENTS)
+  string(TOUPPER "${_hyker_component}" _hyker_upper)
+  if(NOT TARGET %(namespace)s::${_hyker_component})
+    find_package(%(component_package)s CONFIG QUIET NO_DEFAULT_PATH PATHS "${%(component_root)s}")
+  endif()
+  if(TARGET %(namespace)s::${_hyker_component})
+    set(%(package)s_${_hyker_upper}_FOUND TRUE)
+    set(%(package)s_${_hyker_upper}_LIBRARY %(namespace)s::${_hyker_component})
+    list(APPEND %(package)s_LIBRARIES %(namespace)s::${_hyker_component})
+  else()
+    set(%(package)s_${_hyker_upper}_FOUND FALSE)
+    if(%(package)s_FIND_REQUIRED_${_hyker_component})
+      list(APPEND _hyker_missing ${_hyker_component})
+    endif()
+  endif()
+endforeach()
+if(_hyker_missing)
+  set(%(package)s_FOUND FALSE)
+  set(%(package)s_NOT_FOUND_MESSAGE "%(package)s in ${%(prefix)s} has no ${_hyker_missing} library")
+  if(%(package)s_FIND_REQUIRED)
+    message(FATAL_ERROR "${%(package)s_NOT_FOUND_MESSAGE}")
+  endif()
+endif()
+unset(_hyker_component)
+unset(_hyker_upper)
+unset(_hyker_missing)
+"""
+
+
+def numeric_version(version):
+    """The part of ``version`` CMake can compare, e.g. 1.0.2 for 1.0.2h."""
+    return re.match(r"\d+(\.\d+)*", version).group(0)
+
+
+def _find_file(package_folder, candidates):
+    for relative in candidates:
+        if os.path.exists(os.path.join(package_folder, relative)):
+            return relative
+    return None
+
+
+def library_target(conanfile, target, library, links=(), defines=(), includes=True):
+    """Imported target ``target`` of the library named ``library`` in package_info(), None when not packaged.
+
+    The name is resolved the way the linker resolves -l``library`` or ``library``.lib, once, here.
+    """
+    package_folder = conanfile.package_folder
+    shared = has_option(conanfile, "shared") and bool(conanfile.options.shared)
+    implib = None
+    if conanfile.settings.os == "Windows" and conanfile.settings.compiler == "Visual Studio":
+        location = _find_file(package_folder, ["lib/%s.lib" % library])
+        dll = _find_file(package_folder, ["bin/%s.dll" % library]) if shared else None
+        if location and dll:
+            kind, location, implib = "SHARED", dll, location
+        else:
+            kind = "STATIC" if not shared else "UNKNOWN"
+    elif os.path.splitext(library)[1] in (".a", ".lib"):
+        location = _find_file(package_folder, ["lib/%s" % library])
+        kind = "STATIC"
+    else:
+        names = ["lib%s.so" % library, "lib%s.dylib" % library, "lib%s.a" % library]
+        if not shared:
+            names.insert(0, names.pop())
+        location = _find_file(package_folder, ["%s/%s" % (folder, name) for name in names for folder in ("lib", "bin")])
+        kind = "STATIC" if location and location.endswith(".a") else "SHARED"
+
+    if not location:
+        conanfile.output.warn("No file for the %s library in the package, %s is not in the CMake config" % (library, target))
+        return None
+    return {"name": target, "kind": kind, "location": location, "implib": implib,
+            "links": list(links), "defines": list(defines), "includes": includes}
+
+
+def interface_target(target, links=(), defines=(), includes=True):
+    return {"name": target, "kind": "INTERFACE", "location": None, "implib": None,
+            "links": list(links), "defines": list(defines), "includes": includes}
+
+
+def _quote(values):
+    return '"%s"' % ";".join(values)
+
+
+def _render_target(target, prefix):
+    lines = ["if(NOT TARGET %s)" % target["name"],
+             "  add_library(%s %s IMPORTED)" % (target["name"], target["kind"])]
+    properties = []
+    if target["location"]:
+        properties.append(("IMPORTED_LOCATION", '"${%s}/%s"' % (prefix, target["location"])))
+    if target["implib"]:
+        properties.append(("IMPORTED_IMPLIB", '"${%s}/%s"' % (prefix, target["implib"])))
+    if target["includes"]:
+        properties.append(("INTERFACE_INCLUDE_DIRECTORIES", '"${%s}/include"' % prefix))
+    if target["defines"]:
+        properties.append(("INTERFACE_COMPILE_DEFINITIONS", _quote(target["defines"])))
+    if target["links"]:
+        properties.append(("INTERFACE_LINK_LIBRARIES", _quote(target["links"]).replace("@PREFIX@", "${%s}" % prefix)))
+    if properties:
+        lines.append("  set_target_properties(%s PROPERTIES" % target["name"])
+        lines.extend("    %s %s" % item for item in properties)
+        lines[-1] += ")"
+    lines.append("endif()")
+    return "\n".join(lines)
+
+
+def render(package, version, targets, variables=(), dependencies=(), components=None):
+    """Text of the <Pkg>Config.cmake defining ``targets``.
+
+    ``variables`` are (name, value) pairs of the find module, "@PREFIX@" standing for the package folder.
+    ``dependencies`` are (target, package, conan root variable): packages looked up when the target is missing.
+    ``components`` is (namespace, component package format, conan root variable format) when the package has
+    COMPONENTS, components without a target are looked up in their own package, e.g. boost_system.
+    """
+    prefix = "_hyker_%s_prefix" % re.sub(r"\W", "_", package)
+    sections = ["# Written by hykerbuild.cmake_config from the package_info() of %s %s: nothing is searched,\n"
+                "# edit the recipe rather than this file." % (package, version),
+                'get_filename_component(%s "${CMAKE_CURRENT_LIST_DIR}/../../.." ABSOLUTE)' % prefix]
+    for target, dependency, root in dependencies:
+        sections.append('if(NOT TARGET %s)\n  find_package(%s CONFIG QUIET NO_DEFAULT_PATH PATHS "${%s}")\nendif()'
+                        % (target, dependency, root))
+    sections.extend(_render_target(target, prefix) for target in targets)
+
+    lines = ["set(%s_FOUND TRUE)" % package]
+    if ("%s_VERSION" % package) not in dict(variables):
+        lines.append('set(%s_VERSION "%s")' % (package, version))
+    for name, value in variables:
+        lines.append('set(%s "%s")' % (name, value.replace("@PREFIX@", "${%s}" % prefix)))
+    sections.append("\n".join(lines))
+
+    if components:
+        namespace, component_package, component_root = components
+        sections.append(COMPONENTS.strip("\n") % {
+            "package": package, "namespace": namespace, "prefix": prefix,
+            "component_package": component_package % "${_hyker_component}",
+            "component_root": component_root % "${_hyker_upper}"})
+    sections.append("unset(%s)" % prefix)
+    return "\n\n".join(sections) + "\n"
+
+
+def _write_if_changed(path, content):
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == content:
+                return
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def write(conanfile, package, targets, variables=(), dependencies=(), components=None, check_target=None):
+    """Write lib/cmake/<package>/ in the package folder, returns the config path.
+
+    The cpu_level check object of the package is linked through ``check_target``, like package_info() does.
+    """
+    targets = [target for target in targets if target]
+    check = cpu_level.packaged_check(conanfile) if check_target else None
+    if check:
+        for target in targets:
+            if target["name"] == check_target:
+                target["links"].append("@PREFIX@/lib/%s" % os.path.basename(check))
+
+    folder = mkdirs(os.path.join(conanfile.package_folder, "lib", "cmake", package))
+    config = os.path.join(folder, "%sConfig.cmake" % package)
+    _write_if_changed(config, render(package, conanfile.version, targets, variables, dependencies, components))
+    _write_if_changed(os.path.join(folder, "%sConfigVersion.cmake" % package),
+                      CONFIG_VERSION % {"version": conanfile.version, "numeric": numeric_version(conanfile.version)})
+    conanfile.output.info("CMake config with %s in %s" % (", ".join(target["name"] for target in targets), folder))
+    return config
+
+
+def fast_path(conanfile, find_module, package):
+    """Make the packaged ``find_module`` include lib/cmake/<package>/<package>Config.cmake instead of searching."""
+    path = os.path.join(conanfile.package_folder, find_module)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        content = f.read()
+    if FAST_PATH_MARKER in content:
+        return
+    config = "${CMAKE_CURRENT_LIST_DIR}/lib/cmake/%s/%sConfig.cmake" % (package, package)
+    header = ("%s, configure with -DHYKER_USE_FIND_MODULES=ON to search instead\n"
+              'if(NOT HYKER_USE_FIND_MODULES AND EXISTS "%s")\n'
+              '  include("%s")\n'
+              "  return()\n"
+              "endif()\n\n" % (FAST_PATH_MARKER, config, config))
+    os.unlink(path)  # may be a link to the recipe folder
+    with open(path, "w") as f:
+        f.write(header + content)
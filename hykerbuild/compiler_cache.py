@@ -0,0 +1,99 @@
+"""ccache / sccache integration.
+
+The cache executable is HYKER_COMPILER_CACHE when set (a name or a path),
+otherwise sccache or ccache from the PATH.  Both hash the full compiler command
+line and the compiler itself, so flags such as -fPIC, -m32, -stdlib=... or
+-D_GLIBCXX_USE_CXX11_ABI=... are part of the key as long as they reach the
+compiler on the command line, which is how all three recipes pass them.
+
+ccache gets CCACHE_BASEDIR set to the build folder so the absolute paths of
+the different conan build folders do not prevent hits.  Recipes run their
+compile steps inside ``session(compiler_cache)``, which sets that environment.  Hit and miss counts
+are the difference of the cache's global statistics before and after the
+build, builds running at the same time on the machine are counted too.
+"""
+import contextlib
+import json
+import os
+import subprocess
+
+from hykerbuild import report
+from hykerbuild.util import HykerBuildError, which
+
+
+class CompilerCache(object):
+    def __init__(self, base_folder, output):
+        name = os.environ.get("HYKER_COMPILER_CACHE")
+        if name:
+            self.executable = name if os.path.isfile(name) else which(name)
+        else:
+            self.executable = which("sccache") or which("ccache")
+        if not self.executable:
+            raise HykerBuildError("compiler_cache is enabled but neither sccache nor ccache was found, "
+                                  "install one or point HYKER_COMPILER_CACHE to it")
+        self.kind        = "sccache" if "sccache" in os.path.basename(self.executable) else "ccache"
+        self.base_folder = os.path.abspath(base_folder)
+        self.output      = output
+
+    @property
+    def launcher(self):
+        return [self.executable]
+
+    def stats(self):
+        """Return (hits, misses), None when the statistics cannot be read."""
+        try:
+            if self.kind == "sccache":
+                stats = json.loads(subprocess.check_output([self.executable, "--show-stats", "--stats-format=json"]).decode())
+                stats = stats.get("stats", stats)
+
+                def count(name):
+                    value = stats.get(name, 0)
+                    if isinstance(value, dict):
+                        value = sum(value.get("counts", value).values())
+                    return value
+                return count("cache_hits"), count("cache_misses")
+
+            values = {}
+            for line in subprocess.check_output([self.executable, "--print-stats"]).decode().splitlines():
+                fields = line.split("\t")
+                if len(fields) == 2 and fields[1].strip().isdigit():
+                    values[fields[0]] = int(fields[1])
+            hits = values.get("direct_cache_hit", 0) + values.get("preprocessed_cache_hit", 0)
+            return hits, values.get("cache_miss", 0)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+
+    @contextlib.contextmanager
+    def session(self):
+        """Report the hits and misses of the enclosed build."""
+        before = self.stats()
+        previous = os.environ.get("CCACHE_BASEDIR")
+        if self.kind == "ccache":
+            os.environ["CCACHE_BASEDIR"] = self.base_folder
+        try:
+            yield
+        finally:
+            if self.kind == "ccache":
+                if previous is None:
+                    del os.environ["CCACHE_BASEDIR"]
+                else:
+                    os.environ["CCACHE_BASEDIR"] = previous
+        after = self.stats()
+        if before is None or after is None:
+            self.output.warn("Could not read the %s statistics" % self.kind)
+            return
+
+        hits, misses = after[0] - before[0], after[1] - before[1]
+        rate = 100.0 * hits / (hits + misses) if hits + misses else 0.0
+        self.output.info("%s: %d hits, %d misses (%.0f%% hit rate)" % (self.kind, hits, misses, rate))
+        report.record("compiler_cache", {"tool": self.kind, "hits": hits, "misses": misses})
+
+
+@contextlib.contextmanager
+def session(compiler_cache):
+    """``compiler_cache.session()``, or nothing when the cache is disabled (None)."""
+    if compiler_cache is None:
+        yield
+    else:
+        with compiler_cache.session():
+            yield
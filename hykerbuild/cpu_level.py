@@ -0,0 +1,308 @@
+"""x86-64 micro-architecture levels of the ``cpu_level`` option.
+
+    baseline   what the compiler targets for the arch setting
+    x86-64-v2  SSE3 to SSE4.2, POPCNT, CMPXCHG16B, LAHF, plus AES-NI and PCLMUL
+    x86-64-v3  v2 plus AVX, AVX2, BMI1/2, F16C, FMA, LZCNT, MOVBE, XSAVE
+    native     everything the build machine has (-march=native)
+
+The v2 and v3 levels are those of the x86-64 psABI extended with AES-NI and
+PCLMUL, which every machine of the fleet has and which the crypto code only
+uses when the compiler is allowed to.  They are passed as explicit ISA flags
+(-msse4.2 ...) rather than -march=x86-64-v3 so older compilers take them.  MSVC
+only knows /arch:AVX2 for v3: with it x86-64-v2 builds the baseline and is
+packaged as such, and native is x86-64-v3 or the baseline.  The level only
+applies to x86_64, other architectures always build the baseline.
+
+The level is part of the package ID; ``native`` is replaced by the list of
+features of the build machine, so packages built on different machines do not
+collide.
+
+Tuned packages carry ``lib/hyker_cpu_check.o`` (``.obj`` with MSVC), an object
+compiled for the baseline that ``package_info()`` adds to the link of every
+executable and shared library of the consumers: it checks the CPU before any
+other initializer runs and aborts with the list of missing features instead of
+dying later on an illegal instruction.
+"""
+import os
+import platform
+import re
+import shutil
+import subprocess
+
+from hykerbuild.util import has_option, mkdirs, sha256_text, which
+
+LEVELS = ["baseline", "x86-64-v2", "x86-64-v3", "native"]
+
+# Feature: (CPUID leaf, register index eax=0 ebx=1 ecx=2 edx=3, bit), named as in /proc/cpuinfo
+CPUID_BITS = {
+    "sse3":      (0x1, 2, 0),
+    "pclmulqdq": (0x1, 2, 1),
+    "ssse3":     (0x1, 2, 9),
+    "fma":       (0x1, 2, 12),
+    "cx16":      (0x1, 2, 13),
+    "sse4_1":    (0x1, 2, 19),
+    "sse4_2":    (0x1, 2, 20),
+    "movbe":     (0x1, 2, 22),
+    "popcnt":    (0x1, 2, 23),
+    "aes":       (0x1, 2, 25),
+    "xsave":     (0x1, 2, 26),
+    "avx":       (0x1, 2, 28),
+    "f16c":      (0x1, 2, 29),
+    "bmi1":      (0x7, 1, 3),
+    "avx2":      (0x7, 1, 5),
+    "bmi2":      (0x7, 1, 8),
+    "avx512f":   (0x7, 1, 16),
+    "avx512dq":  (0x7, 1, 17),
+    "avx512bw":  (0x7, 1, 30),
+    "avx512vl":  (0x7, 1, 31),
+    "lahf_lm":   (0x80000001, 2, 0),
+    "abm":       (0x80000001, 2, 5)
+}
+FEATURES = {
+    "x86-64-v2": ["sse3", "ssse3", "sse4_1", "sse4_2", "popcnt", "cx16", "lahf_lm", "aes", "pclmulqdq"]
+}
+FEATURES["x86-64-v3"] = FEATURES["x86-64-v2"] + ["avx", "avx2", "bmi1", "bmi2", "f16c", "fma", "abm", "movbe", "xsave"]
+GCC_FLAGS = {
+    "x86-64-v2": ["-msse3", "-mssse3", "-msse4.1", "-msse4.2", "-mpopcnt", "-mcx16", "-msahf", "-maes", "-mpclmul"]
+}
+GCC_FLAGS["x86-64-v3"] = GCC_FLAGS["x86-64-v2"] + ["-mavx", "-mavx2", "-mbmi", "-mbmi2", "-mf16c", "-mfma", "-mlzcnt",
+                                                   "-mmovbe", "-mxsave"]
+# /proc/cpuinfo names of the macOS sysctl machdep.cpu features
+DARWIN_NAMES = {"SSE3": "sse3", "PCLMULQDQ": "pclmulqdq", "SSSE3": "ssse3", "FMA": "fma", "CX16": "cx16",
+                "SSE4.1": "sse4_1", "SSE4.2": "sse4_2", "MOVBE": "movbe", "POPCNT": "popcnt", "AES": "aes",
+                "XSAVE": "xsave", "AVX1.0": "avx", "F16C": "f16c", "BMI1": "bmi1", "AVX2": "avx2", "BMI2": "bmi2",
+                "AVX512F": "avx512f", "AVX512DQ": "avx512dq", "AVX512BW": "avx512bw", "AVX512VL": "avx512vl",
+                "LAHF": "lahf_lm", "LZCNT": "abm"}
+# IsProcessorFeaturePresent() constants, Windows only tells about a few of them
+WINDOWS_FEATURES = {"sse3": 13, "ssse3": 36, "sse4_1": 37, "sse4_2": 38, "avx": 39, "avx2": 40, "avx512f": 41}
+
+CHECK_NAME = "hyker_cpu_check"
+
+
+def host_features():
+    """CPUID features of this machine, None when they cannot be read."""
+    system = platform.system()
+    try:
+        if system == "Linux":
+            with open("/proc/cpuinfo") as f:
+                match = re.search(r"^flags\s*:(.*)$", f.read(), re.MULTILINE)
+            if not match:
+                return None
+            features = set(match.group(1).split())
+            if "pni" in features:
+                features.add("sse3")
+            return features & set(CPUID_BITS)
+        if system == "Darwin":
+            names = []
+            for key in ("machdep.cpu.features", "machdep.cpu.leaf7_features", "machdep.cpu.extfeatures"):
+                try:
+                    names.extend(subprocess.check_output(["sysctl", "-n", key]).decode().split())
+                except subprocess.CalledProcessError:
+                    pass
+            return set(DARWIN_NAMES[name] for name in names if name in DARWIN_NAMES) or None
+        if system == "Windows":
+            import ctypes
+            present = ctypes.windll.kernel32.IsProcessorFeaturePresent
+            return set(name for name, number in WINDOWS_FEATURES.items() if present(number))
+    except (IOError, OSError):
+        return None
+    return None
+
+
+def host_level():
+    """Highest level this machine runs, None when its features are unknown."""
+    features = host_features()
+    if features is None:
+        return None
+    level = "baseline"
+    for name in ("x86-64-v2", "x86-64-v3"):
+        known = set(FEATURES[name]) & set(WINDOWS_FEATURES) if platform.system() == "Windows" else set(FEATURES[name])
+        if known <= features:
+            level = name
+    return level
+
+
+def requested_level(conanfile):
+    """The cpu_level option, baseline for the architectures it does not apply to and recipes without it."""
+    if not has_option(conanfile, "cpu_level"):
+        return "baseline"
+    if conanfile.settings.arch != "x86_64" or conanfile.settings.os == "iOS":
+        return "baseline"
+    return str(conanfile.options.cpu_level)
+
+
+def level(conanfile):
+    """The level the binaries are built for, what the compiler can do of the requested one."""
+    selected = requested_level(conanfile)
+    if conanfile.settings.compiler == "Visual Studio" and selected in ("x86-64-v2", "native"):
+        # No switch enables SSE4.2 and friends without AVX2, the binaries would be the baseline ones
+        return "x86-64-v3" if selected == "native" and host_level() == "x86-64-v3" else "baseline"
+    return selected
+
+
+def required_features(conanfile):
+    selected = level(conanfile)
+    if selected == "native":
+        return sorted(host_features() or [])
+    return FEATURES.get(selected, [])
+
+
+def package_id_value(conanfile):
+    selected = level(conanfile)
+    if selected != "native":
+        return selected
+    # -march=native on two different machines makes two different binaries
+    return "native-%s" % sha256_text(" ".join(required_features(conanfile)))[:12]
+
+
+def compiler_flags(conanfile):
+    selected = level(conanfile)
+    if conanfile.settings.compiler == "Visual Studio":
+        return ["/arch:AVX2"] if selected == "x86-64-v3" else []
+    if selected == "native":
+        return ["-march=native"]
+    return list(GCC_FLAGS.get(selected, []))
+
+
+def warn_unsupported_host(conanfile):
+    """Tell when the binaries being built cannot run on this machine (tests, benchmarks) or are not the level asked."""
+    if level(conanfile) != requested_level(conanfile):
+        conanfile.output.warn("%s cannot build cpu_level=%s, building %s" % (conanfile.settings.compiler,
+                                                                            requested_level(conanfile), level(conanfile)))
+    features = host_features()
+    if features is None:
+        return
+    missing = [name for name in required_features(conanfile) if name not in features]
+    if missing and platform.system() != "Windows":
+        conanfile.output.warn("This machine lacks %s, the %s binaries cannot run here" % (", ".join(missing), level(conanfile)))
+
+
+CHECK_SOURCE = r"""/* Written by hykerbuild.cpu_level: aborts at startup on CPUs without the features
+ * %(package)s was built for (cpu_level=%(level)s). Compiled without any ISA flag. */
+#include <stdio.h>
+#include <stdlib.h>
+#if defined(_MSC_VER)
+#include <intrin.h>
+static void hyker_cpuid(unsigned leaf, unsigned r[4])
+{
+    int values[4];
+    __cpuidex(values, (int)leaf, 0);
+    r[0] = values[0]; r[1] = values[1]; r[2] = values[2]; r[3] = values[3];
+}
+static unsigned long long hyker_xgetbv(void) { return _xgetbv(0); }
+#else
+#include <cpuid.h>
+static void hyker_cpuid(unsigned leaf, unsigned r[4]) { __cpuid_count(leaf, 0, r[0], r[1], r[2], r[3]); }
+static unsigned long long hyker_xgetbv(void)
+{
+    unsigned eax, edx;
+    __asm__ volatile("xgetbv" : "=a"(eax), "=d"(edx) : "c"(0));
+    return ((unsigned long long)edx << 32) | eax;
+}
+#endif
+
+static const struct { const char *name; unsigned leaf; int reg; int bit; } hyker_required[] = {
+%(required)s
+};
+
+static void %(prefix)s_check(void)
+{
+    unsigned r[4], max_leaf, max_extended_leaf, i;
+    int missing = 0;
+    hyker_cpuid(0, r);
+    max_leaf = r[0];
+    hyker_cpuid(0x80000000u, r);
+    max_extended_leaf = r[0];
+    for (i = 0; i < sizeof(hyker_required) / sizeof(hyker_required[0]); ++i) {
+        unsigned leaf = hyker_required[i].leaf;
+        int present = 0;
+        if (leaf <= (leaf >= 0x80000000u ? max_extended_leaf : max_leaf)) {
+            hyker_cpuid(leaf, r);
+            present = (r[hyker_required[i].reg] >> hyker_required[i].bit) & 1;
+        }
+        if (!present) {
+            fprintf(stderr, "%%s%%s", missing ? ", " : "%(package)s was built for cpu_level=%(level)s, this CPU lacks ", hyker_required[i].name);
+            missing = 1;
+        }
+    }
+    /* The AVX registers must also be enabled by the operating system */
+    hyker_cpuid(1, r);
+    if (!missing && %(os_mask)s && (!((r[2] >> 27) & 1) || (hyker_xgetbv() & %(os_mask)s) != %(os_mask)s)) {
+        fprintf(stderr, "%(package)s was built for cpu_level=%(level)s, the operating system does not enable AVX");
+        missing = 1;
+    }
+    if (missing) {
+        fprintf(stderr, "\n");
+        abort();
+    }
+}
+
+#if defined(_MSC_VER)
+/* Runs before the C++ dynamic initializers (.CRT$XCU) */
+#pragma section(".CRT$XCT", read)
+__declspec(allocate(".CRT$XCT")) void (*%(prefix)s_init)(void) = %(prefix)s_check;
+#pragma comment(linker, "/include:%(prefix)s_init")
+#elif defined(__APPLE__)
+__attribute__((constructor)) static void %(prefix)s_init(void) { %(prefix)s_check(); }
+#else
+__attribute__((constructor(101))) static void %(prefix)s_init(void) { %(prefix)s_check(); }
+#endif
+"""
+
+
+def _check_source(conanfile):
+    features = required_features(conanfile)
+    required = ",\n".join('    {"%s", 0x%xu, %d, %d}' % ((name,) + CPUID_BITS[name]) for name in features)
+    # XCR0: SSE and AVX state, plus the opmask and ZMM state for AVX-512
+    os_mask = 0
+    if "avx" in features:
+        os_mask = 0x6
+    if any(name.startswith("avx512") for name in features):
+        os_mask = 0xe6
+    return CHECK_SOURCE % {"package": conanfile.name, "level": level(conanfile),
+                           "prefix": "hyker_cpu_check_%s" % re.sub(r"\W", "_", conanfile.name),
+                           "required": required or '    {"", 0, 0, 0}', "os_mask": "0x%xu" % os_mask}
+
+
+def _object_name(conanfile):
+    return CHECK_NAME + (".obj" if conanfile.settings.compiler == "Visual Studio" else ".o")
+
+
+def build_check(conanfile, folder=CHECK_NAME):
+    """Compile the startup check of a tuned package in ``folder``, None when the level needs none."""
+    if level(conanfile) == "baseline":
+        return None
+    mkdirs(folder)
+    source = os.path.join(folder, CHECK_NAME + ".c")
+    with open(source, "w") as f:
+        f.write(_check_source(conanfile))
+    target = os.path.join(folder, _object_name(conanfile))
+    if conanfile.settings.compiler == "Visual Studio":
+        if not which("cl"):
+            conanfile.output.warn("cl is not in the PATH, the %s package gets no CPU check" % level(conanfile))
+            return None
+        command = 'cl /nologo /c /O2 "%s" /Fo"%s"' % (source, target)
+    else:
+        compiler = os.environ.get("CC") or ("gcc" if conanfile.settings.compiler == "gcc" else "clang")
+        command = '%s -c -O2 -fPIC "%s" -o "%s"' % (compiler, source, target)
+    conanfile.run(command)
+    return target
+
+
+def package(conanfile, folder=CHECK_NAME):
+    path = os.path.join(folder, _object_name(conanfile))
+    if level(conanfile) != "baseline" and os.path.exists(path):
+        shutil.copy2(path, mkdirs(os.path.join(conanfile.package_folder, "lib")))
+
+
+def packaged_check(conanfile):
+    """Path of the check object in the package folder, None when the package has none."""
+    path = os.path.join(conanfile.package_folder, "lib", _object_name(conanfile))
+    return path if level(conanfile) != "baseline" and os.path.exists(path) else None
+
+
+def package_info(conanfile):
+    path = packaged_check(conanfile)
+    if path:
+        conanfile.cpp_info.exelinkflags.append(path)
+        conanfile.cpp_info.sharedlinkflags.append(path)
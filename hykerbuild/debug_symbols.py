@@ -0,0 +1,249 @@
+"""Stripped packages with their debug information kept aside.
+
+With the ``split_debug`` option, package() calls ``split()`` once the files
+are in the package folder.  Every library and executable is stripped, and
+what was removed goes to a sidecar folder outside the package,
+``<cache root>/debug/<name>-<version>-<package id>/``, with the same layout:
+
+    ELF shared libraries   ``lib/libssl.so.1.0.0.debug`` (objcopy --only-keep-debug),
+                           the stripped library gets a .gnu_debuglink to it and
+                           ``<cache root>/debug/.build-id/xx/yyyy.debug`` links
+                           to it by build ID
+    Mach-O dylibs          ``lib/libssl.1.0.0.dylib.dSYM`` (dsymutil)
+    static libraries       ``lib/libssl.a``, a copy taken before the packaged
+                           archive is stripped (strip --strip-unneeded, -S on
+                           Apple) like the other binaries
+
+gdb finds the shared library symbols with
+``set debug-file-directory <cache root>/debug``, lldb finds the dSYM bundles
+by UUID through Spotlight or ``add-dsym``.  Consumers who want the debug
+information of the static libraries set HYKER_DEBUG_SYMBOLS=1: package_info()
+then puts the unstripped archives first in the library path, downloading the
+sidecar when it is not in the local cache.
+
+Sidecars are shared through HYKER_DEBUG_SYMBOLS_URL (default
+HYKER_BINARY_CACHE_URL) as ``<url>/<name>-<version>-<package id>.debug.tar.gz``,
+``python -m hykerbuild.binary_cache serve`` answers those too.
+
+Windows packages are left untouched: MSVC already writes the debug
+information to separate .pdb files.
+
+The strip tools are OBJCOPY, STRIP, READELF and DSYMUTIL when set, e.g. for
+cross toolchains, otherwise the ones on the PATH.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import tempfile
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+from hykerbuild import report
+from hykerbuild.binary_cache import http_put
+from hykerbuild.util import HykerBuildError, FileLock, cache_root, env_flag, extract_tar, mkdirs, which
+
+ELF_MAGIC    = b"\x7fELF"
+MACHO_MAGICS = (b"\xfe\xed\xfa\xce", b"\xce\xfa\xed\xfe", b"\xfe\xed\xfa\xcf", b"\xcf\xfa\xed\xfe", b"\xca\xfe\xba\xbe")
+AR_MAGIC     = b"!<arch>\n"
+COMPLETE     = ".complete"
+
+
+def _tool(name):
+    executable = os.environ.get(name.upper()) or which(name)
+    if not executable:
+        raise HykerBuildError("split_debug is enabled but %s was not found, install it or set %s" % (name, name.upper()))
+    return executable
+
+
+def _kind(path):
+    with open(path, "rb") as f:
+        magic = f.read(8)
+    if magic == AR_MAGIC:
+        return "static"
+    if magic[:4] == ELF_MAGIC:
+        return "elf"
+    if magic[:4] in MACHO_MAGICS:
+        return "macho"
+    return None
+
+
+def _detach(path):
+    """Give ``path`` its own inode before it is modified, it may be hardlinked from a build folder or a cache."""
+    if os.stat(path).st_nlink > 1:
+        temp = path + ".detach"
+        shutil.copy2(path, temp)
+        os.rename(temp, path)
+
+
+def _build_id(readelf, path):
+    try:
+        notes = subprocess.check_output([readelf, "-n", path]).decode("utf-8", "replace")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    match = re.search(r"Build ID:\s*([0-9a-f]+)", notes)
+    return match.group(1) if match else None
+
+
+def symbols_root():
+    return os.path.join(cache_root(), "debug")
+
+
+def sidecar_name(conanfile):
+    return "%s-%s-%s" % (conanfile.name, conanfile.version, os.path.basename(os.path.normpath(conanfile.package_folder)))
+
+
+def _remote():
+    url = os.environ.get("HYKER_DEBUG_SYMBOLS_URL") or os.environ.get("HYKER_BINARY_CACHE_URL")
+    return url.rstrip("/") if url else None
+
+
+def _binaries(package_folder):
+    for folder in ("lib", "bin"):
+        for root, _, files in os.walk(os.path.join(package_folder, folder)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if not os.path.islink(path):
+                    kind = _kind(path)
+                    if kind:
+                        yield os.path.relpath(path, package_folder), kind
+
+
+def _link_build_id(build_id, debug_path):
+    link = os.path.join(symbols_root(), ".build-id", build_id[:2], build_id[2:] + ".debug")
+    mkdirs(os.path.dirname(link))
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(debug_path, link)
+
+
+def _split_elf(path, debug_path, build_ids, objcopy, strip, readelf):
+    subprocess.check_call([objcopy, "--only-keep-debug", path, debug_path])
+    subprocess.check_call([strip, "--strip-unneeded", path])
+    # The debug link is the base name, gdb also looks for it next to the library and in the debug directory
+    subprocess.check_call([objcopy, "--add-gnu-debuglink=%s" % debug_path, path])
+    build_id = _build_id(readelf, debug_path) if readelf else None
+    if build_id:
+        build_ids.append((build_id, debug_path))
+
+
+def split(conanfile):
+    """Strip the binaries of the package folder and move their debug information to the sidecar."""
+    if conanfile.settings.os == "Windows":
+        conanfile.output.warn("split_debug: the Windows debug information is already in separate .pdb files")
+        return
+
+    apple = conanfile.settings.os in ("Macos", "iOS")
+    package_folder = conanfile.package_folder
+    sidecar = os.path.join(symbols_root(), sidecar_name(conanfile))
+    shutil.rmtree(sidecar, ignore_errors=True)
+
+    before = after = 0
+    build_ids = []
+    for relative, kind in _binaries(package_folder):
+        path = os.path.join(package_folder, relative)
+        debug_path = os.path.join(sidecar, relative)
+        mkdirs(os.path.dirname(debug_path))
+        _detach(path)
+        before += os.path.getsize(path)
+        if kind == "static":
+            shutil.copy2(path, debug_path)
+            subprocess.check_call([_tool("strip"), "-S" if apple else "--strip-unneeded", path])
+        elif apple:
+            subprocess.check_call([_tool("dsymutil"), path, "-o", debug_path + ".dSYM"])
+            subprocess.check_call([_tool("strip"), "-x", path])
+        else:
+            _split_elf(path, debug_path + ".debug", build_ids, _tool("objcopy"), _tool("strip"),
+                       os.environ.get("READELF") or which("readelf"))
+        after += os.path.getsize(path)
+
+    for build_id, debug_path in build_ids:
+        _link_build_id(build_id, debug_path)
+
+    if not os.path.isdir(sidecar):
+        conanfile.output.warn("split_debug: no library to strip in the package")
+        return
+    with open(os.path.join(sidecar, COMPLETE), "w") as f:
+        f.write(sidecar_name(conanfile))
+    conanfile.output.info("Stripped the package from %.1f MB to %.1f MB, debug information in %s" %
+                          (before / 1048576.0, after / 1048576.0, sidecar))
+    report.record("split_debug", {"bytes_before": before, "bytes_after": after, "build_ids": len(build_ids)})
+    _upload(conanfile, sidecar)
+
+
+def _upload(conanfile, sidecar):
+    remote = _remote()
+    if not remote:
+        return
+    url = "%s/%s.debug.tar.gz" % (remote, os.path.basename(sidecar))
+    fd, archive = tempfile.mkstemp(suffix=".tar.gz")
+    os.close(fd)
+    try:
+        with tarfile.open(archive, "w:gz") as t:
+            t.add(sidecar, os.path.basename(sidecar))
+        http_put(url, archive)
+        conanfile.output.info("Uploaded the debug information to %s" % url)
+    except (IOError, OSError) as e:
+        conanfile.output.warn("Could not upload %s: %s" % (url, e))
+    finally:
+        os.unlink(archive)
+
+
+def fetch(conanfile):
+    """Return the sidecar folder of the package, downloading it if needed, None when there is none."""
+    name = sidecar_name(conanfile)
+    sidecar = os.path.join(symbols_root(), name)
+    with FileLock(sidecar + ".lock"):
+        if os.path.exists(os.path.join(sidecar, COMPLETE)):
+            return sidecar
+        remote = _remote()
+        if not remote:
+            return None
+        url = "%s/%s.debug.tar.gz" % (remote, name)
+        temp = tempfile.mkdtemp(dir=mkdirs(symbols_root()))
+        try:
+            archive = os.path.join(temp, "sidecar.tar.gz")
+            try:
+                response = urlopen(url)
+            except HTTPError as e:
+                if e.code == 404:
+                    return None
+                raise
+            with open(archive, "wb") as f:
+                shutil.copyfileobj(response, f, 1 << 20)
+            extract_tar(archive, os.path.join(temp, "extracted"))
+            if not os.path.exists(os.path.join(temp, "extracted", name, COMPLETE)):
+                conanfile.output.warn("%s is not a debug information archive of %s" % (url, name))
+                return None
+            shutil.rmtree(sidecar, ignore_errors=True)
+            os.rename(os.path.join(temp, "extracted", name), sidecar)
+        except (IOError, OSError, tarfile.TarError, HykerBuildError) as e:
+            conanfile.output.warn("Could not download %s: %s" % (url, e))
+            return None
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+
+        readelf = os.environ.get("READELF") or which("readelf")
+        for relative, _ in _binaries(sidecar):
+            build_id = _build_id(readelf, os.path.join(sidecar, relative)) if readelf and relative.endswith(".debug") else None
+            if build_id:
+                _link_build_id(build_id, os.path.join(sidecar, relative))
+    return sidecar
+
+
+def package_info(conanfile):
+    """With HYKER_DEBUG_SYMBOLS set, link the consumer against the unstripped static libraries."""
+    if not env_flag("HYKER_DEBUG_SYMBOLS") or conanfile.settings.os == "Windows":
+        return
+    sidecar = fetch(conanfile)
+    if sidecar is None:
+        conanfile.output.warn("No debug information for %s" % sidecar_name(conanfile))
+        return
+    conanfile.cpp_info.libdirs.insert(0, os.path.join(sidecar, "lib"))
+    conanfile.output.info("Debug information of %s in %s, use 'set debug-file-directory %s' in gdb" %
+                          (conanfile.name, sidecar, symbols_root()))
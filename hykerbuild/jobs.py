@@ -0,0 +1,103 @@
+"""Number of parallel compile jobs a recipe should use.
+
+Blindly using one job per core runs the heavy Boost components out of memory
+on machines with a lot of cores, so the count is the smallest of:
+
+- the number of cores not already busy according to the load average,
+- the available memory divided by the memory one compile job of the package needs.
+
+HYKER_JOBS (or conan's own CONAN_CPU_COUNT) overrides the computed value.
+The orchestrator sets HYKER_CONCURRENT_BUILDS to the number of recipes it
+builds at the same time, each of them then gets that share of the jobs.
+"""
+import multiprocessing
+import os
+import platform
+import re
+import subprocess
+
+
+def available_memory_mb():
+    """Memory available for new processes in MB, None when it cannot be determined."""
+    system = platform.system()
+    try:
+        if system == "Linux":
+            values = {}
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    name, value = line.split(":", 1)
+                    values[name] = int(value.split()[0])
+            available = values.get("MemAvailable")
+            if available is None:
+                available = values["MemFree"] + values.get("Buffers", 0) + values.get("Cached", 0)
+            return available // 1024
+        elif system == "Darwin":
+            output = subprocess.check_output(["vm_stat"]).decode()
+            page_size = int(re.search(r"page size of (\d+) bytes", output).group(1))
+            pages = 0
+            for name in ("Pages free", "Pages inactive", "Pages speculative"):
+                match = re.search(r"%s:\s+(\d+)" % name, output)
+                if match:
+                    pages += int(match.group(1))
+            return pages * page_size // (1 << 20)
+        elif system == "Windows":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong),
+                            ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong),
+                            ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong),
+                            ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong),
+                            ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("sullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullAvailPhys // (1 << 20)
+    except Exception:
+        pass
+    return None
+
+
+def load_average():
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 0.0
+
+
+def concurrent_builds():
+    return max(1, int(os.environ.get("HYKER_CONCURRENT_BUILDS") or 1))
+
+
+def job_count(memory_per_job_mb, output=None):
+    builds = concurrent_builds()
+    shared = " shared by %d builds" % builds if builds > 1 else ""
+    for variable in ("HYKER_JOBS", "CONAN_CPU_COUNT"):
+        value = os.environ.get(variable)
+        if value:
+            jobs = max(1, int(value) // builds)
+            if output:
+                output.info("Using %d jobs from %s=%s%s" % (jobs, variable, value, shared))
+            return jobs
+
+    cpus = multiprocessing.cpu_count()
+    load = load_average()
+    jobs = max(1, cpus - int(load))
+    reason = "%d cores, load %.1f" % (cpus, load)
+
+    memory = available_memory_mb()
+    if memory is not None and memory_per_job_mb:
+        by_memory = max(1, memory // memory_per_job_mb)
+        reason += ", %d MB available for %d MB per job" % (memory, memory_per_job_mb)
+        jobs = min(jobs, by_memory)
+    jobs = max(1, jobs // builds)
+    reason += shared
+
+    if output:
+        output.info("Using %d jobs (%s)" % (jobs, reason))
+    return jobs
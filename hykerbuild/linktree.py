@@ -0,0 +1,161 @@
+"""Copy-free packaging of file trees.
+
+``link_tree`` puts every file of a tree into another folder with the cheapest
+method that works: a reflink (copy-on-write clone, Btrfs/XFS/APFS), else a
+hardlink when both folders are on the same filesystem, else a plain copy.
+The files are processed by a thread pool so the copy fallback and the
+syscalls of large trees overlap.  Symlinks are recreated as symlinks.
+
+``shared_tree`` keeps a single read-only copy of a tree under
+``<cache root>/trees/<key>`` for every package built from the same sources,
+e.g. the Boost headers of one archive.  Packages linking from it share the
+same inodes, so the identical headers of every package ID take the disk space
+of one.
+
+Hardlinked files are the same file as their source: packaged files must not
+be modified in place, which conan does not do.
+"""
+import errno
+import fnmatch
+import multiprocessing
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+
+from hykerbuild.util import FileLock, cache_root, mkdirs, sha256_text
+
+FICLONE = 0x40049409
+METHODS = ("reflink", "hardlink", "copy")
+
+
+def _reflink(source, destination):
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(source, "rb") as src:
+            with open(destination, "wb") as dst:
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                except (IOError, OSError):
+                    dst.close()
+                    os.unlink(destination)
+                    raise
+        shutil.copystat(source, destination)
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(source.encode("utf-8"), destination.encode("utf-8"), 0) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+    else:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on %s" % sys.platform)
+
+
+def _hardlink(source, destination):
+    if not hasattr(os, "link"):
+        raise OSError(errno.EOPNOTSUPP, "hardlinks are not supported")
+    os.link(source, destination)
+
+
+class _Linker(object):
+    """Links files with the first method that works, methods failing once are not tried again."""
+
+    def __init__(self, methods=METHODS):
+        self.methods = list(methods)
+        self.counts  = dict((method, 0) for method in METHODS + ("symlink",))
+        self.lock    = threading.Lock()
+
+    def link(self, source, destination):
+        if os.path.lexists(destination):
+            os.unlink(destination)
+        if os.path.islink(source):
+            os.symlink(os.readlink(source), destination)
+            self._count("symlink")
+            return
+        for method in list(self.methods):
+            if method == "copy":
+                shutil.copy2(source, destination)
+            else:
+                try:
+                    (_reflink if method == "reflink" else _hardlink)(source, destination)
+                except (IOError, OSError):
+                    with self.lock:
+                        if method in self.methods and len(self.methods) > 1:
+                            self.methods.remove(method)
+                    continue
+            self._count(method)
+            return
+        raise OSError(errno.EIO, "Could not link %s" % source)
+
+    def _count(self, method):
+        with self.lock:
+            self.counts[method] += 1
+
+
+def link_file(source, destination, methods=("hardlink", "copy")):
+    mkdirs(os.path.dirname(destination))
+    _Linker(methods).link(source, destination)
+
+
+def _files(source, patterns):
+    for root, folders, files in os.walk(source):
+        for name in folders + files:
+            path = os.path.join(root, name)
+            if name in folders and not os.path.islink(path):
+                continue
+            relative = os.path.relpath(path, source)
+            if any(fnmatch.fnmatch(relative.replace(os.sep, "/"), pattern) for pattern in patterns):
+                yield relative
+
+
+def link_tree(source, destination, patterns=("*",), methods=METHODS, jobs=None):
+    """Link the files of ``source`` matching ``patterns`` (on their relative path) into ``destination``.
+
+    Returns the number of files handled by each method.
+    """
+    linker = _Linker(methods)
+    relatives = list(_files(source, patterns))
+    for folder in sorted(set(os.path.dirname(relative) for relative in relatives)):
+        mkdirs(os.path.join(destination, folder))
+
+    pool = ThreadPool(jobs or min(16, 2 * multiprocessing.cpu_count()))
+    try:
+        pool.map(lambda relative: linker.link(os.path.join(source, relative), os.path.join(destination, relative)),
+                 relatives, chunksize=64)
+    finally:
+        pool.close()
+        pool.join()
+    return dict((method, count) for method, count in linker.counts.items() if count)
+
+
+def shared_tree(key, source, output=None):
+    """Return the shared read-only copy of the ``source`` tree for ``key``, creating it from ``source`` if needed."""
+    root = os.path.join(cache_root(), "trees")
+    tree = os.path.join(root, sha256_text(key)[:16])
+    with FileLock(tree + ".lock"):
+        if os.path.exists(os.path.join(tree, ".complete")):
+            return os.path.join(tree, "tree")
+
+        shutil.rmtree(tree, ignore_errors=True)
+        temp = tempfile.mkdtemp(dir=mkdirs(root))
+        try:
+            counts = link_tree(source, os.path.join(temp, "tree"))
+            if os.name != "nt":
+                # Every package shares these inodes, make accidental in-place edits fail
+                for folder, _, files in os.walk(os.path.join(temp, "tree")):
+                    for name in files:
+                        path = os.path.join(folder, name)
+                        if not os.path.islink(path):
+                            os.chmod(path, os.stat(path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+            with open(os.path.join(temp, ".complete"), "w") as f:
+                f.write(key)
+            os.rename(temp, tree)
+        except Exception:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+        if output:
+            output.info("Shared tree for %s created in %s (%s)" % (key, tree, ", ".join("%d %s" % (n, m) for m, n in sorted(counts.items()))))
+    return os.path.join(tree, "tree")
@@ -0,0 +1,42 @@
+"""Run build commands with their output streamed to a log file.
+
+The console only gets a throttled progress line (lines so far, elapsed time)
+while the full output goes to the log file.  When the command fails the last
+lines are printed so the error is visible without opening the log.
+"""
+import collections
+import subprocess
+import time
+
+from hykerbuild.util import HykerBuildError
+
+
+def run_logged(command, log_path, output, cwd=None, label=None, tail_lines=60, interval=15):
+    label = label or (command if len(command) <= 40 else command[:37] + "...")
+    tail = collections.deque(maxlen=tail_lines)
+    start = last_report = time.time()
+    count = 0
+
+    with open(log_path, "ab") as log:
+        log.write(("$ %s\n" % command).encode("utf-8"))
+        log.flush()
+        process = subprocess.Popen(command, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        for line in iter(process.stdout.readline, b""):
+            log.write(line)
+            tail.append(line)
+            count += 1
+            now = time.time()
+            if now - last_report >= interval:
+                output.info("%s: %d lines, %ds" % (label, count, now - start))
+                last_report = now
+        process.stdout.close()
+        code = process.wait()
+        log.write(("# exit code %d after %ds\n" % (code, time.time() - start)).encode("utf-8"))
+
+    if code != 0:
+        output.error("%s failed with exit code %d, last %d lines:" % (label, code, len(tail)))
+        for line in tail:
+            output.writeln(line.decode("utf-8", "replace").rstrip())
+        raise HykerBuildError("%s failed with exit code %d, full log in %s" % (label, code, log_path))
+
+    output.info("%s: done, %d lines in %ds" % (label, count, time.time() - start))
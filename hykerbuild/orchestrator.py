@@ -0,0 +1,286 @@
+"""Export and build every recipe of the repository in dependency order.
+
+Usage:
+    python -m hykerbuild.orchestrator [--jobs N] [--export-only] [-- conan install args]
+
+Every ``conanfile.py`` below the repository root is parsed (not imported, conan
+does not need to be installed to plan a build), the requirements between the
+recipes are turned into a graph and the recipes are exported and built through
+a bounded pool.  A recipe starts as soon as all the recipes it requires have
+been built, so independent recipes build at the same time.  Each recipe also
+compiles in parallel, so the recipes built at the same time share the compile
+jobs of the machine (see hykerbuild.jobs) and only a few run at once by default.
+"""
+import argparse
+import ast
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from hykerbuild import boost
+from hykerbuild.util import mkdirs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Recipes built at the same time, each one compiles with its share of the jobs
+DEFAULT_CONCURRENT_BUILDS = 3
+
+
+class Recipe(object):
+    def __init__(self, path, name, version, requires):
+        self.path     = path
+        self.name     = name
+        self.version  = version
+        self.requires = requires
+
+    @property
+    def folder(self):
+        return os.path.dirname(self.path)
+
+    def reference(self, user, channel):
+        return "%s/%s@%s/%s" % (self.name, self.version, user, channel)
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def _is_conanfile_class(node):
+    for base in node.bases:
+        if isinstance(base, ast.Name) and base.id == "ConanFile":
+            return True
+        if isinstance(base, ast.Attribute) and base.attr == "ConanFile":
+            return True
+    return False
+
+
+def _required_references(class_node):
+    references = []
+    for node in class_node.body:
+        if isinstance(node, ast.Assign):
+            targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
+            if "requires" in targets:
+                value = _literal(node.value)
+                if isinstance(value, str):
+                    value = [value]
+                references.extend(value or [])
+
+    # self.requires.add("pkg/version@user/channel", ...) and self.requires("...")
+    for node in ast.walk(class_node):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr == "add":
+            func = func.value
+        if isinstance(func, ast.Attribute) and func.attr == "requires":
+            value = _literal(node.args[0])
+            if isinstance(value, str):
+                references.append(value)
+    return references
+
+
+def parse_recipe(path):
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and _is_conanfile_class(node):
+            attributes = {}
+            for statement in node.body:
+                if isinstance(statement, ast.Assign):
+                    for target in statement.targets:
+                        if isinstance(target, ast.Name):
+                            attributes[target.id] = _literal(statement.value)
+            name = attributes.get("name")
+            version = attributes.get("version")
+            if not isinstance(name, str) or not isinstance(version, str):
+                return None
+            requires = sorted(set(reference.split("/")[0] for reference in _required_references(node)))
+            return Recipe(path, name, version, requires)
+    return None
+
+
+def find_recipes(root=ROOT):
+    recipes = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != "hykerbuild"]
+        if "conanfile.py" in files:
+            recipe = parse_recipe(os.path.join(folder, "conanfile.py"))
+            if recipe:
+                recipes.append(recipe)
+    return sorted(recipes, key=lambda r: r.name)
+
+
+def sync_helpers(recipe):
+    """Copy this package next to the recipe so "hykerbuild/*.py" gets exported with it."""
+    destination = os.path.join(recipe.folder, "hykerbuild")
+    shutil.rmtree(destination, ignore_errors=True)
+    shutil.copytree(os.path.dirname(os.path.abspath(__file__)), destination,
+                    ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+
+
+def local_graph(recipes):
+    """Map every recipe name to the names of the local recipes it requires."""
+    names = set(recipe.name for recipe in recipes)
+    graph = {}
+    for recipe in recipes:
+        graph[recipe.name] = set(name for name in recipe.requires if name in names)
+
+    # Reject cycles up front instead of deadlocking the scheduler
+    visiting, visited = set(), set()
+
+    def visit(name, path):
+        if name in visiting:
+            raise ValueError("Dependency cycle: %s" % " -> ".join(path + [name]))
+        if name in visited:
+            return
+        visiting.add(name)
+        for dependency in sorted(graph[name]):
+            visit(dependency, path + [name])
+        visiting.remove(name)
+        visited.add(name)
+
+    for name in sorted(graph):
+        visit(name, [])
+    return graph
+
+
+def run_graph(graph, task, jobs):
+    """Run ``task(name)`` for every node once all its dependencies succeeded.
+
+    Returns a dict mapping every name to "ok", "failed" or "skipped".
+    """
+    results = {}
+    running = set()
+    condition = threading.Condition()
+    pool = ThreadPool(max(1, jobs))
+
+    def finished(name, ok):
+        with condition:
+            running.discard(name)
+            results[name] = "ok" if ok else "failed"
+            condition.notify()
+
+    def start(name):
+        def call():
+            try:
+                return task(name)
+            except Exception as e:
+                sys.stderr.write("%s: %s\n" % (name, e))
+                return False
+        running.add(name)
+        pool.apply_async(call, callback=lambda ok: finished(name, ok))
+
+    try:
+        with condition:
+            while len(results) < len(graph):
+                for name in sorted(graph):
+                    if name in results or name in running:
+                        continue
+                    states = [results.get(dependency) for dependency in graph[name]]
+                    if any(state in ("failed", "skipped") for state in states):
+                        results[name] = "skipped"
+                    elif all(state == "ok" for state in states):
+                        start(name)
+                if len(results) < len(graph):
+                    condition.wait(1)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+class Orchestrator(object):
+    def __init__(self, recipes, user, channel, jobs, log_folder, install_args):
+        self.recipes      = dict((recipe.name, recipe) for recipe in recipes)
+        self.user         = user
+        self.channel      = channel
+        self.jobs         = jobs
+        self.log_folder   = log_folder
+        self.install_args = install_args
+        self._print_lock  = threading.Lock()
+
+    def _say(self, message):
+        with self._print_lock:
+            sys.stdout.write("%s\n" % message)
+            sys.stdout.flush()
+
+    def _run(self, recipe, step, command, env=None):
+        mkdirs(self.log_folder)
+        log_path = os.path.join(self.log_folder, "%s-%s.log" % (recipe.name, step))
+        self._say("[%s] %s: %s" % (recipe.name, step, " ".join(command)))
+        start = time.time()
+        with open(log_path, "w") as log:
+            code = subprocess.call(command, cwd=recipe.folder, stdout=log, stderr=subprocess.STDOUT, env=env)
+        elapsed = time.time() - start
+        if code:
+            self._say("[%s] %s FAILED after %.0fs, see %s" % (recipe.name, step, elapsed, log_path))
+        else:
+            self._say("[%s] %s done in %.0fs" % (recipe.name, step, elapsed))
+        return code == 0
+
+    def export(self, name):
+        recipe = self.recipes[name]
+        sync_helpers(recipe)
+        return self._run(recipe, "export", ["conan", "export", "%s/%s" % (self.user, self.channel)])
+
+    def build(self, name):
+        recipe = self.recipes[name]
+        command = ["conan", "install", recipe.reference(self.user, self.channel),
+                   "--build", recipe.name, "--build", "missing"]
+        env = dict(os.environ, HYKER_CONCURRENT_BUILDS=str(min(self.jobs, len(self.recipes))))
+        return self._run(recipe, "build", command + self.install_args, env)
+
+    def run(self, export_only=False):
+        graph = local_graph(self.recipes.values())
+        for name in sorted(graph):
+            external = [r for r in self.recipes[name].requires if r not in graph]
+            self._say("%s <- %s%s" % (name,
+                                      ", ".join(sorted(graph[name])) or "-",
+                                      " (external: %s)" % ", ".join(external) if external else ""))
+
+        # Exports are independent of each other, only the builds follow the graph
+        exports = run_graph(dict((name, set()) for name in graph), self.export, self.jobs)
+        if export_only or any(state != "ok" for state in exports.values()):
+            return exports
+        return run_graph(graph, self.build, self.jobs)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    install_args = []
+    if "--" in argv:
+        install_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+
+    parser = argparse.ArgumentParser(description="Export and build all recipes in dependency order")
+    parser.add_argument("--user", default="hykersec")
+    parser.add_argument("--channel", default="testing")
+    parser.add_argument("--jobs", "-j", type=int, default=min(DEFAULT_CONCURRENT_BUILDS, multiprocessing.cpu_count()),
+                        help="Maximum number of recipes processed at the same time (default %(default)s)")
+    parser.add_argument("--export-only", action="store_true", help="Only export the recipes")
+    parser.add_argument("--logs", default=os.path.join(ROOT, "build-logs"),
+                        help="Folder receiving one log file per recipe and step")
+    parser.add_argument("--root", default=ROOT)
+    args = parser.parse_args(argv)
+
+    # The Boost component recipes are generated from a template, with requirements in this user/channel
+    boost.generate_recipes(args.root, args.user, args.channel)
+    recipes = find_recipes(args.root)
+    orchestrator = Orchestrator(recipes, args.user, args.channel, args.jobs, args.logs, install_args)
+    results = orchestrator.run(export_only=args.export_only)
+
+    for name in sorted(results):
+        sys.stdout.write("%-20s %s\n" % (name, results[name]))
+    return 0 if all(state == "ok" for state in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
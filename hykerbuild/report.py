@@ -0,0 +1,112 @@
+"""Per-phase build timing and resource usage.
+
+Recipes wrap their steps in ``phase("compile")`` blocks.  Every finished phase
+is appended to ``build_report.json`` in the current folder: source() writes it
+in the source folder, conan copies it into the build folder with the sources,
+and build() and package() keep appending to it.  ``publish()`` writes the final
+report into the package folder and, when HYKER_REPORT_DIR is set, to
+``<HYKER_REPORT_DIR>/<name>-<version>-<package id>.json`` for CI to collect.
+
+For each phase the report holds the wall time, the CPU time of the recipe and
+of the processes it waited for, and the peak RSS.  The peak RSS is only known
+when the phase raised the high-water mark of the recipe process or of its
+children, otherwise it is below the peak of an earlier phase and left null.
+"""
+import contextlib
+import json
+import os
+import platform
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from hykerbuild.util import mkdirs
+
+REPORT_FILENAME = "build_report.json"
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+def _peak_rss_mb():
+    """High-water marks (self, children) in MB."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1.0 / (1 << 20) if platform.system() == "Darwin" else 1.0 / 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def load(folder="."):
+    path = os.path.join(folder, REPORT_FILENAME)
+    if not os.path.exists(path):
+        return {"phases": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(report, folder="."):
+    with open(os.path.join(folder, REPORT_FILENAME), "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def record(name, values, folder="."):
+    """Add arbitrary values (benchmarks, statistics, ...) to the report under ``name``."""
+    report = load(folder)
+    report[name] = values
+    save(report, folder)
+
+
+@contextlib.contextmanager
+def phase(name, folder="."):
+    start = time.time()
+    start_cpu = _cpu_time()
+    start_self, start_children = _peak_rss_mb()
+    succeeded = False
+    try:
+        yield
+        succeeded = True
+    finally:
+        end_self, end_children = _peak_rss_mb()
+        peak = None
+        if end_self is not None:
+            raised = [end for begin, end in ((start_self, end_self), (start_children, end_children)) if end > begin]
+            peak = round(max(raised), 1) if raised else None
+
+        report = load(folder)
+        report["phases"].append({
+            "name":        name,
+            "start":       round(start, 3),
+            "wall_s":      round(time.time() - start, 3),
+            "cpu_s":       round(_cpu_time() - start_cpu, 3),
+            "peak_rss_mb": peak,
+            "succeeded":   succeeded
+        })
+        save(report, folder)
+
+
+def package_id(conanfile):
+    try:
+        return conanfile.info.package_id()
+    except Exception:
+        return "unknown"
+
+
+def publish(conanfile, folder="."):
+    report = load(folder)
+    report["package"]    = "%s/%s" % (conanfile.name, conanfile.version)
+    report["package_id"] = package_id(conanfile)
+    report["host"]       = platform.node()
+    save(report, conanfile.package_folder)
+
+    report_folder = os.environ.get("HYKER_REPORT_DIR")
+    if report_folder:
+        path = os.path.join(mkdirs(report_folder), "%s-%s-%s.json" % (conanfile.name, conanfile.version, report["package_id"]))
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,53 @@
+"""Concurrent out-of-tree builds of one source tree for several architectures.
+
+Makefiles such as CryptoPP's GNUmakefile-cross build in the source folder, so
+building a second architecture used to mean ``make clean`` and starting over.
+``build_slices()`` gives every architecture its own folder, a hardlinked copy
+of the sources (see ``linktree``), and runs the builds at the same time, each
+logging to ``<log folder>/<arch>.log``.
+
+The slice folders live in ``<cache root>/slices/<key>/<arch>`` and are kept
+between builds: relinking the sources keeps their modification times, so make
+only rebuilds what changed.  ``key`` must cover everything make cannot see,
+e.g. the compiler version and the flags passed through the environment.
+Delete ``<cache root>/slices`` to reclaim the space.
+"""
+import os
+import threading
+import time
+
+from hykerbuild.linktree import link_tree
+from hykerbuild.logs import run_logged
+from hykerbuild.util import HykerBuildError, FileLock, cache_root, mkdirs, sha256_text
+
+
+def build_slices(source, arches, command, key, output, log_folder="."):
+    """Build ``source`` once per arch with the shell command ``command(arch)``, run in the slice folder.
+
+    Returns ({arch: slice folder}, {arch: build seconds}) once every slice succeeded.
+    """
+    root = os.path.join(cache_root(), "slices", sha256_text(key)[:16])
+    folders = dict((arch, os.path.join(root, arch)) for arch in arches)
+    seconds = {}
+    errors = {}
+
+    def build(arch):
+        start = time.time()
+        try:
+            with FileLock(folders[arch] + ".lock"):
+                link_tree(source, mkdirs(folders[arch]))
+                run_logged(command(arch), os.path.abspath(os.path.join(log_folder, "%s.log" % arch)), output,
+                           cwd=folders[arch], label="%s slice" % arch)
+            seconds[arch] = round(time.time() - start, 3)
+        except Exception as e:
+            errors[arch] = e
+
+    threads = [threading.Thread(target=build, args=(arch,)) for arch in arches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise HykerBuildError("The %s slices failed: %s" % (", ".join(sorted(errors)),
+                                                             "; ".join("%s: %s" % item for item in sorted(errors.items()))))
+    return folders, seconds
@@ -0,0 +1,322 @@
+"""Local content-addressed cache for the archives fetched by the source() steps.
+
+Archives are stored once under their SHA256 in ``<cache root>/sources/objects``.
+Tar archives can be streamed: the bytes are hashed, written to the cache and
+extracted in a single pass, see ``SourceCache.extract``.
+URLs (and git url/commit pairs) are indexed so a recipe that does not know the
+checksum of its archive still hits the cache.  The least recently used objects
+are evicted once the cache grows over its size limit.
+
+Environment:
+    HYKER_CACHE              cache root, defaults to ~/.hyker
+    HYKER_SOURCE_CACHE_SIZE  size limit, e.g. "20G" (default 10G)
+    HYKER_OFFLINE            fail instead of downloading when an archive is missing
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import zipfile
+import zlib
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+from hykerbuild.util import (HykerBuildError, FileLock, TAR_FILTER, cache_root, checked_members, env_flag,
+                             mkdirs, parse_size, sha256_file, sha256_text, touch)
+
+
+class SourceCacheMiss(HykerBuildError):
+    pass
+
+
+class _HashingReader(object):
+    """File-like wrapper hashing (and optionally copying) everything read through it."""
+
+    def __init__(self, stream, sink=None):
+        self.stream = stream
+        self.sink   = sink
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.digest.update(data)
+        if self.sink is not None:
+            self.sink.write(data)
+        return data
+
+    def drain(self):
+        while self.read(1 << 20):
+            pass
+        return self.digest.hexdigest()
+
+
+class SourceCache(object):
+    def __init__(self, root=None, max_size=None, offline=None, output=None):
+        self.root     = root or os.path.join(cache_root(), "sources")
+        self.max_size = parse_size(max_size or os.environ.get("HYKER_SOURCE_CACHE_SIZE") or "10G")
+        self.offline  = env_flag("HYKER_OFFLINE") if offline is None else offline
+        self.output   = output
+
+    def _info(self, message):
+        if self.output:
+            self.output.info(message)
+
+    def _object_path(self, sha256):
+        return os.path.join(self.root, "objects", sha256)
+
+    def _index_path(self, key):
+        return os.path.join(self.root, "index", sha256_text(key))
+
+    def _lock(self, key):
+        return FileLock(os.path.join(self.root, "locks", sha256_text(key)))
+
+    def _lookup(self, sha256, key):
+        """Return the path of a verified cached object or None."""
+        if sha256 is None:
+            try:
+                with open(self._index_path(key)) as f:
+                    sha256 = f.read().strip()
+            except IOError:
+                return None
+
+        path = self._object_path(sha256)
+        if not os.path.exists(path):
+            return None
+        if sha256_file(path) != sha256:
+            self._info("Removing corrupted cache entry %s" % path)
+            os.unlink(path)
+            return None
+        touch(path)
+        return path
+
+    def _store(self, temp_path, sha256, key, actual=None):
+        actual = actual or sha256_file(temp_path)
+        if sha256 is not None and actual != sha256:
+            os.unlink(temp_path)
+            raise HykerBuildError("Checksum mismatch for %s: expected %s, got %s" % (key, sha256, actual))
+
+        path = self._object_path(actual)
+        mkdirs(os.path.dirname(path))
+        if os.path.exists(path):
+            os.unlink(temp_path)
+        else:
+            os.rename(temp_path, path)
+
+        index = self._index_path(key)
+        mkdirs(os.path.dirname(index))
+        with open(index, "w") as f:
+            f.write(actual)
+
+        self.evict(keep=path)
+        return path
+
+    def _temp_path(self):
+        folder = mkdirs(os.path.join(self.root, "tmp"))
+        fd, path = tempfile.mkstemp(dir=folder)
+        os.close(fd)
+        return path
+
+    def archive(self, urls, sha256=None):
+        """Return the path of the cached archive, downloading it from the first working url."""
+        if isinstance(urls, str):
+            urls = [urls]
+        key = urls[-1]
+
+        with self._lock(sha256 or key):
+            path = self._lookup(sha256, key)
+            if path:
+                self._info("Using cached %s" % path)
+                return path
+            if self.offline:
+                raise SourceCacheMiss("%s is not in the source cache and offline mode is enabled" % key)
+
+            errors = []
+            for url in urls:
+                temp_path = self._temp_path()
+                try:
+                    self._info("Downloading %s..." % url)
+                    response = urlopen(url)
+                    with open(temp_path, "wb") as f:
+                        shutil.copyfileobj(response, f, 1 << 20)
+                    return self._store(temp_path, sha256, key)
+                except Exception as e:
+                    errors.append("%s: %s" % (url, e))
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+            raise HykerBuildError("Could not download %s" % "; ".join(errors))
+
+    def _cached_sha256(self, sha256, key):
+        if sha256 is None:
+            try:
+                with open(self._index_path(key)) as f:
+                    sha256 = f.read().strip()
+            except IOError:
+                return None
+        return sha256 if os.path.exists(self._object_path(sha256)) else None
+
+    def extract(self, urls, destination, sha256=None, filename=None, members=None):
+        """Fetch and extract a tar archive in one pass, without any intermediate copy.
+
+        The archive is hashed while it is read (from the cache or straight from
+        the network, in which case it is written to the cache on the way) and
+        unpacked into a staging folder.  Only once the checksum matches are the
+        extracted entries moved into ``destination``; a corrupted or truncated
+        archive aborts the extraction and leaves ``destination`` untouched.
+        Zip archives cannot be streamed and are extracted from the cache.
+
+        ``members`` is an optional predicate on the member names, the entries
+        it rejects are skipped without being written to disk.  Extracted
+        entries are merged into existing folders so an already extracted tree
+        can be completed with more members later on.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        key = urls[-1]
+        if (filename or key).endswith(".zip"):
+            extract(self.archive(urls, sha256), destination, filename, members)
+            return
+
+        with self._lock(sha256 or key):
+            cached = self._cached_sha256(sha256, key)
+            if cached:
+                path = self._object_path(cached)
+                self._info("Extracting cached %s" % path)
+                with open(path, "rb") as f:
+                    try:
+                        _stream_extract(_HashingReader(f), destination, cached, members)
+                    except HykerBuildError:
+                        self._info("Removing corrupted cache entry %s" % path)
+                        os.unlink(path)
+                        raise
+                touch(path)
+                return
+            if self.offline:
+                raise SourceCacheMiss("%s is not in the source cache and offline mode is enabled" % key)
+
+            errors = []
+            for url in urls:
+                temp_path = self._temp_path()
+                try:
+                    self._info("Downloading and extracting %s..." % url)
+                    response = urlopen(url)
+                    with open(temp_path, "wb") as sink:
+                        actual = _stream_extract(_HashingReader(response, sink), destination, sha256, members)
+                    self._store(temp_path, sha256, key, actual)
+                    return
+                except Exception as e:
+                    errors.append("%s: %s" % (url, e))
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+            raise HykerBuildError("Could not download %s" % "; ".join(errors))
+
+    def git_archive(self, url, commit, prefix):
+        """Return the path of a tar archive of ``url`` at ``commit``, rooted at ``prefix``."""
+        key = "git:%s@%s:%s" % (url, commit, prefix)
+
+        with self._lock(key):
+            path = self._lookup(None, key)
+            if path:
+                self._info("Using cached %s at %s" % (url, commit))
+                return path
+            if self.offline:
+                raise SourceCacheMiss("%s@%s is not in the source cache and offline mode is enabled" % (url, commit))
+
+            checkout = tempfile.mkdtemp(dir=mkdirs(os.path.join(self.root, "tmp")))
+            temp_path = self._temp_path()
+            try:
+                self._fetch_commit(url, commit, checkout)
+                subprocess.check_call(["git", "archive", "--format=tar", "--prefix=%s/" % prefix,
+                                       "-o", temp_path, commit], cwd=checkout)
+                return self._store(temp_path, None, key)
+            finally:
+                shutil.rmtree(checkout, ignore_errors=True)
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+
+    def _fetch_commit(self, url, commit, checkout):
+        # Only the wanted commit, servers that refuse to serve a commit by its hash get a full clone
+        self._info("Fetching %s at %s..." % (url, commit))
+        subprocess.check_call(["git", "init", "-q", checkout])
+        try:
+            subprocess.check_call(["git", "fetch", "-q", "--depth", "1", url, commit], cwd=checkout)
+        except subprocess.CalledProcessError:
+            self._info("Shallow fetch of %s refused, cloning the whole repository" % commit)
+            shutil.rmtree(checkout)
+            subprocess.check_call(["git", "clone", "-q", "--no-checkout", url, checkout])
+
+    def evict(self, keep=None):
+        folder = os.path.join(self.root, "objects")
+        if not os.path.isdir(folder):
+            return
+        entries = []
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            self._info("Evicting %s from the source cache" % path)
+            os.unlink(path)
+            total -= size
+
+
+def _merge(source, destination):
+    if os.path.isdir(source) and not os.path.islink(source) and os.path.isdir(destination):
+        for name in os.listdir(source):
+            _merge(os.path.join(source, name), os.path.join(destination, name))
+        return
+    if os.path.isdir(destination) and not os.path.islink(destination):
+        shutil.rmtree(destination)
+    elif os.path.lexists(destination):
+        os.unlink(destination)
+    os.rename(source, destination)
+
+
+def _stream_extract(reader, destination, sha256, members=None):
+    """Extract the tar stream of ``reader`` into ``destination``, return its sha256.
+
+    Every member is checked before it is written, the archive is not trusted until its checksum matched.
+    """
+    staging = tempfile.mkdtemp(prefix=".extract-", dir=mkdirs(destination))
+    try:
+        try:
+            with tarfile.open(fileobj=reader, mode="r|*") as t:
+                for member in checked_members(t, staging):
+                    if members is None or members(member.name):
+                        t.extract(member, staging, **TAR_FILTER)
+        except (tarfile.TarError, EOFError, IOError, OSError, zlib.error) as e:
+            raise HykerBuildError("Corrupted archive: %s" % e)
+        actual = reader.drain()
+        if sha256 is not None and actual != sha256:
+            raise HykerBuildError("Checksum mismatch: expected %s, got %s" % (sha256, actual))
+
+        for name in os.listdir(staging):
+            _merge(os.path.join(staging, name), os.path.join(destination, name))
+        return actual
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def extract(archive, destination, filename=None, members=None):
+    """Extract a tar (any compression) or zip archive, ``filename`` gives the real name if needed."""
+    name = filename or archive
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(archive) as z:
+            names = z.namelist()
+            z.extractall(destination, [n for n in names if members is None or members(n)])
+    else:
+        # zipfile already drops absolute paths and "..", tar members are checked like the streamed ones
+        with tarfile.open(archive, "r:*") as t:
+            wanted = [m for m in t.getmembers() if members is None or members(m.name)]
+            links = set(m.name.replace("\\", "/").rstrip("/") for m in t.getmembers() if m.issym())
+            t.extractall(destination, list(checked_members(wanted, mkdirs(destination), links)), **TAR_FILTER)
@@ -0,0 +1,130 @@
+"""Per translation unit compile time and memory profiler.
+
+Used as a compiler launcher, it runs the real compiler and appends one JSON
+record per invocation (source, output, start, duration, peak RSS) to
+``<trace folder>/tu-<pid>.jsonl``:
+
+    python tu_profile.py <trace folder> <compiler> <arguments...>
+
+``summarize()`` turns a trace folder into a text report sorted by compile time
+and a trace in the Chrome trace event format, which chrome://tracing and
+Perfetto display as a timeline.
+
+The launcher is run as a plain script by the build tools, so this module only
+uses the standard library and nothing from the rest of the package.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SOURCE_EXTENSIONS = (".c", ".cc", ".cp", ".cpp", ".cxx", ".c++", ".m", ".mm", ".s", ".S", ".asm")
+
+
+def launcher(trace_folder):
+    """Command prefix running a compiler through the profiler."""
+    return [sys.executable, os.path.abspath(__file__).replace(".pyc", ".py"), os.path.abspath(trace_folder)]
+
+
+def _invocation(arguments):
+    source = output = None
+    for index, argument in enumerate(arguments):
+        if argument.endswith(SOURCE_EXTENSIONS) and not argument.startswith("-"):
+            source = argument
+        elif argument == "-o" and index + 1 < len(arguments):
+            output = arguments[index + 1]
+        elif argument.startswith("-o") and len(argument) > 2:
+            output = argument[2:]
+    if source is None and output is None:
+        return None
+    return {"source": source, "output": output, "kind": "compile" if "-c" in arguments else "link"}
+
+
+def main(argv):
+    trace_folder, command = argv[0], argv[1:]
+    start = time.time()
+    code = subprocess.call(command)
+    duration = time.time() - start
+
+    invocation = _invocation(command[1:])
+    if invocation is not None:
+        invocation["start"] = start
+        invocation["duration"] = duration
+        invocation["exit_code"] = code
+        invocation["cwd"] = os.getcwd()
+        if resource is not None:
+            scale = 1 << 20 if sys.platform == "darwin" else 1 << 10
+            invocation["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / float(scale), 1)
+        if not os.path.isdir(trace_folder):
+            try:
+                os.makedirs(trace_folder)
+            except OSError:
+                pass
+        with open(os.path.join(trace_folder, "tu-%d.jsonl" % os.getpid()), "a") as f:
+            f.write(json.dumps(invocation) + "\n")
+    return code
+
+
+def load(trace_folder):
+    records = []
+    for name in sorted(os.listdir(trace_folder)):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(trace_folder, name)) as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda r: r["start"])
+
+
+def _name(record):
+    return record["source"] or record["output"]
+
+
+def summarize(trace_folder, destination, top=50):
+    """Write compile_profile.txt and compile_trace.json, return the ``top`` slowest invocations."""
+    records = load(trace_folder)
+    if not records:
+        return []
+
+    # Give every invocation a lane that is free at its start so overlapping jobs do not stack
+    lanes = []
+    events = []
+    origin = records[0]["start"]
+    for record in records:
+        for lane, busy_until in enumerate(lanes):
+            if busy_until <= record["start"]:
+                break
+        else:
+            lane = len(lanes)
+            lanes.append(0)
+        lanes[lane] = record["start"] + record["duration"]
+        events.append({"name": os.path.basename(_name(record)), "cat": record["kind"], "ph": "X",
+                       "ts": int((record["start"] - origin) * 1e6), "dur": int(record["duration"] * 1e6),
+                       "pid": 1, "tid": lane,
+                       "args": {"path": _name(record), "peak_rss_mb": record.get("peak_rss_mb")}})
+    with open(os.path.join(destination, "compile_trace.json"), "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    slowest = sorted(records, key=lambda r: r["duration"], reverse=True)
+    total = sum(r["duration"] for r in records)
+    wall = max(r["start"] + r["duration"] for r in records) - origin
+    with open(os.path.join(destination, "compile_profile.txt"), "w") as f:
+        f.write("%d invocations, %.1fs of compiler time in %.1fs of wall time\n\n" % (len(records), total, wall))
+        f.write("%10s %8s %12s  %s\n" % ("seconds", "share", "peak RSS MB", "file"))
+        for record in slowest:
+            f.write("%10.2f %7.1f%% %12s  %s\n" % (record["duration"], 100.0 * record["duration"] / total if total else 0,
+                                                   record.get("peak_rss_mb", "-"), _name(record)))
+
+    return [{"file": _name(r), "seconds": round(r["duration"], 2), "peak_rss_mb": r.get("peak_rss_mb")}
+            for r in slowest[:top]]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--summarize":
+        summarize(sys.argv[2], sys.argv[2])
+        sys.exit(0)
+    sys.exit(main(sys.argv[1:]))
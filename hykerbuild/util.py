@@ -0,0 +1,178 @@
+import errno
+import hashlib
+import os
+import tarfile
+import time
+
+
+class HykerBuildError(Exception):
+    pass
+
+
+def cache_root():
+    """Root folder of every cache kept by the build helpers, HYKER_CACHE overrides it."""
+    return os.environ.get("HYKER_CACHE") or os.path.join(os.path.expanduser("~"), ".hyker")
+
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+def has_option(conanfile, name):
+    """Whether the recipe declares the option ``name`` and configure() did not remove it."""
+    return name in conanfile.options.values.fields
+
+
+def parse_size(text):
+    """Parse "512M", "10G" or a plain number of bytes."""
+    text = str(text).strip().upper()
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] == "B":
+        text = text[:-1]
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def mkdirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+    return path
+
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def which(program):
+    extensions = [""]
+    if os.name == "nt":
+        extensions.extend(os.environ.get("PATHEXT", ".EXE").split(os.pathsep))
+    for folder in os.environ.get("PATH", "").split(os.pathsep):
+        for extension in extensions:
+            candidate = os.path.join(folder, program + extension)
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                return candidate
+    return None
+
+
+def _inside(path, folder):
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+def _member_name(member):
+    return member.name.replace("\\", "/").rstrip("/")
+
+
+def _check_member(member, destination, links):
+    name = _member_name(member)
+    parts = name.split("/")
+    if os.path.isabs(name) or name.startswith("/") or os.path.splitdrive(name)[0] or ".." in parts:
+        raise HykerBuildError("Refusing to extract %s: not a path inside the archive" % member.name)
+    # A member below a symlink of the archive would be written wherever the link points
+    if any("/".join(parts[:index]) in links for index in range(1, len(parts))):
+        raise HykerBuildError("Refusing to extract %s: below a symlink of the archive" % member.name)
+    if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+        raise HykerBuildError("Refusing to extract %s: not a file, folder or link" % member.name)
+    if member.issym() or member.islnk():
+        if os.path.isabs(member.linkname) or os.path.splitdrive(member.linkname)[0]:
+            raise HykerBuildError("Refusing to extract %s: links to the absolute path %s" % (member.name, member.linkname))
+        # Symlink targets are relative to the link, hardlink targets to the archive root
+        base = os.path.dirname(os.path.join(destination, name)) if member.issym() else destination
+        if not _inside(os.path.normpath(os.path.join(base, member.linkname)), destination):
+            raise HykerBuildError("Refusing to extract %s: links outside the archive to %s" % (member.name, member.linkname))
+
+
+# The tarfile filter refusing what a data archive should not contain, where Python has it
+TAR_FILTER = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+
+def checked_members(members, destination, links=None):
+    """Yield the tar ``members`` after checking each lands inside ``destination``, raise HykerBuildError otherwise.
+
+    ``links`` are the symlink names of the whole archive.  Without them the symlinks met so far are used,
+    which is enough when a stream is extracted in order: a later link cannot redirect an earlier member.
+    """
+    destination = os.path.realpath(destination)
+    seen = set() if links is None else links
+    for member in members:
+        _check_member(member, destination, seen)
+        if links is None and member.issym():
+            seen.add(_member_name(member))
+        yield member
+
+
+def extract_tar(path, destination):
+    """Extract the tar.gz ``path`` to ``destination``, refusing any member that would land outside of it.
+
+    Downloaded archives are untrusted: absolute paths, "..", members below a symlink, links leading
+    outside and special files raise HykerBuildError before anything is written.
+    """
+    destination = os.path.realpath(mkdirs(destination))
+    with tarfile.open(path, "r:gz") as t:
+        members = t.getmembers()
+        links = set(_member_name(member) for member in members if member.issym())
+        members = list(checked_members(members, destination, links))
+        t.extractall(destination, members, **TAR_FILTER)
+
+
+def touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+class FileLock(object):
+    """Inter-process lock based on the atomic creation of a lock file.
+
+    Locks older than ``stale_after`` seconds are considered left over by a
+    killed process and are broken.
+    """
+
+    def __init__(self, path, timeout=3600, stale_after=6 * 3600):
+        self.path        = path
+        self.timeout     = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        mkdirs(os.path.dirname(self.path))
+        start = time.time()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode("ascii"))
+                os.close(fd)
+                return self
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            try:
+                if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                    os.unlink(self.path)
+                    continue
+            except OSError:
+                continue
+            if time.time() - start > self.timeout:
+                raise HykerBuildError("Timed out waiting for lock %s" % self.path)
+            time.sleep(0.5)
+
+    def __exit__(self, *exc):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,65 @@
+"""Stand-ins for the conan objects the hykerbuild helpers use, conan itself is not needed to run the tests."""
+
+
+class ConanException(Exception):
+    pass
+
+
+class _Values(object):
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def fields(self):
+        return sorted(self._data)
+
+
+class Options(object):
+    """Raises on undeclared options like the PackageOptions of conan."""
+
+    def __init__(self, **values):
+        self.__dict__["_data"] = dict(values)
+
+    def __getattr__(self, name):
+        if name not in self._data:
+            raise ConanException("option '%s' doesn't exist" % name)
+        return self._data[name]
+
+    def __setattr__(self, name, value):
+        self._data[name] = value
+
+    def remove(self, name):
+        self._data.pop(name, None)
+
+    @property
+    def values(self):
+        return _Values(self._data)
+
+
+class Settings(object):
+    def __init__(self, os="Linux", arch="x86_64", compiler="gcc", build_type="Release"):
+        self.os = os
+        self.arch = arch
+        self.compiler = compiler
+        self.build_type = build_type
+
+
+class Output(object):
+    def __init__(self):
+        self.lines = []
+
+    def info(self, text):
+        self.lines.append(text)
+
+    warn = info
+    success = info
+
+
+class Conanfile(object):
+    def __init__(self, name="pkg", version="1.0.0", package_folder=None, options=None, settings=None):
+        self.name = name
+        self.version = version
+        self.package_folder = package_folder
+        self.options = options or Options()
+        self.settings = settings or Settings()
+        self.output = Output()
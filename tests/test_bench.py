@@ -0,0 +1,65 @@
+"""The parsers of the benchmark gate against the output formats of OpenSSL 1.0.2h and Crypto++ 5.6.5."""
+import os
+import unittest
+
+from hykerbuild import bench
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def _read(name):
+    with open(os.path.join(DATA, name)) as f:
+        return f.read()
+
+
+class ParseSpeedTest(unittest.TestCase):
+    def test_algorithms(self):
+        results = bench.parse_speed(_read("openssl-1.0.2h-speed-mr.txt"))
+        self.assertEqual(len([name for name in results if "@" in name]), 10)
+        self.assertAlmostEqual(results["md5@16"], 37255584.0)
+        self.assertAlmostEqual(results["md5@8192"], 365137237.33)
+        self.assertAlmostEqual(results["aes-128 cbc@1024"], 132938410.67)
+        # Seconds per operation turned into operations per second
+        self.assertAlmostEqual(results["rsa2048_sign"], 1 / 0.000604)
+        self.assertAlmostEqual(results["rsa2048_verify"], 1 / 0.000022)
+        self.assertAlmostEqual(results["ecdsa256_sign"], 1 / 0.000054)
+        self.assertAlmostEqual(results["ecdsa256_verify"], 1 / 0.000125)
+        self.assertAlmostEqual(results["ecdh256"], 1 / 0.000093)
+        self.assertEqual(len(results), 15)
+
+    def test_evp(self):
+        results = bench.parse_speed(_read("openssl-1.0.2h-speed-evp-mr.txt"))
+        self.assertEqual(sorted(results), sorted("aes-128-gcm@%d" % size for size in (16, 64, 256, 1024, 8192)))
+        self.assertAlmostEqual(results["aes-128-gcm@8192"], 1579553450.67)
+
+    def test_not_machine_readable(self):
+        # Without -mr the gate would have nothing to compare, speed() raises on an empty result
+        self.assertEqual(bench.parse_speed("Doing md5 for 3s on 16 size blocks: 6985422 md5's in 3.00s\n"), {})
+
+
+class ParseCryptestTest(unittest.TestCase):
+    def test_tables(self):
+        tables = bench.parse_cryptest(_read("cryptest-5.6.5-b.html"))
+        self.assertEqual(len(tables), 11)
+        self.assertEqual(tables["AES/GCM (2K tables)"], {"MiB/Second": 1187.0, "Cycles Per Byte": 2.3})
+        self.assertEqual(tables["AES/CBC (128-bit key)"],
+                         {"MiB/Second": 873.0, "Cycles Per Byte": 3.2, "Microseconds to Setup Key and IV": 0.134,
+                          "Cycles to Setup Key and IV": 389.0})
+        self.assertEqual(tables["RSA 2048 Decryption"], {"Milliseconds/Operation": 1.42, "Megacycles/Operation": 4.12})
+        self.assertEqual(tables["DH 2048 Key-Pair Generation"], {})
+
+    def test_metrics(self):
+        metrics = bench.cryptest_metrics(bench.parse_cryptest(_read("cryptest-5.6.5-b.html")))
+        self.assertEqual(metrics["SHA-256"], 184.0)
+        self.assertEqual(metrics["AES/CTR (128-bit key)"], 2874.0)
+        self.assertAlmostEqual(metrics["RSA 2048 Encryption"], 1000 / 0.05)
+        self.assertAlmostEqual(metrics["ECDSA over GF(p) 256 Signature"], 1000 / 0.40)
+        self.assertNotIn("DH 2048 Key-Pair Generation", metrics)
+        self.assertEqual(len(metrics), 10)
+
+    def test_not_html(self):
+        self.assertEqual(bench.parse_cryptest("CryptoPP 5.6.5\nAll tests passed!\n"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from hykerbuild.binary_cache import MANIFEST, BinaryCache
+from hykerbuild.util import HykerBuildError, mkdirs, sha256_file
+
+
+class RestoreTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = BinaryCache(root=os.path.join(self.folder, "cache"))
+        self.destination = os.path.join(self.folder, "a", "b", "package")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _entry(self, files, links=None):
+        """Write an entry like _download() leaves it, ``files`` maps the manifest names to the stored paths."""
+        entry = self.cache._entry("key")
+        manifest = {"package": "pkg", "files": {}, "links": links or {}}
+        for name, stored in files.items():
+            path = os.path.join(mkdirs(os.path.dirname(os.path.join(entry, "files", stored))), os.path.basename(stored))
+            with open(path, "w") as f:
+                f.write(name)
+            manifest["files"][name] = sha256_file(path)
+        with open(os.path.join(entry, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        return entry
+
+    def test_restore(self):
+        self._entry({"lib/libz.so.1": "lib/libz.so.1"}, {"lib/libz.so": "libz.so.1", "include": "lib"})
+        self.cache.restore("key", self.destination)
+        with open(os.path.join(self.destination, "lib", "libz.so")) as f:
+            self.assertEqual(f.read(), "lib/libz.so.1")
+
+    def test_unsafe_entries(self):
+        unsafe = [({"../../x": "x"}, None),
+                  ({"/tmp/x": "x"}, None),
+                  ({"lib/../../x": "x"}, None),
+                  ({"lib/x": "lib/x"}, {"up": "../.."}),
+                  ({"lib/x": "lib/x"}, {"lib/up": "../.."}),
+                  ({"lib/x": "lib/x"}, {"abs": "/etc"}),
+                  ({"lib/x": "lib/x"}, {"../../link": "lib"}),
+                  ({"out/x": "out/x"}, {"out": "lib"})]
+        for files, links in unsafe:
+            entry = self._entry(files, links)
+            self.assertIsNone(self.cache.fetch("key"))
+            self.assertFalse(os.path.exists(entry))
+            with self.assertRaises(HykerBuildError):
+                self.cache.restore("key", self.destination)
+            self.assertFalse(os.path.exists(os.path.join(self.folder, "a", "x")))
+            self.assertFalse(os.path.lexists(os.path.join(self.folder, "a", "link")))
+
+    def test_links_through_links(self):
+        # Each link stays inside on its own, "up" -> "here/.." only leaves once "here" -> "." exists
+        entry = self._entry({"lib/x": "lib/x"}, {"up": "here/..", "here": "."})
+        with self.assertRaises(HykerBuildError):
+            self.cache.restore("key", self.destination)
+        self.assertFalse(os.path.exists(entry))
+        self.assertFalse(os.path.lexists(os.path.join(self.destination, "up")))
+
+
+if __name__ == "__main__":
+    unittest.main()
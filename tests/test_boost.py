@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from hykerbuild.boost import evict_matrices
+from hykerbuild.util import FileLock, mkdirs
+
+
+class EvictMatricesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _matrix(self, name, used, size=1000):
+        folder = mkdirs(os.path.join(self.root, name, "stage", "lib"))
+        with open(os.path.join(folder, "libboost_system-mt.a"), "wb") as f:
+            f.write(b"x" * size)
+        complete = os.path.join(self.root, name, "complete")
+        open(complete, "w").close()
+        os.utime(complete, (used, used))
+        return os.path.join(self.root, name)
+
+    def test_least_recently_used_first(self):
+        now = time.time()
+        old, locked, recent, current = (self._matrix("old", now - 300), self._matrix("locked", now - 200),
+                                        self._matrix("recent", now - 100), self._matrix("current", now - 400))
+        with FileLock(locked + ".lock"):
+            evict_matrices(self.root, keep=current, max_size=2500)
+        self.assertEqual(sorted(os.listdir(self.root)), ["current", "locked"])
+
+
+if __name__ == "__main__":
+    unittest.main()
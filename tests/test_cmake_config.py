@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from hykerbuild import cmake_config, cpu_level
+from tests.conan_fakes import Conanfile, Options
+
+
+class WriteTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, "lib"))
+        open(os.path.join(self.folder, "lib", "libssl.a"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _config(self, conanfile, **kwargs):
+        target = cmake_config.library_target(conanfile, "OpenSSL::SSL", "ssl")
+        with open(cmake_config.write(conanfile, "OpenSSL", [target], **kwargs)) as f:
+            return f.read()
+
+    def test_recipe_without_cpu_level(self):
+        # OpenSSL declares no cpu_level option
+        conanfile = Conanfile("OpenSSL", "1.0.2h", self.folder, Options(shared=False))
+        self.assertEqual(cpu_level.level(conanfile), "baseline")
+        config = self._config(conanfile)
+        self.assertIn('IMPORTED_LOCATION "${_hyker_OpenSSL_prefix}/lib/libssl.a"', config)
+        self.assertIn('set(OpenSSL_VERSION "1.0.2h")', config)
+
+    def test_removed_options(self):
+        # The Boost headers package removes shared and cpu_level in configure()
+        options = Options(shared=False, cpu_level="x86-64-v3", header_only=True)
+        options.remove("shared")
+        options.remove("cpu_level")
+        conanfile = Conanfile("Boost", "1.64.0", self.folder, options)
+        config = cmake_config.write(conanfile, "Boost", [cmake_config.interface_target("Boost::boost")],
+                                    check_target="Boost::boost")
+        self.assertTrue(os.path.exists(config))
+
+    def test_check_object_linked(self):
+        open(os.path.join(self.folder, "lib", "hyker_cpu_check.o"), "w").close()
+        conanfile = Conanfile("OpenSSL", "1.0.2h", self.folder, Options(shared=False, cpu_level="x86-64-v3"))
+        self.assertIn("/lib/hyker_cpu_check.o", self._config(conanfile, check_target="OpenSSL::SSL"))
+        self.assertNotIn("hyker_cpu_check", self._config(conanfile))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from hykerbuild import cpu_level
+from tests.conan_fakes import Conanfile, Options, Settings
+
+
+def _conanfile(level, compiler="gcc", arch="x86_64"):
+    return Conanfile("CryptoPP", "5.6.5", options=Options(cpu_level=level),
+                     settings=Settings(os="Windows" if compiler == "Visual Studio" else "Linux", arch=arch,
+                                       compiler=compiler))
+
+
+class LevelTest(unittest.TestCase):
+    def test_gcc(self):
+        conanfile = _conanfile("x86-64-v2")
+        self.assertEqual(cpu_level.package_id_value(conanfile), "x86-64-v2")
+        self.assertIn("-msse4.2", cpu_level.compiler_flags(conanfile))
+        self.assertIn("sse4_2", cpu_level.required_features(conanfile))
+
+    def test_other_architectures(self):
+        conanfile = _conanfile("x86-64-v3", arch="armv8")
+        self.assertEqual(cpu_level.package_id_value(conanfile), "baseline")
+        self.assertEqual(cpu_level.compiler_flags(conanfile), [])
+
+    def test_visual_studio(self):
+        # MSVC has no flag for v2 alone, the package is the baseline one without a check
+        conanfile = _conanfile("x86-64-v2", "Visual Studio")
+        self.assertEqual(cpu_level.package_id_value(conanfile), "baseline")
+        self.assertEqual(cpu_level.compiler_flags(conanfile), [])
+        self.assertEqual(cpu_level.required_features(conanfile), [])
+        self.assertIsNone(cpu_level.build_check(conanfile))
+        cpu_level.warn_unsupported_host(conanfile)
+        self.assertIn("Visual Studio cannot build cpu_level=x86-64-v2, building baseline", conanfile.output.lines)
+
+        conanfile = _conanfile("x86-64-v3", "Visual Studio")
+        self.assertEqual(cpu_level.package_id_value(conanfile), "x86-64-v3")
+        self.assertEqual(cpu_level.compiler_flags(conanfile), ["/arch:AVX2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import unittest
+
+from hykerbuild import jobs
+
+
+class JobCountTest(unittest.TestCase):
+    def setUp(self):
+        self.environ = dict(os.environ)
+        for name in ("HYKER_JOBS", "CONAN_CPU_COUNT", "HYKER_CONCURRENT_BUILDS"):
+            os.environ.pop(name, None)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def test_override(self):
+        os.environ["HYKER_JOBS"] = "8"
+        self.assertEqual(jobs.job_count(1000), 8)
+
+    def test_shared_between_builds(self):
+        # The orchestrator building 3 recipes at once, each gets its share of the jobs
+        os.environ["HYKER_CONCURRENT_BUILDS"] = "3"
+        os.environ["HYKER_JOBS"] = "8"
+        self.assertEqual(jobs.job_count(1000), 2)
+        os.environ["HYKER_JOBS"] = "2"
+        self.assertEqual(jobs.job_count(1000), 1)
+        del os.environ["HYKER_JOBS"]
+        self.assertLessEqual(jobs.job_count(0), max(1, jobs.multiprocessing.cpu_count() // 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from hykerbuild.source_cache import SourceCache, extract
+from hykerbuild.util import HykerBuildError, sha256_file
+
+
+def _add(t, name, data=b"", **attributes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    for key, value in attributes.items():
+        setattr(info, key, value)
+    t.addfile(info, io.BytesIO(data))
+
+
+class ExtractTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.destination = os.path.join(self.folder, "a", "b", "destination")
+        self.cache = SourceCache(root=os.path.join(self.folder, "cache"), offline=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _archive(self, *members):
+        path = os.path.join(self.folder, "archive.tar.gz")
+        with tarfile.open(path, "w:gz") as t:
+            for member in members:
+                _add(t, *member[:2], **(member[2] if len(member) > 2 else {}))
+        return path
+
+    def _url(self, path):
+        return "file://" + path.replace(os.sep, "/")
+
+    def test_extract(self):
+        path = self._archive(("src/a.c", b"int a;"), ("src/link.c", b"", {"type": tarfile.SYMTYPE, "linkname": "a.c"}))
+        self.cache.extract(self._url(path), self.destination, sha256_file(path))
+        with open(os.path.join(self.destination, "src", "link.c")) as f:
+            self.assertEqual(f.read(), "int a;")
+        # Then from the cache
+        shutil.rmtree(self.destination)
+        self.cache.extract(self._url(path), self.destination, sha256_file(path))
+        self.assertTrue(os.path.exists(os.path.join(self.destination, "src", "a.c")))
+
+    def test_refuses_escaping_members(self):
+        escaping = [("../../escaped.txt", b"x"),
+                    ("/tmp/absolute.txt", b"x"),
+                    ("out", b"", {"type": tarfile.SYMTYPE, "linkname": "../../.."}),
+                    ("link", b"", {"type": tarfile.SYMTYPE, "linkname": "."}),
+                    ("hard", b"", {"type": tarfile.LNKTYPE, "linkname": "../escaped.txt"}),
+                    ("fifo", b"", {"type": tarfile.FIFOTYPE})]
+        for member in escaping:
+            path = self._archive(("ok.txt", b"ok"), member, ("link/escaped.txt", b"x"))
+            # The checksum is wrong on purpose: members are checked while streaming, before it is known
+            with self.assertRaises(HykerBuildError):
+                self.cache.extract(self._url(path), self.destination, "0" * 64)
+            self.assertEqual(os.listdir(os.path.join(self.folder, "a", "b")), ["destination"])
+            self.assertEqual(os.listdir(self.destination), [])
+            self.assertFalse(os.path.exists(os.path.join(self.folder, "a", "escaped.txt")))
+
+    def test_refuses_escaping_members_of_cached_archives(self):
+        path = self._archive(("ok.txt", b"ok"), ("link", b"", {"type": tarfile.SYMTYPE, "linkname": "."}),
+                             ("link/../../escaped.txt", b"x"))
+        with self.assertRaises(HykerBuildError):
+            extract(path, self.destination)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "a", "escaped.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()